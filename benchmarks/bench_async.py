@@ -0,0 +1,84 @@
+"""Load test: event-loop stalls while 1k concurrent requests count tokens.
+
+A heartbeat task sleeps 1 ms at a time and records how late it wakes up. Each round fires
+`--concurrency` requests of mixed sizes at once, counting them with `count_tokens` called
+inline (as a service would without the async API), with `acount_tokens` (executor and
+micro-batches), or not at all: the no-op line is the loop's own cost of running that many
+tasks, the floor for any async API.
+
+    python benchmarks/bench_async.py [--model gpt-4o] [--concurrency 1000] [--rounds 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.corpus import synthetic_text
+from cntkn.core import acount_tokens, count_tokens
+
+TICK = 0.001
+
+
+async def _heartbeat(stalls: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        stalls.append(time.perf_counter() - start - TICK)
+
+
+async def _inline(text: str, model: str) -> int:  # noqa: RUF029 - blocks the loop on purpose
+    return int(count_tokens(text, model))
+
+
+async def _noop(text: str, model: str) -> int:  # noqa: ARG001
+    await asyncio.sleep(0)
+    return 0
+
+
+MODES = {"count_tokens": _inline, "no-op": _noop, "acount_tokens": acount_tokens}
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _run(mode: str, texts: list[str], model: str, concurrency: int, rounds: int) -> None:
+    count = MODES[mode]
+    await count("warm up", model)
+    stalls: list[float] = []
+    stop = asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(stalls, stop))
+    started = time.perf_counter()
+    for round_ in range(rounds):
+        batch = texts[round_ * concurrency % len(texts) :][:concurrency]
+        await asyncio.gather(*(count(text, model) for text in batch))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await heartbeat
+    print(
+        f"{mode:<16} {concurrency * rounds / elapsed:9.0f} req/s"
+        f"   stall p50 {_percentile(stalls, 0.5) * 1e3:7.2f} ms"
+        f"   p99 {_percentile(stalls, 0.99) * 1e3:7.2f} ms   max {max(stalls) * 1e3:7.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)  # noqa: S311
+    # Mostly chat-message sized requests, with the occasional document.
+    texts = [synthetic_text(rng.choice([200, 200, 1000, 4000, 20_000]), seed=i) for i in range(2000)]
+    for mode in MODES:
+        asyncio.run(_run(mode, texts, args.model, args.concurrency, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark: exact counting vs --estimate sampling on a synthetic corpus.
+
+Reports the speed-up and the estimate's error relative to the exact count, and exits 1 if
+the speed-up is below ``--min-speedup``.
+
+    python benchmarks/bench_estimate.py [--model gpt-4o] [--megabytes 32] [--min-speedup 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+
+from cntkn.core import count_tokens, get_encoder
+from cntkn.estimate import estimate_tokens
+
+# Prose and code words, so the ratio is neither pure-English nor pure-code.
+WORDS = [
+    *("the", "of", "and", "to", "in", "is", "was", "for", "that", "with", "as", "on", "by"),
+    *("def", "return", "import", "class", "self", "None", "0", "1", "2024"),
+]
+
+
+def synthetic_text(megabytes: int, seed: int = 0) -> str:
+    rng = random.Random(seed)  # noqa: S311
+    lines = []
+    size = 0
+    while size < megabytes << 20:
+        line = " ".join(rng.choices(WORDS, k=rng.randint(3, 20)))
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--megabytes", type=int, default=32)
+    parser.add_argument("--min-speedup", type=float, default=10.0)
+    args = parser.parse_args()
+
+    text = synthetic_text(args.megabytes)
+    get_encoder(args.model)  # load the BPE ranks outside the timed region
+
+    start = time.perf_counter()
+    exact = count_tokens(text, args.model)
+    exact_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    est = estimate_tokens(text, args.model, seed=0)
+    est_s = time.perf_counter() - start
+
+    speedup = exact_s / est_s
+    error = (est.tokens - exact) / exact
+    print(f"exact     {exact:>12} tokens  {exact_s * 1000:9.1f} ms")
+    print(f"estimate  {est.tokens:>12} tokens  {est_s * 1000:9.1f} ms  95% CI [{est.low}, {est.high}]")
+    print(f"speed-up  {speedup:.0f}x   error {error:+.2%}   exact inside CI: {est.low <= exact <= est.high}")
+    return 0 if speedup >= args.min_speedup else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
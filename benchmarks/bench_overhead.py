@@ -0,0 +1,45 @@
+"""Micro-benchmark: per-call overhead of counting a short string.
+
+Compares the previous per-call path (``tiktoken.encoding_for_model`` on every call) with
+``count_tokens`` (cached model resolution) and a held ``Encoder`` handle.
+
+    python benchmarks/bench_overhead.py [--model gpt-4o] [--number 20000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import timeit
+
+import tiktoken
+
+from cntkn.core import count_tokens, get_encoder
+
+TEXT = "hello world"
+
+
+def _uncached(model: str) -> int:
+    # What TiktokenCounter.encode did before the resolver cache existed.
+    return len(tiktoken.encoding_for_model(model).encode(TEXT))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--number", type=int, default=20_000)
+    args = parser.parse_args()
+
+    encoder = get_encoder(args.model)  # also warms tiktoken's own registry
+    cases = {
+        "encoding_for_model + encode (before)": lambda: _uncached(args.model),
+        "count_tokens (cached resolver)": lambda: count_tokens(TEXT, args.model),
+        "Encoder.encode (held handle)": lambda: encoder.encode(TEXT),
+        "raw tiktoken Encoding.encode": lambda: len(encoder.encoding.encode(TEXT)),
+    }
+    for label, fn in cases.items():
+        best = min(timeit.repeat(fn, number=args.number, repeat=5)) / args.number
+        print(f"{label:<40} {best * 1e6:8.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Cold-start benchmark: import time and wall time per CLI subcommand, checked against budgets.
+
+Each case runs ``python -X importtime -m cntkn ...`` in a fresh interpreter. Wall time is
+reported as overhead over a bare ``python -c pass`` so slow machines do not skew it. The
+script fails (exit 1) if a case exceeds a budget or imports a module it must not need.
+
+    python benchmarks/bench_startup.py [--repeat 5] [--scale 1.0]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess  # noqa: S404
+import sys
+import time
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class Case:
+    args: tuple[str, ...]
+    import_budget_ms: float  # cumulative import time of cntkn and what it pulls in
+    wall_budget_ms: float  # on top of a bare interpreter start
+    forbidden: tuple[str, ...] = ()
+
+
+# Only `models` legitimately needs tiktoken (its model table lives in tiktoken.model).
+LAZY = ("tiktoken", "sqlite3", "multiprocessing", "socket")
+CASES = (
+    Case(("--help",), import_budget_ms=75, wall_budget_ms=90, forbidden=LAZY),
+    # click resolves the version through importlib.metadata, which costs ~20 ms on its own.
+    Case(("--version",), import_budget_ms=100, wall_budget_ms=150, forbidden=LAZY),
+    Case(("count", "--help"), import_budget_ms=75, wall_budget_ms=90, forbidden=LAZY),
+    Case(("models",), import_budget_ms=90, wall_budget_ms=130, forbidden=("sqlite3", "multiprocessing")),
+)
+
+
+def parse_importtime(stderr: str) -> tuple[float, set[str]]:
+    """Return (ms spent importing for the command, imported module names) from -X importtime.
+
+    Only top-level imports after `runpy` count, so interpreter start-up and `site` hooks
+    installed in the environment are excluded.
+    """
+    total_us = 0
+    modules: set[str] = set()
+    started = False
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _self, cumulative, name = line.removeprefix("import time:").split("|")
+        modules.add(name.strip())
+        if started and not name.startswith("  "):
+            total_us += int(cumulative)
+        started = started or name.strip() == "runpy"
+    return total_us / 1000, modules
+
+
+def wall_ms(*args: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], capture_output=True, check=False)  # noqa: S603
+    return (time.perf_counter() - start) * 1000
+
+
+def run_case(case: Case) -> tuple[float, set[str]]:
+    cmd = [sys.executable, "-X", "importtime", "-m", "cntkn", *case.args]
+    proc = subprocess.run(cmd, capture_output=True, text=True, check=False)  # noqa: S603
+    return parse_importtime(proc.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case; the median is compared")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply budgets (slow CI machines)")
+    args = parser.parse_args()
+
+    baseline = statistics.median(wall_ms("-c", "pass") for _ in range(args.repeat))
+    print(f"bare interpreter start: {baseline:.1f} ms")
+    failed = False
+    for case in CASES:
+        runs = [run_case(case) for _ in range(args.repeat)]
+        import_ms = statistics.median(r[0] for r in runs)
+        overhead = (
+            statistics.median(wall_ms("-m", "cntkn", *case.args) for _ in range(args.repeat)) - baseline
+        )
+        leaked = sorted({m.split(".")[0] for m in runs[0][1]} & set(case.forbidden))
+        over = import_ms > case.import_budget_ms * args.scale or overhead > case.wall_budget_ms * args.scale
+        status = "FAIL" if over or leaked else "ok"
+        failed |= status == "FAIL"
+        print(
+            f"{status:4} cntkn {' '.join(case.args):<14} imports {import_ms:6.1f} ms "
+            f"(budget {case.import_budget_ms * args.scale:.0f})  wall +{overhead:6.1f} ms "
+            f"(budget {case.wall_budget_ms * args.scale:.0f})"
+            + (f"  unexpected imports: {', '.join(leaked)}" if leaked else "")
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Write the corpus that `src/cntkn/resources/calibration.toml` was measured on.
+
+    python -m benchmarks.calibration_corpus DIR
+    cntkn calibrate DIR -m o200k_base -m cl100k_base -m p50k_base -m r50k_base
+
+DIR gets about 512 KiB of each kind of text, one document per file, so `rel_stdev` reflects how
+much the ratio varies from document to document:
+
+- synthetic/: the prose, code, number and non-ASCII mix of `benchmarks.corpus`, 16 KiB per file;
+- code/: the interpreter's top-level standard-library modules, in name order (real Python);
+- prose/: the interpreter's `pydoc_data` topics, i.e. the language reference (real English).
+
+The packaged figures come from CPython 3.13.0; other versions give slightly different text.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import sysconfig
+from pathlib import Path
+from pydoc_data.topics import topics
+
+from benchmarks.corpus import write_tree
+
+PART_SIZE = 512 << 10
+FILE_SIZE = 16 << 10
+
+
+def write_corpus(root: Path) -> Path:
+    """Write the synthetic, code and prose parts under `root` and return it."""
+    write_tree(root / "synthetic", files=PART_SIZE // FILE_SIZE, size=FILE_SIZE)
+    (root / "code").mkdir(parents=True, exist_ok=True)
+    size = 0
+    for module in sorted(Path(sysconfig.get_paths()["stdlib"]).glob("*.py")):
+        if size >= PART_SIZE:
+            break
+        text = module.read_text(encoding="utf-8")
+        (root / "code" / module.name).write_text(text, encoding="utf-8")
+        size += len(text)
+    (root / "prose").mkdir(parents=True, exist_ok=True)
+    for name, text in sorted(topics.items()):
+        (root / "prose" / f"{name}.txt").write_text(text, encoding="utf-8")
+    return root
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", type=Path)
+    args = parser.parse_args()
+    print(f"Wrote the calibration corpus to {write_corpus(args.directory)} ({sys.version.split()[0]}).")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,50 @@
+"""Deterministic synthetic corpora for the benchmarks (nothing is downloaded)."""
+
+from __future__ import annotations
+
+import random
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pathlib import Path  # pragma: no cover
+
+PROSE = [
+    *("the", "of", "and", "to", "in", "is", "was", "for", "that", "with", "as", "on", "by"),
+    *("token", "model", "context", "window", "budget", "encoding", "throughput", "latency"),
+]
+CODE = [
+    "def count(self, text: str) -> int:",
+    "    return len(self.encoder.encode(text))",
+    "for i in range(1024):",
+    "    total += values[i] * 0x7f",
+    "}",
+    "if (err != nil) { return err }",
+]
+UNICODE = ["café", "naïve", "中文", "日本語", "emoji ✓", "Ωmega"]
+
+
+def synthetic_text(size: int, seed: int = 0) -> str:
+    """Return about `size` characters mixing prose, code lines, numbers and non-ASCII text."""
+    rng = random.Random(seed)  # noqa: S311
+    lines: list[str] = []
+    length = 0
+    while length < size:
+        roll = rng.random()
+        if roll < 0.6:  # noqa: PLR2004
+            line = " ".join(rng.choices(PROSE, k=rng.randint(4, 16))).capitalize() + "."
+        elif roll < 0.9:  # noqa: PLR2004
+            line = rng.choice(CODE)
+        else:
+            line = f"{rng.choice(UNICODE)} {rng.randint(0, 10**6)}"
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)[:size]
+
+
+def write_tree(root: Path, *, files: int, size: int, seed: int = 0) -> Path:
+    """Write `files` text files of about `size` characters under `root`, 100 per directory."""
+    for i in range(files):
+        path = root / f"d{i // 100:03d}" / f"f{i:05d}.txt"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(synthetic_text(size, seed=seed + i), encoding="utf-8")
+    return root
@@ -0,0 +1,376 @@
+"""Benchmark suite for the core and CLI hot paths, with JSON baselines.
+
+    python -m benchmarks.suite run [--save baseline.json] [--filter encode/] [--scale 0.25]
+    python -m benchmarks.suite compare baseline.json [--threshold 0.10] [--current run.json]
+
+`run` times every benchmark (best of `--repeat`) on synthetic corpora written to a scratch
+directory and optionally saves the results. `compare` runs the suite (or loads `--current`)
+and exits 1 if any benchmark is slower than the baseline by more than `--threshold`.
+Baselines are machine-specific: record one per machine before comparing.
+"""
+
+from __future__ import annotations
+
+import argparse
+import collections
+import contextlib
+import io
+import json
+import platform
+import subprocess  # noqa: S404
+import sys
+import tempfile
+import time
+import timeit
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from importlib.metadata import version
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from benchmarks.corpus import synthetic_text, write_tree
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+ENCODINGS = ("r50k_base", "p50k_base", "cl100k_base", "o200k_base")
+MODEL = "gpt-4o"
+MB = 1 << 20
+
+
+@dataclass(frozen=True, slots=True)
+class Benchmark:
+    name: str
+    # Given a scratch directory, prepare inputs and return the callable to time.
+    setup: Callable[[Path], Callable[[], object]]
+    number: int = 1  # calls per timing run
+    nbytes: int = 0  # input bytes per call, for MB/s
+
+
+# ----------------------------------- cases ------------------------------------
+def _encode(encoding: str, size: int) -> Callable[[Path], Callable[[], object]]:
+    def setup(_: Path) -> Callable[[], object]:
+        import tiktoken  # noqa: PLC0415
+
+        from cntkn.core import Encoder  # noqa: PLC0415
+
+        encoder = Encoder(tiktoken.get_encoding(encoding))
+        text = synthetic_text(size)
+        return lambda: encoder.encode(text)
+
+    return setup
+
+
+def _load(encoding: str, *, compiled: bool) -> Callable[[Path], Callable[[], object]]:
+    def setup(scratch: Path) -> Callable[[], object]:
+        import tiktoken  # noqa: PLC0415
+        from tiktoken_ext.openai_public import ENCODING_CONSTRUCTORS  # noqa: PLC0415
+
+        from cntkn.encodings import compile_encoding, read_compiled  # noqa: PLC0415
+
+        if not compiled:
+            # tiktoken's own load: read the (already downloaded) BPE file and parse it.
+            return lambda: tiktoken.Encoding(**ENCODING_CONSTRUCTORS[encoding]())
+        path = scratch / f"{encoding}.tkb"
+        path.write_bytes(compile_encoding(tiktoken.get_encoding(encoding)))
+        return lambda: read_compiled(path)
+
+    return setup
+
+
+def _encode_batch(count: int, size: int) -> Callable[[Path], Callable[[], object]]:
+    def setup(_: Path) -> Callable[[], object]:
+        from cntkn.core import count_tokens_batch  # noqa: PLC0415
+
+        texts = [synthetic_text(size, seed=i) for i in range(count)]
+        count_tokens_batch(texts[:1], MODEL)  # load the encoder outside the timed region
+        return lambda: count_tokens_batch(texts, MODEL)
+
+    return setup
+
+
+def _split(size: int, *, boundaries: bool) -> Callable[[Path], Callable[[], object]]:
+    def setup(_: Path) -> Callable[[], object]:
+        from cntkn.core import split_by_tokens  # noqa: PLC0415
+
+        text = synthetic_text(size)
+
+        def run() -> None:
+            collections.deque(
+                split_by_tokens(text, MODEL, max_tokens=512, overlap=64, boundaries=boundaries), maxlen=0
+            )
+
+        run()  # load the encoder and its token shapes outside the timed region
+        return run
+
+    return setup
+
+
+def _count_tokens_call(_: Path) -> Callable[[], object]:
+    from cntkn.core import count_tokens  # noqa: PLC0415
+
+    count_tokens("warm", MODEL)
+    return lambda: count_tokens("hello world", MODEL)
+
+
+def _read_sources(files: int, size: int) -> Callable[[Path], Callable[[], object]]:
+    def setup(scratch: Path) -> Callable[[], object]:
+        from cntkn.cli import find_input_sources, read_sources  # noqa: PLC0415
+
+        root = write_tree(scratch / f"read-{files}", files=files, size=size)
+        paths = [str(p) for p in sorted(root.rglob("*.txt"))]
+        return lambda: read_sources(find_input_sources([], paths))
+
+    return setup
+
+
+def _output(*, as_json: bool, results: int) -> Callable[[Path], Callable[[], object]]:
+    def setup(_: Path) -> Callable[[], object]:
+        from cntkn.cli import _emit_results  # noqa: PLC0415, PLC2701
+
+        rows: list[tuple[str, int | list[int]]] = [(f"file-{i}.txt", i) for i in range(results)]
+
+        def run() -> None:
+            with contextlib.redirect_stdout(io.StringIO()):
+                _emit_results(
+                    rows, as_json=as_json, quiet=False, verbose=True, show_tokens=False, total=False
+                )
+
+        return run
+
+    return setup
+
+
+def _tokens_output(fmt: str, tokens: int) -> Callable[[Path], Callable[[], object]]:
+    def setup(_: Path) -> Callable[[], object]:
+        from cntkn.cli import _emit_results  # noqa: PLC0415, PLC2701
+        from cntkn.tokenio import to_array, write_tokens  # noqa: PLC0415
+
+        ids = [i % 100_000 for i in range(tokens)]
+        if fmt != "text":
+            compact = [to_array(ids)]
+            return lambda: write_tokens(io.BytesIO(), compact, fmt)
+        rows: list[tuple[str, int | list[int]]] = [("input", ids)]
+
+        def run() -> None:
+            with contextlib.redirect_stdout(io.StringIO()):
+                _emit_results(rows, as_json=False, quiet=False, verbose=False, show_tokens=True, total=False)
+
+        return run
+
+    return setup
+
+
+def _cli(args: Callable[[Path], list[str]]) -> Callable[[Path], Callable[[], object]]:
+    def setup(scratch: Path) -> Callable[[], object]:
+        from click.testing import CliRunner  # noqa: PLC0415
+
+        from cntkn.cli import main  # noqa: PLC0415
+
+        argv = args(scratch)
+        runner = CliRunner()
+        runner.invoke(main, ["count", "warm"])
+
+        def run() -> None:
+            result = runner.invoke(main, argv)
+            if result.exit_code != 0:
+                raise RuntimeError(result.output)
+
+        return run
+
+    return setup
+
+
+def _many_files(scratch: Path, files: int, size: int) -> Path:
+    root = scratch / f"tree-{files}"
+    return root if root.exists() else write_tree(root, files=files, size=size)
+
+
+def _repeated_files(scratch: Path, files: int, size: int) -> Path:
+    # Ten distinct texts over `files` files, like licenses and READMEs vendored in every package.
+    root = scratch / f"repeated-{files}"
+    if not root.exists():
+        texts = [synthetic_text(size, seed=i) for i in range(10)]
+        for i in range(files):
+            path = root / f"d{i // 100:03d}" / f"f{i:05d}.txt"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(texts[i % len(texts)], encoding="utf-8")
+    return root
+
+
+def _huge_file(scratch: Path, size: int) -> Path:
+    path = scratch / f"huge-{size}.txt"
+    if not path.exists():
+        path.write_text(synthetic_text(size), encoding="utf-8")
+    return path
+
+
+def _cold_start(*args: str) -> Callable[[Path], Callable[[], object]]:
+    def setup(_: Path) -> Callable[[], object]:
+        cmd = [sys.executable, "-m", "cntkn", *args]
+        return lambda: subprocess.run(cmd, capture_output=True, check=True)  # noqa: S603
+
+    return setup
+
+
+def benchmarks(scale: float = 1.0) -> list[Benchmark]:
+    """Return the suite; `scale` shrinks or grows every corpus."""
+    big = int(4 * MB * scale)
+    small_files = max(10, int(2000 * scale))
+    batch = max(10, int(1000 * scale))
+    sharded = max(2 * big, 65 * MB)  # over cntkn.inputs.MMAP_MIN_SIZE, so --jobs splits it
+    suite = [Benchmark(f"encode/{enc}", _encode(enc, big), nbytes=big) for enc in ENCODINGS]
+    suite += [Benchmark(f"load/tiktoken_{enc}", _load(enc, compiled=False)) for enc in ENCODINGS[2:]]
+    suite += [Benchmark(f"load/compiled_{enc}", _load(enc, compiled=True)) for enc in ENCODINGS[2:]]
+    suite += [
+        Benchmark("encode_batch/4KiB_texts", _encode_batch(batch, 4096), nbytes=batch * 4096),
+        Benchmark("split/512_tokens", _split(big, boundaries=False), nbytes=big),
+        Benchmark("split/512_tokens_boundaries", _split(big, boundaries=True), nbytes=big),
+        Benchmark("overhead/count_tokens", _count_tokens_call, number=10_000),
+        Benchmark("io/read_sources", _read_sources(small_files, 2048), nbytes=small_files * 2048),
+        Benchmark("output/plain_10k", _output(as_json=False, results=10_000)),
+        Benchmark("output/json_10k", _output(as_json=True, results=10_000)),
+        Benchmark("output/tokens_text_1M", _tokens_output("text", 1 << 20)),
+        Benchmark("output/tokens_raw_1M", _tokens_output("raw", 1 << 20)),
+        Benchmark("output/tokens_npy_1M", _tokens_output("npy", 1 << 20)),
+        Benchmark(
+            "cli/many_small_files",
+            _cli(lambda s: ["count", "-r", str(_many_files(s, small_files, 2048)), "--total"]),
+            nbytes=small_files * 2048,
+        ),
+        Benchmark(
+            "cli/many_small_files_prefetch0",
+            _cli(
+                lambda s: [
+                    "count",
+                    "-r",
+                    str(_many_files(s, small_files, 2048)),
+                    "--total",
+                    "--prefetch",
+                    "0",
+                ]
+            ),
+            nbytes=small_files * 2048,
+        ),
+        Benchmark(
+            "cli/many_small_files_jobs4",
+            _cli(lambda s: ["count", "-r", str(_many_files(s, small_files, 2048)), "--total", "--jobs", "4"]),
+            nbytes=small_files * 2048,
+        ),
+        Benchmark(
+            "cli/repeated_files",
+            _cli(lambda s: ["count", "-r", str(_repeated_files(s, small_files, 8192)), "--total"]),
+            nbytes=small_files * 8192,
+        ),
+        Benchmark(
+            "cli/one_huge_file",
+            _cli(lambda s: ["count", "-f", str(_huge_file(s, 2 * big))]),
+            nbytes=2 * big,
+        ),
+        Benchmark(
+            "cli/sharded_file_jobs4",
+            _cli(lambda s: ["count", "--jobs", "4", "-f", str(_huge_file(s, sharded))]),
+            nbytes=sharded,
+        ),
+        Benchmark(
+            "cli/one_huge_file_stream",
+            _cli(lambda s: ["count", "--stream", "-f", str(_huge_file(s, 2 * big))]),
+            nbytes=2 * big,
+        ),
+        Benchmark("startup/--version", _cold_start("--version")),
+        Benchmark("startup/count --help", _cold_start("count", "--help")),
+        Benchmark("startup/count text", _cold_start("count", "hello world")),
+    ]
+    return suite
+
+
+# ----------------------------------- runner -----------------------------------
+def run_suite(*, pattern: str, repeat: int, scale: float) -> dict[str, dict[str, float]]:
+    results: dict[str, dict[str, float]] = {}
+    with tempfile.TemporaryDirectory(prefix="cntkn-bench-") as tmp:
+        for bench in benchmarks(scale):
+            if pattern not in bench.name:
+                continue
+            fn = bench.setup(Path(tmp))
+            best = min(timeit.repeat(fn, number=bench.number, repeat=repeat)) / bench.number
+            entry = {"seconds": best}
+            if bench.nbytes:
+                entry["mb_per_s"] = bench.nbytes / MB / best
+            results[bench.name] = entry
+            rate = f"{entry['mb_per_s']:9.1f} MB/s" if bench.nbytes else ""
+            print(f"{bench.name:<32} {_fmt_seconds(best):>12} {rate}", flush=True)
+    return results
+
+
+def _fmt_seconds(seconds: float) -> str:
+    if seconds < 1e-3:  # noqa: PLR2004
+        return f"{seconds * 1e6:.2f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds:.3f} s"
+
+
+def _document(results: dict[str, dict[str, float]], *, scale: float) -> dict[str, object]:
+    return {
+        "meta": {
+            "created": datetime.now(UTC).isoformat(timespec="seconds"),
+            "cntkn": version("cntkn"),
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()}",
+            "scale": scale,
+        },
+        "benchmarks": results,
+    }
+
+
+def compare(
+    baseline: dict[str, dict[str, float]], current: dict[str, dict[str, float]], threshold: float
+) -> bool:
+    """Print a comparison table; return True if any shared benchmark regressed past `threshold`."""
+    regressed = False
+    for name in sorted(baseline.keys() & current.keys()):
+        ratio = current[name]["seconds"] / baseline[name]["seconds"]
+        slower = ratio > 1 + threshold
+        regressed |= slower
+        status = "SLOWER" if slower else "ok"
+        print(f"{status:6} {name:<32} {ratio:6.2f}x  ({_fmt_seconds(baseline[name]['seconds'])} -> ", end="")
+        print(f"{_fmt_seconds(current[name]['seconds'])})")
+    if missing := len(baseline.keys() - current.keys()):
+        print(f"({missing} baseline benchmarks were not part of this run)")
+    return regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("run", "compare"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+        cmd.add_argument("--repeat", type=int, default=5, help="timing runs per benchmark; the best counts")
+        cmd.add_argument("--scale", type=float, default=1.0, help="corpus size multiplier")
+    sub.choices["run"].add_argument("--save", type=Path, help="write results to this JSON file")
+    sub.choices["compare"].add_argument("baseline", type=Path)
+    sub.choices["compare"].add_argument(
+        "--current", type=Path, help="compare this saved run instead of running"
+    )
+    sub.choices["compare"].add_argument(
+        "--threshold", type=float, default=0.10, help="allowed slowdown (0.10 = 10%%)"
+    )
+    args = parser.parse_args()
+
+    if args.command == "compare" and args.current is not None:
+        current = json.loads(args.current.read_text())["benchmarks"]
+    else:
+        start = time.perf_counter()
+        current = run_suite(pattern=args.filter, repeat=args.repeat, scale=args.scale)
+        print(f"suite finished in {time.perf_counter() - start:.1f} s\n")
+    if args.command == "run":
+        if args.save is not None:
+            args.save.write_text(json.dumps(_document(current, scale=args.scale), indent=2) + "\n")
+        return 0
+    baseline = json.loads(args.baseline.read_text())["benchmarks"]
+    return 1 if compare(baseline, current, args.threshold) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Self
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence  # pragma: no cover
+    from types import TracebackType  # pragma: no cover
+
+CACHE_FILENAME = "counts.sqlite3"
+# SQLite caps the number of bound parameters per statement; stay well below it.
+_MAX_PARAMS = 900
+# Eviction frees this fraction of the cap beyond the excess, so a full cache recounts its rows
+# (a full scan) once per that many new rows rather than on every write.
+_EVICT_SLACK = 1 / 64
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counts (
+    digest    TEXT    NOT NULL,
+    encoding  TEXT    NOT NULL,
+    tokens    INTEGER NOT NULL,
+    last_used REAL    NOT NULL,
+    PRIMARY KEY (digest, encoding)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS counts_last_used ON counts (last_used);
+"""
+
+
+def default_cache_dir() -> Path:
+    """Return `$XDG_CACHE_HOME/cntkn`, falling back to `~/.cache/cntkn`."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "cntkn"
+
+
+@dataclass(frozen=True, slots=True)
+class CacheStats:
+    path: str
+    entries: int
+    max_entries: int
+    size_bytes: int
+    by_encoding: dict[str, int]
+
+
+class TokenCache:
+    """On-disk token counts keyed by content hash and encoding name, with LRU eviction."""
+
+    def __init__(self, directory: Path | None = None, *, max_entries: int = 1_000_000) -> None:
+        self.directory = directory or default_cache_dir()
+        self.max_entries = max_entries
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / CACHE_FILENAME
+        # `count` encodes (and so uses the cache) on a pipeline thread, one thread at a time.
+        self._conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+        # WAL lets worker processes read while the parent writes.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        # Rows in the table: counted on the first write, then advanced by the rows written here.
+        # Replaced rows are counted again and other writers' rows are missed, so the exact count
+        # is taken again before evicting anything.
+        self._entries: int | None = None
+
+    def __enter__(self) -> Self:
+        """Return the cache itself; the connection closes on exit."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        """Close the connection."""
+        self.close()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @staticmethod
+    def digest(text: str) -> str:
+        """Return the content key for `text`."""
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get_many(self, digests: Sequence[str], encoding: str, *, touch: bool = True) -> dict[str, int]:
+        """Return cached counts for whichever `digests` are present.
+
+        Hits are marked recently used unless `touch` is False (read-only lookups from worker
+        processes, whose parent calls `touch` once for the whole batch).
+        """
+        found: dict[str, int] = {}
+        unique = list(dict.fromkeys(digests))
+        for start in range(0, len(unique), _MAX_PARAMS):
+            batch = unique[start : start + _MAX_PARAMS]
+            marks = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT digest, tokens FROM counts WHERE encoding = ? AND digest IN ({marks})",  # noqa: S608
+                (encoding, *batch),
+            )
+            found.update(rows)
+        if touch and found:
+            self.touch(found, encoding)
+        return found
+
+    def get(self, digest: str, encoding: str, *, touch: bool = True) -> int | None:
+        return self.get_many([digest], encoding, touch=touch).get(digest)
+
+    def touch(self, digests: Iterable[str], encoding: str) -> None:
+        """Mark `digests` as recently used."""
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE counts SET last_used = ? WHERE digest = ? AND encoding = ?",
+                [(now, digest, encoding) for digest in digests],
+            )
+
+    def put_many(self, entries: Iterable[tuple[str, int]], encoding: str) -> None:
+        """Store (digest, tokens) pairs, then evict least recently used rows over the cap."""
+        now = time.time()
+        with self._conn:
+            written = self._conn.executemany(
+                "INSERT OR REPLACE INTO counts (digest, encoding, tokens, last_used) VALUES (?, ?, ?, ?)",
+                [(digest, encoding, tokens, now) for digest, tokens in entries],
+            ).rowcount
+            self._evict(written)
+
+    def put(self, digest: str, encoding: str, tokens: int) -> None:
+        self.put_many([(digest, tokens)], encoding)
+
+    def _count(self) -> int:
+        (entries,) = self._conn.execute("SELECT count(*) FROM counts").fetchone()
+        return int(entries)
+
+    def _evict(self, written: int) -> None:
+        self._entries = self._count() if self._entries is None else self._entries + written
+        if self._entries <= self.max_entries:
+            return
+        self._entries = self._count()
+        if self._entries > self.max_entries:
+            excess = self._entries - self.max_entries + int(self.max_entries * _EVICT_SLACK)
+            self._entries -= self._conn.execute(
+                "DELETE FROM counts WHERE (digest, encoding) IN "
+                "(SELECT digest, encoding FROM counts ORDER BY last_used LIMIT ?)",
+                (excess,),
+            ).rowcount
+
+    def stats(self) -> CacheStats:
+        by_encoding = dict(self._conn.execute("SELECT encoding, count(*) FROM counts GROUP BY encoding"))
+        size = sum(p.stat().st_size for p in self.directory.glob(f"{CACHE_FILENAME}*"))
+        return CacheStats(
+            path=str(self.path),
+            entries=sum(by_encoding.values()),
+            max_entries=self.max_entries,
+            size_bytes=size,
+            by_encoding=by_encoding,
+        )
+
+    def clear(self) -> int:
+        """Delete every entry and return how many were removed."""
+        with self._conn:
+            removed = self._conn.execute("DELETE FROM counts").rowcount
+        self._entries = 0
+        self._conn.execute("VACUUM")
+        return removed
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator  # pragma: no cover
+
+# 1 MiB of text per encode call keeps memory flat without making calls too small to amortize.
+DEFAULT_CHUNK_SIZE = 1 << 20
+# Smallest chunk used when counting against a token budget; below this, call overhead dominates.
+MIN_LIMIT_CHUNK_SIZE = 4096
+
+
+def _is_split_point(text: str, pos: int) -> bool:
+    """Return True if the encodings' pre-tokenizers never merge text across offset `pos`.
+
+    Two shapes are safe for the r50k, p50k, cl100k and o200k patterns alike:
+
+    - just after a lone newline that follows a non-space character and precedes a letter or
+      digit (the newline piece cannot absorb the alphanumeric, and a lone newline is a
+      single piece whether or not the text ends there);
+    - just before a single space that follows a non-space character and precedes a letter (the
+      space always starts the next word piece).
+    """
+    if not 1 < pos < len(text):
+        return False
+    before, after = text[pos - 1], text[pos]
+    if before == "\n":
+        return not text[pos - 2].isspace() and after.isalnum()
+    if after == " " and pos + 1 < len(text):
+        return not before.isspace() and text[pos + 1].isalpha()
+    return False
+
+
+def find_split_point(text: str) -> int:
+    """Return the last offset where `text` can be cut without changing its tokenization, or 0.
+
+    Encoding ``text[:i]`` and ``text[i:]`` separately yields exactly the tokens of ``text``.
+    """
+    end = len(text)
+    while end > 0:
+        newline = text.rfind("\n", 0, end)
+        space = text.rfind(" ", 0, end)
+        if newline < 0 and space < 0:
+            return 0
+        if newline > space:
+            if _is_split_point(text, newline + 1):
+                return newline + 1
+            end = newline
+        else:
+            if _is_split_point(text, space):
+                return space
+            end = space
+    return 0
+
+
+def iter_safe_chunks(parts: Iterable[str], min_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """Re-chunk `parts` into pieces of roughly `min_size` characters cut at safe split points.
+
+    Concatenating the yielded chunks gives back the input, and encoding them one by one gives
+    exactly the tokens of the whole text. A chunk only grows past `min_size` when no safe
+    split point exists (e.g. one very long token-dense line).
+    """
+    pending: list[str] = []
+    size = 0
+    threshold = min_size
+    for part in parts:
+        if not part:
+            continue
+        pending.append(part)
+        size += len(part)
+        if size < threshold:
+            continue
+        text = "".join(pending)
+        cut = find_split_point(text)
+        if cut:
+            yield text[:cut]
+            text = text[cut:]
+            threshold = min_size
+        else:
+            # Retry only once the buffer doubles so a boundary-free stream stays linear.
+            threshold = 2 * size
+        pending = [text]
+        size = len(text)
+    if size:
+        yield "".join(pending)
+
+
+def limit_chunk_size(limit: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Return the chunk size for counting against a budget of `limit` tokens.
+
+    At about 8 characters per budgeted token (twice typical English), one chunk usually
+    settles an input that fits, and an input far over budget is abandoned after a chunk
+    or two instead of being encoded in full.
+    """
+    return min(chunk_size, max(MIN_LIMIT_CHUNK_SIZE, 8 * limit))
@@ -1,30 +1,90 @@
 from __future__ import annotations
 
+import collections
+import io
+import itertools
 import json as _json
 import sys
+import time
+from contextlib import closing, nullcontext
+from dataclasses import asdict
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, cast
 
 import click
 from click import Command
 
-from cntkn.config import Config, load_config
+from cntkn.chunking import limit_chunk_size
+from cntkn.config import Config, configure_store, load_config
 from cntkn.core import (
-    SUPPORTED_MODELS,
-    SUPPORTED_PREFIXES,
     TiktokenCounter,
     TokenCounter,
     count_tokens,
+    count_tokens_batch,
+    count_tokens_multi,
+    count_tokens_stream,
+    count_tokens_stream_multi,
+    distinct_encodings,
+    encoding_name_for_model,
     get_supported_models,
+    is_encoding_supported,
     is_model_supported,
+    min_tokens,
+    split_by_tokens,
 )
 from cntkn.defaults import package_defaults
+from cntkn.discovery import discover_files
+from cntkn.errors import EncodingStoreError
+from cntkn.inputs import (
+    detect_compression,
+    is_large_file,
+    iter_file_chunks,
+    open_text,
+    read_chunks,
+    read_text,
+)
+from cntkn.tokenio import to_array, write_tokens
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable, Mapping  # pragma: no cover
+    from array import array  # pragma: no cover
+    from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence  # pragma: no cover
+    from typing import TextIO  # pragma: no cover
+
+    from cntkn.cache import TokenCache  # pragma: no cover
+    from cntkn.dedup import Deduplicator  # pragma: no cover
+    from cntkn.estimate import Estimate  # pragma: no cover
+    from cntkn.follow import FollowState, FollowStore  # pragma: no cover
+    from cntkn.records import Record  # pragma: no cover
+    from cntkn.stats import RunStats  # pragma: no cover
+
+# NOTE: cache (sqlite3), parallel (multiprocessing), server (sockets), stats, pipeline
+# (threads), records (csv), dedup and encodings are imported where they are used, so `--help`,
+# `--version` and plain counts do not pay for them at startup.
+
+# Exit status when an input (or the --total sum) is over the --max-tokens budget.
+EXIT_OVER_BUDGET = 3
+
+
+class _Stdin:
+    """Marker for `-`: stdin is read when the source is materialized."""
+
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "STDIN"
 
 
-def _count_tokens(entry: int | list[int]) -> int:
+# Compared by identity, so no inline text or file content can be mistaken for it.
+STDIN = _Stdin()
+
+# A source is inline text, a file, the STDIN marker, or (streaming only) pending chunks.
+type Source = str | Path | _Stdin | Iterator[str]
+# A count or the tokens of one input, and (label, result) pairs in input order.
+type Result = int | list[int] | array[int]
+type Results = Iterable[tuple[str, Result]]
+
+
+def _count_tokens(entry: int | list[int] | array[int]) -> int:
     return entry if isinstance(entry, int) else len(entry)
 
 
@@ -32,20 +92,31 @@ def _count_tokens(entry: int | list[int]) -> int:
 def find_input_sources(
     text_or_dash: list[str],
     file_path: list[str],
-) -> list[tuple[str, str | Path]]:
-    """Return a list of (label, source) where source is either text or a Path."""
+    *,
+    chunk_size: int | None = None,
+) -> list[tuple[str, Source]]:
+    """Return a list of (label, source) where source is either text or a Path.
+
+    With `chunk_size`, implicit stdin is not slurped: only its first chunk is read (to tell
+    empty from piped input) and the rest is left as a chunk iterator for streaming.
+    """
     # Files are explicit paths (label is the path string)
-    sources: list[tuple[str, str | Path]] = [(p, Path(p)) for p in file_path]
+    sources: list[tuple[str, Source]] = [(p, Path(p)) for p in file_path]
 
     # CLI text_or_dash: either '-' (stdin) or inline text
     for t in text_or_dash:
         if t == "-":
-            sources.append(("stdin", "STDIN"))  # sentinel to read from stdin later
+            sources.append(("stdin", STDIN))  # read from stdin later
         else:
             sources.append((t, t))  # inline text
 
     # Implicit stdin if nothing was provided and stdin is piped
     if not sources and not sys.stdin.isatty():
+        if chunk_size is not None:
+            head = sys.stdin.read(chunk_size)
+            if head:
+                sources.append(("stdin", itertools.chain([head], read_chunks(sys.stdin, chunk_size))))
+            return sources
         data = sys.stdin.read()
         if data:
             sources.append(("stdin", data))
@@ -53,26 +124,46 @@ def find_input_sources(
     return sources
 
 
-def read_sources(sources: list[tuple[str, str | Path]]) -> list[tuple[str, str]]:
+def _require_stdin() -> None:
+    if sys.stdin.isatty():
+        msg = "Reading from stdin was requested ('-') but no input was piped.\nTry: echo 'text' | cntkn -"
+        raise click.ClickException(msg)
+
+
+def read_sources(sources: list[tuple[str, Source]]) -> list[tuple[str, str]]:
     """Materialize sources into (label, text)."""
     results: list[tuple[str, str]] = []
     for label, src in sources:
         if isinstance(src, Path):
-            results.append((label, src.read_text(encoding="utf-8")))
-        elif src == "STDIN":
-            if sys.stdin.isatty():
-                msg = (
-                    "Reading from stdin was requested ('-') but no input was piped.\n"
-                    "Try: echo 'text' | cntkn -"
-                )
-                raise click.ClickException(msg)
+            results.append((label, read_text(src)))
+        elif src is STDIN:
+            _require_stdin()
             results.append((label, sys.stdin.read()))
-        else:
+        elif isinstance(src, str):
             # already a text literal
-            results.append((label, cast("str", src)))
+            results.append((label, src))
+        else:
+            results.append((label, "".join(src)))
     return results
 
 
+def stream_sources(
+    sources: list[tuple[str, Source]],
+    chunk_size: int,
+) -> Iterator[tuple[str, Iterator[str]]]:
+    """Yield (label, chunks) without materializing any source in full."""
+    for label, src in sources:
+        if isinstance(src, Path):
+            yield label, iter_file_chunks(src, chunk_size)
+        elif src is STDIN:
+            _require_stdin()
+            yield label, read_chunks(sys.stdin, chunk_size)
+        elif isinstance(src, str):
+            yield label, iter([src])
+        else:
+            yield label, src
+
+
 def resolve_input_texts(
     text_or_dash: list[str],
     file_path: list[str],
@@ -86,18 +177,48 @@ def resolve_input_texts(
 class ModelName(click.ParamType):
     name: str = "model"
 
+    def __init__(self, *, deferred: bool = False) -> None:
+        # Deferred names are checked by the command (see `count`): a daemon resolves them itself,
+        # so a `--server` client never loads tiktoken's model tables.
+        self.deferred = deferred
+
+    def convert(self, value: str, param: click.Parameter | None, ctx: click.Context | None) -> str:  # noqa: ARG002
+        if not self.deferred:
+            self.check(value)
+        return value
+
     @staticmethod
-    def convert(value: str, param: click.Parameter | None, ctx: click.Context | None) -> str:  # noqa: ARG004
+    def check(value: str) -> None:
         if not is_model_supported(value):
             msg = (
                 f"{value!r} is not a supported model. Use `cntkn models` to see available models.\n"
-                f"Supported: {', '.join(SUPPORTED_MODELS[:5])}..."
+                f"Supported: {', '.join(get_supported_models()['exact_models'][:5])}..."
             )
             raise click.ClickException(msg)
+
+
+class EncodingName(click.ParamType):
+    name: str = "encoding"
+
+    def __init__(self, *, deferred: bool = False) -> None:
+        self.deferred = deferred
+
+    def convert(self, value: str, param: click.Parameter | None, ctx: click.Context | None) -> str:  # noqa: ARG002
+        if not self.deferred:
+            self.check(value)
         return value
 
+    @staticmethod
+    def check(value: str) -> None:
+        if not is_encoding_supported(value):
+            msg = f"{value!r} is not a known tiktoken encoding (e.g. cl100k_base, o200k_base)."
+            raise click.ClickException(msg)
+
 
 MODEL_TYPE = ModelName()
+ENCODING_TYPE = EncodingName()
+DEFERRED_MODEL_TYPE = ModelName(deferred=True)
+DEFERRED_ENCODING_TYPE = EncodingName(deferred=True)
 PKG_DEFAULTS = package_defaults()
 CLI_DEFAULT_CMD = PKG_DEFAULTS["cli"]["default_command"]
 COUNT_DEFAULTS = PKG_DEFAULTS["cli"]["count"]
@@ -128,6 +249,13 @@ class DefaultGroup(click.Group):
         result = super().resolve_command(ctx, args_list)
         return cast("tuple[str, click.Command, list[str]]", result)
 
+    def invoke(self, ctx: click.Context) -> object:
+        try:
+            return super().invoke(ctx)
+        except EncodingStoreError as exc:
+            # Any command may load an encoding; with `offline` a missing one ends the run here.
+            raise click.ClickException(str(exc)) from exc
+
 
 def _color_from_config(cfg: Config) -> bool | None:
     """Translate Config.color_mode into tri-state for Click handling.
@@ -155,57 +283,511 @@ def _color_from_config(cfg: Config) -> bool | None:
 def main(ctx: click.Context) -> None:
     """cntkn: count tokens using OpenAI's tiktoken."""
     # "Load project/user configuration once per invocation."
+    started = time.perf_counter()
     cfg = load_config()
-    ctx.obj = {"config": cfg, "counter": TiktokenCounter()}
+    configure_store(Path(cfg.encodings_dir).expanduser() if cfg.encodings_dir else None, offline=cfg.offline)
+    # The start time and config load time are kept for `count --stats`.
+    ctx.obj = {
+        "config": cfg,
+        "counter": TiktokenCounter(),
+        "started": started,
+        "config_seconds": time.perf_counter() - started,
+    }
 
     if ctx.invoked_subcommand is None and not any(f in ctx.args for f in ("-h", "--help")):
-        # Use configured default model unless overridden by args in explicit call below.
-        ctx.invoke(
-            count,
-            text_or_dash=ctx.args,
-            file_path=[],
-            model=cfg.default_model,
-            as_json=False,
-            quiet=False,
-            verbose=False,
-            show_tokens=False,
-            color=_color_from_config(cfg),
-            total=False,
-        )
+        # Run `count` as if it had been named; Click fills in every option's default.
+        ctx.forward(count, text_or_dash=tuple(ctx.args))
 
 
 @main.command("models")
 @click.option("--json", "as_json", is_flag=True, help="Emit JSON output.")
 def list_models(*, as_json: bool) -> None:
     """List known supported model names and prefixes."""
+    supported = get_supported_models()
     if as_json:
-        click.echo(_json.dumps(get_supported_models(), indent=2))
+        click.echo(_json.dumps(supported, indent=2))
     else:
         click.echo("Exact models:")
-        for model in SUPPORTED_MODELS:
+        for model in supported["exact_models"]:
             click.echo(f"  - {model}")
         click.echo("\nModel name prefixes (allowed):")
-        for prefix in SUPPORTED_PREFIXES:
+        for prefix in supported["prefixes"]:
             click.echo(f"  - {prefix}*")
 
 
+def _open_cache(cfg: Config) -> TokenCache:
+    from cntkn.cache import TokenCache  # noqa: PLC0415
+
+    directory = Path(cfg.cache_dir).expanduser() if cfg.cache_dir else None
+    return TokenCache(directory, max_entries=cfg.cache_max_entries)
+
+
+@main.group("cache")
+def cache_group() -> None:
+    """Inspect or clear the persistent token-count cache."""
+
+
+@cache_group.command("stats")
+@click.option("--json", "as_json", is_flag=True, help="Emit JSON output.")
+@click.pass_context
+def cache_stats(ctx: click.Context, *, as_json: bool) -> None:
+    """Show cache location, size and entry counts."""
+    with _open_cache(ctx.obj["config"]) as cache:
+        stats = cache.stats()
+    if as_json:
+        click.echo(_json.dumps(asdict(stats), indent=2))
+        return
+    click.echo(f"Path:    {stats.path}")
+    click.echo(f"Entries: {stats.entries} / {stats.max_entries}")
+    click.echo(f"Size:    {stats.size_bytes} bytes")
+    for encoding, entries in sorted(stats.by_encoding.items()):
+        click.echo(f"  - {encoding}: {entries}")
+
+
+@cache_group.command("clear")
+@click.pass_context
+def cache_clear(ctx: click.Context) -> None:
+    """Delete every cached count."""
+    with _open_cache(ctx.obj["config"]) as cache:
+        removed = cache.clear()
+    click.echo(f"Removed {removed} cached entries.")
+
+
+def _encoding_names(
+    models: Iterable[str], encodings: Iterable[str], cfg: Config, *, every: bool
+) -> list[str]:
+    if every:
+        import tiktoken  # noqa: PLC0415
+
+        return sorted(tiktoken.list_encoding_names())
+    return list(distinct_encodings(_resolve_targets(models, encodings, cfg)))
+
+
+@main.command("warm")
+@click.option(
+    "-m",
+    "--model",
+    "models",
+    multiple=True,
+    type=MODEL_TYPE,
+    help="Model whose encoding to prepare (repeatable; defaults to config).",
+)
+@click.option(
+    "--encoding", "encodings", multiple=True, type=ENCODING_TYPE, help="Encoding to prepare (repeatable)."
+)
+@click.option("--all", "every", is_flag=True, help="Prepare every encoding tiktoken knows.")
+@click.option(
+    "--from",
+    "bundle",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=None,
+    help="Restore the encodings in a bundle from `cntkn export-encodings` instead of fetching.",
+)
+@click.option("--json", "as_json", is_flag=True, help="Emit JSON output.")
+@click.pass_context
+def warm_command(
+    ctx: click.Context,
+    models: tuple[str, ...],
+    encodings: tuple[str, ...],
+    bundle: Path | None,
+    *,
+    every: bool,
+    as_json: bool,
+) -> None:
+    """Fetch, compile and verify encodings into the encodings directory, for offline use.
+
+    Encodings already there are verified and kept; missing or corrupt ones are fetched through
+    tiktoken. Afterwards counting loads them from the directory (`encodings_dir` in config) and
+    never needs the network; set `offline = true` to make a missing encoding an error.
+    """
+    from cntkn.encodings import encodings_dir, import_bundle, warm  # noqa: PLC0415
+
+    try:
+        if bundle is not None:
+            results = import_bundle(bundle)
+        else:
+            results = warm(_encoding_names(models, encodings, ctx.obj["config"], every=every))
+    except OSError as exc:
+        raise click.ClickException(str(exc)) from exc
+    if not results:
+        msg = f"{bundle} holds no encodings."
+        raise click.ClickException(msg)
+    if as_json:
+        entries = [{**asdict(result), "path": str(result.path)} for result in results]
+        click.echo(_json.dumps({"directory": str(encodings_dir()), "encodings": entries}, indent=2))
+        return
+    for result in results:
+        click.echo(
+            f"{result.name}: {result.action} ({result.tokens} tokens, {result.size} bytes) → {result.path}"
+        )
+
+
+@main.command("export-encodings")
+@click.argument("bundle", type=click.Path(dir_okay=False, path_type=Path))
+@click.option(
+    "-m",
+    "--model",
+    "models",
+    multiple=True,
+    type=MODEL_TYPE,
+    help="Model whose encoding to pack (repeatable; defaults to every compiled encoding).",
+)
+@click.option(
+    "--encoding", "encodings", multiple=True, type=ENCODING_TYPE, help="Encoding to pack (repeatable)."
+)
+@click.pass_context
+def export_encodings_command(
+    ctx: click.Context, bundle: Path, models: tuple[str, ...], encodings: tuple[str, ...]
+) -> None:
+    """Pack compiled encodings into BUNDLE (a .tar.gz) for `cntkn warm --from` on other hosts."""
+    from cntkn.encodings import export_bundle  # noqa: PLC0415
+
+    names = (
+        _encoding_names(models, encodings, ctx.obj["config"], every=False) if models or encodings else None
+    )
+    try:
+        packed = export_bundle(bundle, names)
+    except OSError as exc:
+        raise click.ClickException(str(exc)) from exc
+    click.echo(f"Packed {', '.join(packed)} into {bundle}.")
+
+
+def _socket_path(cfg: Config) -> Path:
+    from cntkn.server import default_socket_path  # noqa: PLC0415
+
+    return Path(cfg.server_socket).expanduser() if cfg.server_socket else default_socket_path()
+
+
+@main.command("serve")
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Unix socket to listen on (defaults to config, then $XDG_RUNTIME_DIR/cntkn.sock).",
+)
+@click.option(
+    "-m",
+    "--model",
+    "models",
+    multiple=True,
+    type=MODEL_TYPE,
+    help="Model whose encoder to preload (repeatable; defaults to config).",
+)
+@click.pass_context
+def serve_command(ctx: click.Context, socket_path: Path | None, models: tuple[str, ...]) -> None:
+    """Keep encoders warm and answer count/encode requests over a Unix socket."""
+    from cntkn.server import serve  # noqa: PLC0415
+
+    cfg: Config = ctx.obj["config"]
+    path = socket_path or _socket_path(cfg)
+    click.echo(f"cntkn server listening on {path}", err=True)
+    try:
+        serve(path, models or (cfg.default_model,))
+    except OSError as exc:
+        raise click.ClickException(str(exc)) from exc
+
+
+@main.command("calibrate")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option(
+    "-m",
+    "--model",
+    "models",
+    multiple=True,
+    type=MODEL_TYPE,
+    help="Model whose encoding to calibrate (repeatable; defaults to config).",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Write the calibration TOML here instead of stdout.",
+)
+@click.pass_context
+def calibrate_command(
+    ctx: click.Context, paths: tuple[str, ...], models: tuple[str, ...], output: Path | None
+) -> None:
+    """Measure text-per-token ratios over a local corpus for `count --estimate`.
+
+    Directories are walked recursively (honouring .gitignore); files that are not UTF-8 text
+    are skipped. Point the `calibration_file` config key at the written file to use it.
+    """
+    from cntkn.estimate import calibrate, calibration_to_toml  # noqa: PLC0415
+
+    cfg: Config = ctx.obj["config"]
+    files = [p for p in paths if Path(p).is_file()]
+    files += discover_files([p for p in paths if Path(p).is_dir()], [])
+    skipped = 0
+
+    def texts() -> Iterator[str]:
+        nonlocal skipped
+        for path in files:
+            try:
+                yield read_text(Path(path))
+            except UnicodeDecodeError:
+                skipped += 1
+
+    calibrations = calibrate(texts(), models or (cfg.default_model,), counter=ctx.obj["counter"])
+    if skipped:
+        click.echo(f"Skipped {skipped} files that are not UTF-8 text.", err=True)
+    if not calibrations:
+        msg = "No text found to calibrate on."
+        raise click.ClickException(msg)
+    rendered = calibration_to_toml(calibrations, source=f"{len(files) - skipped} files")
+    if output is None:
+        click.echo(rendered, nl=False)
+    else:
+        output.write_text(rendered, encoding="utf-8")
+
+
+@main.command("watch")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(dir_okay=False, path_type=Path))
+@click.option(
+    "-m",
+    "--model",
+    default=None,
+    type=MODEL_TYPE,
+    help="Model or encoding to count with (defaults to config).",
+)
+@click.option(
+    "--interval",
+    type=click.FloatRange(min=0, min_open=True),
+    default=1.0,
+    show_default=True,
+    help="Seconds between polls.",
+)
+@click.option("--once", is_flag=True, help="Poll once, report, save the offsets and exit.")
+@click.option(
+    "--state",
+    "state_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="File keeping offsets and totals between runs (default: $XDG_STATE_HOME/cntkn/follow.json).",
+)
+@click.option("--json", "as_json", is_flag=True, help="Emit one JSON object per change (NDJSON).")
+@click.pass_context
+def watch_command(
+    ctx: click.Context,
+    paths: tuple[Path, ...],
+    model: str | None,
+    *,
+    interval: float,
+    once: bool,
+    state_path: Path | None,
+    as_json: bool,
+) -> None:
+    """Keep running token totals of growing files, encoding only what was appended.
+
+    Each poll reports the files whose total changed. Offsets persist in the state file, so
+    the next run resumes without re-reading; a rotated, truncated or rewritten file is
+    counted again from the start. Files missing at a poll are skipped until they reappear.
+    """
+    from cntkn.follow import FollowStore, default_state_path  # noqa: PLC0415
+
+    counter: TokenCounter = ctx.obj["counter"]
+    model = _resolve_targets([model] if model else [], [], ctx.obj["config"])[0]
+    store = FollowStore(state_path or default_state_path())
+    keys = {path: store.key(path, encoding_name_for_model(model)) for path in paths}
+
+    def encode(text: str) -> int:
+        return count_tokens(text, model, counter=counter)
+
+    try:
+        while True:
+            _poll_followed(store, keys, encode, as_json=as_json)
+            store.save()
+            if once:
+                return
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        store.save()
+
+
+def _poll_followed(
+    store: FollowStore, keys: Mapping[Path, str], encode: Callable[[str], int], *, as_json: bool
+) -> None:
+    """Poll each followed file once and report those whose total changed."""
+    from cntkn.follow import poll  # noqa: PLC0415
+
+    for path, key in keys.items():
+        before = store.get(key)
+        previous = before.total if before is not None else 0  # poll updates `before` in place
+        try:
+            state, restarted = poll(path, before, encode)
+        except FileNotFoundError:
+            continue  # mid-rotation, or not created yet
+        except (OSError, UnicodeDecodeError) as exc:
+            msg = f"{path}: {exc}"
+            raise click.ClickException(msg) from exc
+        store.put(key, state)
+        previous = 0 if restarted else previous
+        if before is None or restarted or state.total != previous:
+            _echo_follow(str(path), state, delta=state.total - previous, restarted=restarted, as_json=as_json)
+
+
+def _echo_follow(label: str, state: FollowState, *, delta: int, restarted: bool, as_json: bool) -> None:
+    if as_json:
+        record = {"source": label, "tokens": state.total, "delta": delta, "offset": state.size}
+        click.echo(_json.dumps({**record, "restarted": restarted}))
+    else:
+        note = " (restarted)" if restarted else ""
+        click.echo(f"{label} → {state.total} tokens ({delta:+d}){note}")
+
+
+@main.command("repo")
+@click.argument(
+    "path", default=".", type=click.Path(exists=True, file_okay=False, path_type=Path), required=False
+)
+@click.option(
+    "-m",
+    "--model",
+    default=None,
+    type=MODEL_TYPE,
+    help="Model or encoding to count with (defaults to config).",
+)
+@click.option("--rev", default="HEAD", show_default=True, help="Commit, branch or tree to count.")
+@click.option("--depth", type=click.IntRange(min=0), default=None, help="Only list directories this deep.")
+@click.option("--files", "show_files", is_flag=True, help="Also list every file's count.")
+@click.option("--json", "as_json", is_flag=True, help="Emit JSON output.")
+@click.option("--verbose", is_flag=True, help="Report how many blobs were encoded and how many were cached.")
+@click.pass_context
+def repo_command(
+    ctx: click.Context,
+    path: Path,
+    model: str | None,
+    *,
+    rev: str,
+    depth: int | None,
+    show_files: bool,
+    as_json: bool,
+    verbose: bool,
+) -> None:
+    """Token totals per directory of a git tree, re-encoding only blobs that changed.
+
+    Files are those tracked at --rev under PATH (read from git, not the working tree); counts
+    are cached by blob id in the token cache, so a run after a small commit only encodes the
+    files it touched. Binary files are skipped.
+    """
+    from cntkn.repo import NOT_TEXT, RepoError, count_tree, list_tree, rollup  # noqa: PLC0415
+
+    cfg: Config = ctx.obj["config"]
+    model = _resolve_targets([model] if model else [], [], cfg)[0]
+    try:
+        with _open_cache(cfg) as cache:
+            counts = count_tree(path, list_tree(path, rev), model, counter=ctx.obj["counter"], cache=cache)
+    except RepoError as exc:
+        raise click.ClickException(str(exc)) from exc
+    directories = rollup(counts.files, depth=depth)
+    if as_json:
+        report: dict[str, Any] = {
+            "rev": rev,
+            "model": model,
+            "total_tokens": counts.total,
+            "encoded_blobs": counts.encoded_blobs,
+            "cached_blobs": counts.cached_blobs,
+            "directories": directories,
+        }
+        if show_files:
+            report["files"] = {name: tokens for name, tokens in counts.files.items() if tokens != NOT_TEXT}
+        click.echo(_json.dumps(report, indent=2))
+        return
+    # Tab-separated like `du`, so the output sorts and cuts well.
+    for name, tokens in directories.items():
+        click.echo(f"{tokens}\t{name}")
+    for name, tokens in counts.files.items() if show_files else ():
+        if tokens != NOT_TEXT:
+            click.echo(f"{tokens}\t{name}")
+    if verbose:
+        click.echo(f"Encoded {counts.encoded_blobs} blobs, {counts.cached_blobs} from cache.", err=True)
+
+
+@main.command("split")
+@click.argument("text_or_dash", nargs=-1)
+@click.option(
+    "-f",
+    "--file",
+    "file_path",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Split the text of file(s).",
+)
+@click.option(
+    "-m",
+    "--model",
+    default=None,
+    type=MODEL_TYPE,
+    help="Model or encoding to count with (defaults to config).",
+)
+@click.option("--max-tokens", type=click.IntRange(min=1), required=True, help="Most tokens per chunk.")
+@click.option(
+    "--overlap", type=click.IntRange(min=0), default=0, show_default=True, help="Tokens each chunk repeats."
+)
+@click.option(
+    "--boundaries", is_flag=True, help="End chunks at paragraph, then sentence, breaks when possible."
+)
+@click.option("--no-text", "offsets_only", is_flag=True, help="Only report offsets and token counts.")
+@click.pass_context
+def split_command(
+    ctx: click.Context,
+    text_or_dash: tuple[str, ...],
+    file_path: tuple[str, ...],
+    model: str | None,
+    *,
+    max_tokens: int,
+    overlap: int,
+    boundaries: bool,
+    offsets_only: bool,
+) -> None:
+    """Split inputs into chunks of at most --max-tokens tokens, one NDJSON line per chunk.
+
+    Each input is encoded once; `start`/`end` are character offsets into it, and `tokens` is
+    the number of its tokens the chunk covers.
+    """
+    if overlap >= max_tokens:
+        msg = "--overlap must be smaller than --max-tokens."
+        raise click.UsageError(msg)
+    model = _resolve_targets([model] if model else [], [], ctx.obj["config"])[0]
+    sources = find_input_sources(list(text_or_dash), list(file_path))
+    _require_input(sources)
+    for source in sources:
+        try:
+            ((label, text),) = read_sources([source])
+        except UnicodeDecodeError as exc:
+            msg = f"{source[0]}: not UTF-8 text ({exc.reason})."
+            raise click.ClickException(msg) from exc
+        chunks = split_by_tokens(text, model, max_tokens=max_tokens, overlap=overlap, boundaries=boundaries)
+        for index, chunk in enumerate(chunks):
+            record: dict[str, Any] = {"source": label, "index": index}
+            record |= {"start": chunk.start, "end": chunk.end, "tokens": chunk.tokens}
+            if not offsets_only:
+                record["text"] = chunk.text
+            click.echo(_json.dumps(record, ensure_ascii=False))
+
+
 # ------------------------------- output strategy ------------------------------
 # "Use small output helpers to keep branching contained (Strategy pattern-lite)."
 def _output_json(
-    results: list[tuple[str, int | list[int]]],
+    results: Results,
     *,
     total: bool,
+    stats: RunStats | None = None,
 ) -> None:
-    if total:
-        total_count = sum(_count_tokens(enc) for _, enc in results)
-        click.echo(_json.dumps({"total_tokens": total_count}))
-        return
-    out = dict(results)
-    click.echo(_json.dumps(out, indent=2))
+    out: dict[str, Any] = (
+        {"total_tokens": sum(_count_tokens(enc) for _, enc in results)} if total else dict(results)
+    )
+    if stats is not None:
+        # Results are keyed by input label, so the stats cannot be a sibling key of them.
+        click.echo(_json.dumps({"results": out, "stats": stats.as_dict()}, indent=2))
+    elif total:
+        click.echo(_json.dumps(out))
+    else:
+        click.echo(_json.dumps(out, indent=2))
 
 
 def _output_plain(
-    results: list[tuple[str, int | list[int]]],
+    results: Results,
     *,
     verbose: bool,
     show_tokens: bool,
@@ -226,7 +808,7 @@ def _output_plain(
 
 
 def _emit_results(
-    results: list[tuple[str, int | list[int]]],
+    results: Results,
     *,
     as_json: bool,
     quiet: bool,
@@ -236,7 +818,8 @@ def _emit_results(
 ) -> None:
     """Single-responsibility output function for all modes."""
     if quiet:
-        # NOTE: Exiting early keeps behavior identical to previous implementation.
+        # Still count every input, so unreadable files fail (and the cache fills) as without --quiet.
+        collections.deque(results, maxlen=0)
         sys.exit(0)
 
     if as_json:
@@ -246,44 +829,1033 @@ def _emit_results(
     _output_plain(results, verbose=verbose, show_tokens=show_tokens, total=total)
 
 
-@main.command("count")
-@click.help_option("-h", "--help", is_eager=True)
-@click.argument("text_or_dash", nargs=-1)
-@click.option(
-    "-f",
-    "--file",
-    "file_path",
-    multiple=True,
-    type=click.Path(exists=True, dir_okay=False),
-    help="Read input text from file(s).",
-)
-@click.option(
-    "-m",
-    "--model",
-    type=MODEL_TYPE,
-    default=None,
-    show_default=False,
-    help="Model name or prefix (defaults to config).",
-)
-@click.option(
-    "-j",
-    "--json",
-    "as_json",
-    is_flag=True,
-    default=None,  # default comes from packaged defaults
-    help="Emit JSON output.",
-)
-@click.option(
-    "-q",
-    "--quiet",
-    is_flag=True,
-    default=None,  # default comes from packaged defaults
-    help="Suppress output.",
-)
-@click.option(
-    "--verbose",
-    is_flag=True,
-    default=None,  # default comes from packaged defaults
+def _emit_counts(
+    results: Iterable[tuple[str, dict[str, Result]]],
+    targets: list[str],
+    stats: RunStats | None,
+    *,
+    report: bool,
+    prom_path: Path | None,
+    as_json: bool,
+    ndjson: bool,
+    quiet: bool,
+    verbose: bool,
+    show_tokens: bool,
+    total: bool,
+    tokens_format: str = "text",
+    output: Path | None = None,
+) -> None:
+    """Pick the output for `_iter_results`: NDJSON, grouped per target, binary tokens, with stats, or plain.
+
+    NDJSON, plain lines and raw/lp tokens are written as each input finishes; JSON documents,
+    groups, .npy files and --stats runs need every result first.
+    """
+    options = {
+        "as_json": as_json,
+        "quiet": quiet,
+        "verbose": verbose,
+        "show_tokens": show_tokens,
+        "total": total,
+    }
+    if ndjson:
+        _emit_ndjson(results, targets, stats, report=report, prom_path=prom_path, **options)
+        return
+    if len(targets) > 1:
+        buffered = list(results)
+        _emit_grouped({t: [(label, r[t]) for label, r in buffered] for t in targets}, **options)
+        return
+    (target,) = targets
+    flat: Results = ((label, result[target]) for label, result in results)
+    if stats is not None:
+        # Buffer first so the output phase is not charged with reading and encoding.
+        flat = list(flat)
+    if tokens_format != "text":
+        _write_token_file(flat, tokens_format, output, quiet=quiet, stats=stats)
+        if stats is not None:
+            _report_stats(stats, report=report, prom_path=prom_path)
+        return
+    if stats is not None:
+        _emit_with_stats(flat, stats, report=report, prom_path=prom_path, **options)
+        return
+    _emit_results(flat, **options)
+
+
+def _emit_ndjson(
+    results: Iterable[tuple[str, dict[str, Result]]],
+    targets: list[str],
+    stats: RunStats | None,
+    *,
+    report: bool,
+    prom_path: Path | None,
+    as_json: bool,
+    quiet: bool,
+    verbose: bool,
+    show_tokens: bool,
+    total: bool,
+) -> None:
+    """One JSON object per input (and target) as it finishes; --total adds running sums.
+
+    With --stats, a final `{"stats": ...}` line follows the results.
+    """
+    _ = as_json, verbose  # NDJSON is always JSON and always names the input
+    if quiet:
+        collections.deque(results, maxlen=0)
+        sys.exit(0)
+    running = dict.fromkeys(targets, 0)
+    for label, by_target in results:
+        for target in targets:
+            result = by_target[target]
+            line: dict[str, Any] = {"source": label}
+            if len(targets) > 1:
+                line["model"] = target
+            line["tokens"] = _count_tokens(result)
+            if show_tokens:
+                line["token_ids"] = list(cast("Iterable[int]", result))
+            if total:
+                running[target] += line["tokens"]
+                line["total_tokens"] = running[target]
+            click.echo(_json.dumps(line))
+    if stats is not None:
+        if report:
+            click.echo(_json.dumps({"stats": stats.as_dict()}))
+        _report_stats(stats, report=False, prom_path=prom_path)
+
+
+def _emit_grouped(
+    grouped: Mapping[str, Results],
+    *,
+    as_json: bool,
+    quiet: bool,
+    verbose: bool,
+    show_tokens: bool,
+    total: bool,
+) -> None:
+    """Output for several --model/--encoding values: one group of results per target."""
+    if quiet:
+        sys.exit(0)
+    if as_json:
+        out = {
+            target: {"total_tokens": sum(_count_tokens(enc) for _, enc in results)}
+            if total
+            else dict(results)
+            for target, results in grouped.items()
+        }
+        click.echo(_json.dumps(out, indent=2))
+        return
+    for target, results in grouped.items():
+        if total:
+            click.echo(f"{target}: {sum(_count_tokens(enc) for _, enc in results)}")
+            continue
+        click.echo(f"{target}:")
+        for label, enc in results:
+            click.echo(f"  {label} → {_count_tokens(enc)} tokens" if verbose else f"  {_count_tokens(enc)}")
+            if show_tokens:
+                click.echo(f"    Tokens: {enc}")
+
+
+def _emit_with_stats(
+    results: Results,
+    stats: RunStats,
+    *,
+    report: bool,
+    prom_path: Path | None,
+    as_json: bool,
+    quiet: bool,
+    verbose: bool,
+    show_tokens: bool,
+    total: bool,
+) -> None:
+    """`_emit_results`, then the stats: inside the JSON document, else on stderr."""
+    if not quiet:
+        with stats.phase("output"):
+            if as_json:
+                _output_json(results, total=total, stats=stats if report else None)
+            else:
+                _output_plain(results, verbose=verbose, show_tokens=show_tokens, total=total)
+    _report_stats(stats, report=report and (quiet or not as_json), prom_path=prom_path)
+
+
+def _report_stats(stats: RunStats, *, report: bool, prom_path: Path | None) -> None:
+    if report:
+        click.echo(stats.format_text(), err=True)
+    if prom_path is not None:
+        stats.write_prometheus(prom_path)
+
+
+def _write_token_file(
+    results: Results, fmt: str, output: Path | None, *, quiet: bool, stats: RunStats | None = None
+) -> None:
+    """Write every input's tokens in binary `fmt` to `output`, or to stdout unless `quiet`."""
+    from cntkn.stats import maybe_phase  # noqa: PLC0415
+
+    token_lists = (cast("Iterable[int]", enc) for _, enc in results)
+    if output is not None:
+        with output.open("wb") as fh, maybe_phase(stats, "output"):
+            write_tokens(fh, token_lists, fmt)
+    elif quiet:
+        collections.deque(token_lists, maxlen=0)
+    else:
+        sys.stdout.flush()
+        with maybe_phase(stats, "output"):
+            write_tokens(sys.stdout.buffer, token_lists, fmt)
+        sys.stdout.buffer.flush()
+
+
+def _discover(
+    recursive_dirs: list[str],
+    glob_patterns: list[str],
+    *,
+    include: list[str],
+    exclude: list[str],
+    gitignore: bool,
+    stats: RunStats | None,
+) -> list[str]:
+    from cntkn.stats import maybe_phase  # noqa: PLC0415
+
+    with maybe_phase(stats, "discovery"):
+        discovered = discover_files(
+            recursive_dirs, glob_patterns, include=include, exclude=exclude, gitignore=gitignore
+        )
+    if not discovered:
+        msg = "No files matched --recursive/--glob (check --include/--exclude and .gitignore)."
+        raise click.ClickException(msg)
+    return discovered
+
+
+def _require_input(items: list[Any]) -> None:
+    if not items:
+        msg = (
+            "Error: no input provided.\n"
+            "Provide a string, `-`, file via `--file`, or pipe via stdin.\n"
+            "Example: echo 'hello world' | cntkn"
+        )
+        raise click.ClickException(msg)
+
+
+def _server_batch(
+    texts: list[str],
+    model: str,
+    *,
+    show_tokens: bool,
+    server: Path | None,
+) -> list[int | list[int]] | None:
+    """Encode via a running `cntkn serve` daemon; None means "do it in-process"."""
+    if server is None:
+        return None
+    from cntkn.server import request_tokens  # noqa: PLC0415
+
+    return _ask_server(lambda: request_tokens(texts, model, return_tokens=show_tokens, path=server))
+
+
+def _ask_server[T](request: Callable[[], T | None]) -> T | None:
+    from cntkn.server import ServerError  # noqa: PLC0415
+
+    try:
+        return request()
+    except ServerError as exc:
+        msg = f"cntkn server error: {exc}"
+        raise click.ClickException(msg) from exc
+    except OSError:
+        return None  # daemon vanished or timed out mid-request: count locally instead
+
+
+def _iter_results(
+    text_or_dash: list[str],
+    file_path: list[str],
+    models: list[str],
+    *,
+    counter: TokenCounter,
+    show_tokens: bool,
+    threads: int,
+    stream: bool,
+    chunk_size: int,
+    jobs: int,
+    batch_size: int,
+    cache: TokenCache | None,
+    server: Path | None,
+    stats: RunStats | None = None,
+    compact: bool = False,
+    prefetch: int = 0,
+    dedup: Deduplicator[dict[str, Result]] | None = None,
+) -> Iterator[tuple[str, dict[str, Result]]]:
+    """Resolve, read and encode inputs, yielding (label, {model: count-or-tokens}) in input order.
+
+    In-process inputs are encoded `batch_size` at a time (one at a time with `stream`, and for
+    files of at least `MMAP_MIN_SIZE` bytes, which are streamed from a memory map) and
+    --jobs results are yielded as workers finish, so the first result appears early and
+    memory follows the batch, not the run. With `prefetch`, reader threads load up to that
+    many in-process files ahead of the encoder. Every input is read once and encoded once per
+    distinct encoding among `models`. With `compact`, tokens are uint32 arrays. With `dedup`,
+    batched inputs repeating earlier content reuse its result instead of being encoded again.
+    """
+    from cntkn.stats import maybe_phase  # noqa: PLC0415
+
+    stream_size = chunk_size if stream else None
+    with maybe_phase(stats, "discovery"):
+        sources = find_input_sources(text_or_dash, file_path, chunk_size=stream_size)
+    _require_input(sources)
+    first_stat = len(stats.inputs) if stats is not None else 0
+
+    pooled = jobs > 1  # files go to worker processes, which read and encode them in parallel
+    paths = [src for _, src in sources if pooled and isinstance(src, Path)]
+    files: Iterator[dict[str, Result]] = iter(())
+    if paths:
+        files = _encode_files(
+            paths,
+            models,
+            jobs=jobs,
+            show_tokens=show_tokens,
+            chunk_size=stream_size,
+            cache=cache,
+            stats=stats,
+            compact=compact,
+        )
+        files = stats.timed("encode", files) if stats is not None else files
+
+    queued: Iterable[tuple[str, Source]] = sources
+    if prefetch and not pooled and not stream:
+        # Reader threads load the next files while the current batch is encoded.
+        from cntkn.pipeline import read_ahead  # noqa: PLC0415
+
+        queued = read_ahead(sources, _read_file, depth=prefetch)
+        queued = stats.timed("read", queued) if stats is not None else queued
+
+    position = 0
+    # Runs of consecutive inputs with the same route keep the results in input order.
+    for route, run in itertools.groupby(queued, key=lambda s: _route(s[1], pooled=pooled, stream=stream)):
+        # Pooled files and streamed inputs go one at a time; the rest share encoder batches.
+        size = batch_size if route == "batch" else 1
+        for batch in itertools.batched(run, size, strict=False):
+            encoded = (
+                [next(files)]
+                if route == "pool"
+                else _encode_in_process(
+                    list(batch),
+                    models,
+                    counter=counter,
+                    show_tokens=show_tokens,
+                    threads=threads,
+                    chunk_size=chunk_size if route == "stream" else None,
+                    cache=cache,
+                    server=server,
+                    stats=stats,
+                    compact=compact,
+                    dedup=dedup if route == "batch" else None,
+                )
+            )
+            for (label, _), result in zip(batch, encoded, strict=True):
+                if stats is not None:
+                    # The core labels inputs by batch index; each input records exactly once, in order.
+                    stats.inputs[first_stat + position].label = label
+                position += 1
+                yield label, result
+
+
+def _report_dedup(dedup: Deduplicator[Any], *, verbose: bool) -> None:
+    if verbose and dedup.duplicates:
+        click.echo(
+            f"Deduplicated {dedup.duplicates} of {dedup.inputs} inputs "
+            f"({dedup.saved_bytes} bytes not encoded again).",
+            err=True,
+        )
+
+
+def _route(src: Source, *, pooled: bool, stream: bool) -> str:
+    """How `_iter_results` encodes a source: "pool" (--jobs), "stream" or "batch"."""
+    if isinstance(src, Path) and pooled:
+        return "pool"
+    # Large files are streamed from a memory map even without --stream, instead of read whole.
+    if stream or (isinstance(src, Path) and is_large_file(src)):
+        return "stream"
+    return "batch"
+
+
+def _read_file(source: tuple[str, Source]) -> tuple[str, Source]:
+    label, src = source
+    if isinstance(src, Path) and not is_large_file(src):
+        return label, read_text(src)
+    return source
+
+
+def _encode_files(
+    paths: list[Path],
+    models: list[str],
+    *,
+    jobs: int,
+    show_tokens: bool,
+    chunk_size: int | None,
+    cache: TokenCache | None,
+    stats: RunStats | None,
+    compact: bool,
+) -> Iterator[dict[str, Result]]:
+    from cntkn.parallel import encode_files_multi  # noqa: PLC0415
+
+    try:
+        yield from encode_files_multi(
+            paths,
+            models,
+            jobs=jobs,
+            return_tokens=show_tokens,
+            chunk_size=chunk_size,
+            cache=cache,
+            stats=stats,
+            compact=compact,
+        )
+    except UnicodeDecodeError as exc:
+        msg = f"An input file is not valid UTF-8 text ({exc.reason}); use --exclude to skip it."
+        raise click.ClickException(msg) from exc
+
+
+def _encode_in_process(
+    sources: list[tuple[str, Source]],
+    models: list[str],
+    *,
+    counter: TokenCounter,
+    show_tokens: bool,
+    threads: int,
+    chunk_size: int | None,
+    cache: TokenCache | None,
+    server: Path | None,
+    stats: RunStats | None,
+    compact: bool,
+    dedup: Deduplicator[dict[str, Result]] | None = None,
+) -> list[dict[str, int | list[int] | array[int]]]:
+    """Encode `sources` here (or via the daemon): streamed with `chunk_size`, else batched.
+
+    Returns {model: result} per source. Stats and `compact` tokens only apply to a single model.
+    Batched texts that `dedup` has seen are not encoded again.
+    """
+    from cntkn.stats import InputStats, maybe_phase  # noqa: PLC0415
+
+    if chunk_size is not None:
+        if len(models) > 1:
+            return [
+                count_tokens_stream_multi(
+                    chunks, models, chunk_size=chunk_size, return_tokens=show_tokens, counter=counter
+                )
+                for _, chunks in stream_sources(sources, chunk_size)
+            ]
+        return [
+            {
+                models[0]: count_tokens_stream(
+                    chunks,
+                    models[0],
+                    chunk_size=chunk_size,
+                    return_tokens=show_tokens,
+                    counter=counter,
+                    stats=stats,
+                    compact=compact,
+                )
+            }
+            for _, chunks in stream_sources(sources, chunk_size)
+        ]
+    with maybe_phase(stats, "read"):
+        texts = [text for _, text in read_sources(sources)]
+
+    def encode(fresh: list[str]) -> list[dict[str, Result]]:
+        return _encode_texts(
+            fresh,
+            models,
+            counter=counter,
+            show_tokens=show_tokens,
+            threads=threads,
+            cache=cache,
+            server=server,
+            stats=stats,
+            compact=compact,
+        )
+
+    if dedup is None:
+        return encode(texts)
+    first_stat = len(stats.inputs) if stats is not None else 0
+    results, reused = dedup.apply(texts, encode)
+    if stats is not None:
+        # Repeats were not encoded, so they have no record yet; slot one in at each position.
+        recorded = iter(stats.inputs[first_stat:])
+        stats.inputs[first_stat:] = [
+            InputStats(
+                "", bytes_read=len(text.encode("utf-8")), tokens=_count_tokens(result[models[0]]), seconds=0.0
+            )
+            if repeat
+            else next(recorded)
+            for text, result, repeat in zip(texts, results, reused, strict=True)
+        ]
+    # Repeats share result lists, but each input gets its own {model: result} mapping.
+    return [dict(result) for result in results]
+
+
+def _encode_texts(
+    texts: list[str],
+    models: list[str],
+    *,
+    counter: TokenCounter,
+    show_tokens: bool,
+    threads: int,
+    cache: TokenCache | None,
+    server: Path | None,
+    stats: RunStats | None,
+    compact: bool,
+) -> list[dict[str, Result]]:
+    """Encode `texts` in one batch (or via the daemon), returning {model: result} per text."""
+    from cntkn.stats import maybe_phase  # noqa: PLC0415
+
+    with maybe_phase(stats if server is not None else None, "server"):
+        by_model = _server_multi(texts, models, show_tokens=show_tokens, server=server)
+    if by_model is None:
+        # Encode all inputs in one batch so tiktoken can spread them across threads.
+        by_model = (
+            count_tokens_multi(
+                texts, models, num_threads=threads, return_tokens=show_tokens, counter=counter, cache=cache
+            )
+            if len(models) > 1
+            else {
+                models[0]: count_tokens_batch(
+                    texts,
+                    models[0],
+                    num_threads=threads,
+                    return_tokens=show_tokens,
+                    counter=counter,
+                    cache=cache,
+                    stats=stats,
+                    compact=compact,
+                )
+            }
+        )
+    else:
+        _record_remote(stats, texts, by_model[models[0]])
+        if compact and show_tokens:
+            by_model = {
+                m: [to_array(cast("list[int]", r)) for r in results] for m, results in by_model.items()
+            }
+    return [{model: by_model[model][k] for model in models} for k in range(len(texts))]
+
+
+def _record_remote(stats: RunStats | None, texts: list[str], results: Sequence[int | list[int]]) -> None:
+    if stats is not None:
+        # The daemon does not report per-input encode times, only the round trip.
+        for text, result in zip(texts, results, strict=True):
+            stats.record("", bytes_read=len(text.encode("utf-8")), tokens=_count_tokens(result), seconds=0.0)
+
+
+def _server_multi(
+    texts: list[str],
+    models: list[str],
+    *,
+    show_tokens: bool,
+    server: Path | None,
+) -> dict[str, list[int | list[int]]] | None:
+    """`_server_batch` for each of `models` in one request; None means "do it in-process".
+
+    The daemon resolves the names and encodes once per distinct encoding among them.
+    """
+    if server is None:
+        return None
+    from cntkn.server import request_tokens_multi  # noqa: PLC0415
+
+    return _ask_server(lambda: request_tokens_multi(texts, models, return_tokens=show_tokens, path=server))
+
+
+def _check_targets(
+    targets: list[str], models: Iterable[str], encodings: Iterable[str], *, server: Path | None
+) -> Path | None:
+    """Check the names given to `count`; return `server` if a daemon answers for them, else None.
+
+    A daemon resolves names itself (an empty request checks them), so a `--server` client never
+    loads tiktoken; without one the names are checked here, where tiktoken is needed anyway.
+    """
+    if server is not None and _server_multi([], targets, show_tokens=False, server=server) is not None:
+        return server
+    for model in models:
+        ModelName.check(model)
+    for encoding in encodings:
+        EncodingName.check(encoding)
+    return None
+
+
+def _check_exclusive_modes(
+    *,
+    show_tokens: bool,
+    estimate: bool,
+    max_tokens: int | None,
+    record_format: str | None,
+    stats: bool = False,
+    several_targets: bool = False,
+    ndjson: bool = False,
+    follow: bool = False,
+) -> None:
+    """Reject combinations of the alternative counting modes.
+
+    --stats, --ndjson and several --model/--encoding values only combine with plain counting
+    (and --tokens); --follow also takes --ndjson.
+    """
+    modes = [
+        flag
+        for flag, enabled in (
+            ("--tokens", show_tokens),
+            ("--estimate", estimate),
+            ("--max-tokens", max_tokens is not None),
+            (f"--{record_format}", record_format is not None),
+            ("--follow", follow),
+        )
+        if enabled
+    ]
+    if len(modes) > 1:
+        msg = f"{modes[0]} cannot be combined with {modes[1]}."
+        raise click.UsageError(msg)
+    other = next((m for m in modes if m != "--tokens"), None)
+    for flag, enabled in (
+        ("--stats", stats),
+        ("--ndjson", ndjson and other != "--follow"),
+        ("Several --model/--encoding values", several_targets),
+    ):
+        if enabled and other is not None:
+            msg = f"{flag} cannot be combined with {other}."
+            raise click.UsageError(msg)
+    if stats and several_targets:
+        msg = "--stats supports a single --model/--encoding."
+        raise click.UsageError(msg)
+
+
+def _check_token_output(
+    tokens_format: str, output: Path | None, *, as_json: bool, several_targets: bool, ndjson: bool = False
+) -> None:
+    """Binary token formats replace the normal output, so they take no --json, --ndjson or model grouping."""
+    if ndjson and as_json:
+        msg = "--ndjson cannot be combined with --json."
+        raise click.UsageError(msg)
+    if tokens_format == "text":
+        if output is not None:
+            msg = "--output needs a binary --tokens-format (raw, npy or lp)."
+            raise click.UsageError(msg)
+        return
+    if as_json or ndjson:
+        msg = (
+            f"--tokens-format {tokens_format} cannot be combined with {'--json' if as_json else '--ndjson'}."
+        )
+        raise click.UsageError(msg)
+    if several_targets:
+        msg = f"--tokens-format {tokens_format} supports a single --model/--encoding."
+        raise click.UsageError(msg)
+    if output is None and sys.stdout.isatty():
+        msg = "Refusing to write binary tokens to a terminal; pipe the output or pass --output."
+        raise click.UsageError(msg)
+
+
+def _check_record_mode(record_format: str, fields: Sequence[str], *, jobs: int) -> None:
+    if not fields:
+        msg = f"--{record_format} needs at least one --field/--column to count."
+        raise click.UsageError(msg)
+    if jobs > 1:
+        msg = f"--{record_format} cannot be combined with --jobs."
+        raise click.UsageError(msg)
+
+
+def _follow(
+    ctx: click.Context, text_or_dash: list[str], file_path: list[str], model: str, *, as_json: bool
+) -> None:
+    """Run `count --follow` as `cntkn watch` over the -f (and discovered) files."""
+    if text_or_dash or not file_path:
+        msg = "--follow needs files (-f, -r or --glob) and no inline text or stdin."
+        raise click.UsageError(msg)
+    ctx.invoke(
+        watch_command,
+        paths=tuple(Path(p) for p in file_path),
+        model=model,
+        interval=1.0,
+        once=False,
+        state_path=None,
+        as_json=as_json,
+    )
+
+
+def _resolve_targets(models: Iterable[str], encodings: Iterable[str], cfg: Config) -> list[str]:
+    """Return the models and encodings to count with, in order, or the configured default model."""
+    targets = list(dict.fromkeys([*models, *encodings]))
+    if targets:
+        return targets
+    default = cfg.default_model or COUNT_DEFAULTS["model"]
+    if not isinstance(default, str) or not default.strip():
+        msg = (
+            "Configured default model must be a non-empty string. "
+            "Check [tool.cntkn].default_model in your pyproject.toml "
+            "or pass --model explicitly."
+        )
+        raise click.ClickException(msg)
+    return [default]
+
+
+def _start_stats(obj: Mapping[str, Any]) -> RunStats:
+    """Start the run's stats from when `main` began, charging it the config load."""
+    from cntkn.stats import RunStats  # noqa: PLC0415
+
+    stats = RunStats(started=obj.get("started"))
+    stats.add_time("config", obj.get("config_seconds", 0.0))
+    return stats
+
+
+# ------------------------------- token budget ---------------------------------
+def _count_within(
+    source: Source,
+    resolved_model: str,
+    budget: int,
+    *,
+    counter: TokenCounter,
+    chunk_size: int,
+) -> int:
+    """Count `source` but stop once it exceeds `budget`; a result above `budget` is a lower bound."""
+    if isinstance(source, str):
+        return cast("int", count_tokens(source, resolved_model, counter=counter, limit=budget))
+    if isinstance(source, Path) and isinstance(counter, TiktokenCounter) and not detect_compression(source):
+        # The file size bounds the count from below, so oversized files are never read. Reading
+        # translates CRLF to LF, which can halve the text, so only half the size is relied on.
+        bound = min_tokens((source.stat().st_size + 1) // 2, resolved_model)
+        if bound > budget:
+            return bound
+    ((_, chunks),) = stream_sources([("", source)], chunk_size)
+    return cast(
+        "int",
+        count_tokens_stream(chunks, resolved_model, chunk_size=chunk_size, counter=counter, limit=budget),
+    )
+
+
+def _collect_limited(
+    text_or_dash: list[str],
+    file_path: list[str],
+    resolved_model: str,
+    *,
+    counter: TokenCounter,
+    limit: int,
+    total: bool,
+    chunk_size: int,
+) -> list[tuple[str, int | None]]:
+    """Return (label, count) pairs, with None for inputs over budget.
+
+    With `total` the budget is shared: inputs are counted against what is left of it, and
+    counting stops at the first input that exhausts it (reported as the last, None, entry).
+    """
+    size = limit_chunk_size(limit, chunk_size)
+    sources = find_input_sources(text_or_dash, file_path, chunk_size=size)
+    _require_input(sources)
+    results: list[tuple[str, int | None]] = []
+    used = 0
+    for label, source in sources:
+        budget = limit - used if total else limit
+        n = _count_within(source, resolved_model, budget, counter=counter, chunk_size=size)
+        if n > budget:
+            results.append((label, None))
+            if total:
+                break
+        else:
+            results.append((label, n))
+            used += n
+    return results
+
+
+def _emit_limited(
+    results: list[tuple[str, int | None]],
+    *,
+    limit: int,
+    as_json: bool,
+    quiet: bool,
+    verbose: bool,
+    total: bool,
+) -> bool:
+    """Print budget-checked counts (null / ">N" when over) and return True if any was over."""
+    over = any(n is None for _, n in results)
+    if quiet:
+        return over
+    if total:
+        value = None if over else sum(cast("int", n) for _, n in results)
+        plain = f">{limit}" if value is None else str(value)
+        click.echo(_json.dumps({"total_tokens": value}) if as_json else plain)
+    elif as_json:
+        click.echo(_json.dumps(dict(results), indent=2))
+    else:
+        for label, n in results:
+            shown = f">{limit}" if n is None else str(n)
+            click.echo(f"{label} → {shown} tokens" if verbose else shown)
+    if over:
+        click.echo(f"Token budget of {limit} exceeded.", err=True)
+    return over
+
+
+# ------------------------------- estimates ------------------------------------
+def _collect_estimates(
+    text_or_dash: list[str],
+    file_path: list[str],
+    resolved_model: str,
+    *,
+    counter: TokenCounter,
+    samples: int,
+    calibration_file: str,
+    chunk_size: int,
+) -> list[tuple[str, Estimate]]:
+    """Estimate each input: files by seeking to samples, stdin in one streaming pass."""
+    from cntkn.estimate import (  # noqa: PLC0415
+        estimate_file_tokens,
+        estimate_tokens,
+        estimate_tokens_stream,
+        load_calibration,
+    )
+
+    sources = find_input_sources(text_or_dash, file_path, chunk_size=chunk_size)
+    _require_input(sources)
+    calibration = load_calibration(Path(calibration_file).expanduser()) if calibration_file else None
+    options = {"sample_count": samples, "calibration": calibration, "counter": counter}
+    results: list[tuple[str, Estimate]] = []
+    for label, source in sources:
+        if isinstance(source, Path):
+            estimator, arg = estimate_file_tokens, source
+        elif isinstance(source, str):
+            estimator, arg = estimate_tokens, source
+        else:
+            ((_, arg),) = stream_sources([(label, source)], chunk_size)
+            estimator = estimate_tokens_stream
+        try:
+            results.append((label, estimator(arg, resolved_model, **options)))
+        except KeyError as exc:  # the model's encoding has no calibration
+            raise click.ClickException(exc.args[0]) from exc
+    return results
+
+
+def _emit_estimates(
+    results: list[tuple[str, Estimate]],
+    *,
+    as_json: bool,
+    quiet: bool,
+    verbose: bool,
+    total: bool,
+) -> None:
+    if quiet:
+        return
+    if total:
+        # Summing interval bounds is conservative: it assumes every input errs the same way.
+        summed = {
+            "total_tokens": sum(est.tokens for _, est in results),
+            "low": sum(est.low for _, est in results),
+            "high": sum(est.high for _, est in results),
+        }
+        click.echo(_json.dumps(summed) if as_json else str(summed["total_tokens"]))
+    elif as_json:
+        click.echo(_json.dumps({label: asdict(est) for label, est in results}, indent=2))
+    else:
+        for label, est in results:
+            if verbose:
+                click.echo(f"{label} → ~{est.tokens} tokens (95% CI {est.low}..{est.high}, {est.method})")
+            else:
+                click.echo(str(est.tokens))
+
+
+# ------------------------------- record mode ----------------------------------
+def _record_streams(text_or_dash: list[str], file_path: list[str]) -> Iterator[tuple[str, TextIO]]:
+    """Yield (label, open text stream) for record mode, opening files one at a time."""
+    for p in file_path:
+        # newline="" lets the csv module handle quoted line breaks itself.
+        with open_text(Path(p), newline="") as fh:
+            yield p, fh
+    for t in text_or_dash:
+        if t == "-":
+            _require_stdin()
+            yield "stdin", sys.stdin
+        else:
+            yield t, io.StringIO(t)
+    if not file_path and not text_or_dash and not sys.stdin.isatty():
+        yield "stdin", sys.stdin
+
+
+def _utf8_lines(label: str, stream: TextIO) -> Iterator[str]:
+    try:
+        yield from stream
+    except UnicodeDecodeError as exc:
+        msg = f"{label} is not valid UTF-8 text ({exc.reason})."
+        raise click.ClickException(msg) from exc
+
+
+def _iter_records(
+    lines: Iterable[str],
+    record_format: str,
+    fields: Sequence[str],
+    id_field: str | None,
+) -> Iterator[Record]:
+    from cntkn.records import iter_csv_records, iter_jsonl_records, parse_field_path  # noqa: PLC0415
+
+    try:
+        if record_format == "csv":
+            return iter_csv_records(lines, fields, id_column=id_field)
+        paths = [parse_field_path(f) for f in fields]
+        id_path = parse_field_path(id_field) if id_field is not None else None
+    except ValueError as exc:  # unknown CSV column or malformed field path
+        raise click.BadParameter(str(exc), param_hint="--field/--id-field") from exc
+    return iter_jsonl_records(lines, paths, id_field=id_path)
+
+
+def _count_record_sources(
+    sources: Iterator[tuple[str, TextIO]],
+    encode_batch: Callable[[list[str]], Sequence[int]],
+    *,
+    record_format: str,
+    fields: Sequence[str],
+    id_field: str | None,
+    batch_size: int,
+    emit: bool,
+    labelled: bool,
+) -> tuple[int, int, int]:
+    """Write one NDJSON line per record as batches complete; return (records, errors, tokens).
+
+    With `labelled`, each line also names its source (used when there are several).
+    """
+    from cntkn.records import count_records, record_result  # noqa: PLC0415
+
+    records = errors = tokens_total = 0
+    for label, stream in sources:
+        lines = _utf8_lines(label, stream)
+        for record, tokens in count_records(
+            _iter_records(lines, record_format, fields, id_field), encode_batch, batch_size=batch_size
+        ):
+            records += 1
+            if tokens is None:
+                errors += 1
+            else:
+                tokens_total += tokens
+            if emit:
+                result = record_result(
+                    record, tokens, with_id=id_field is not None, source=label if labelled else None
+                )
+                sys.stdout.write(_json.dumps(result, ensure_ascii=False) + "\n")
+    return records, errors, tokens_total
+
+
+def _run_records(
+    text_or_dash: list[str],
+    file_path: list[str],
+    resolved_model: str,
+    *,
+    counter: TokenCounter,
+    cache: TokenCache | None,
+    server: Path | None,
+    threads: int,
+    record_format: str,
+    fields: Sequence[str],
+    id_field: str | None,
+    batch_size: int,
+    as_json: bool,
+    quiet: bool,
+    total: bool,
+) -> None:
+    """Count records; exit with status 1 if any record could not be counted."""
+
+    def encode_batch(texts: list[str]) -> list[int]:
+        batch = _server_batch(texts, resolved_model, show_tokens=False, server=server)
+        if batch is None:
+            batch = count_tokens_batch(
+                texts, resolved_model, num_threads=threads, counter=counter, cache=cache
+            )
+        return cast("list[int]", batch)
+
+    if not file_path and not text_or_dash and sys.stdin.isatty():
+        _require_input([])
+    records, errors, tokens = _count_record_sources(
+        _record_streams(text_or_dash, file_path),
+        encode_batch,
+        record_format=record_format,
+        fields=fields,
+        id_field=id_field,
+        batch_size=batch_size,
+        emit=not (quiet or total),
+        labelled=len(file_path) + len(text_or_dash) > 1,
+    )
+    if total and not quiet:
+        click.echo(_json.dumps({"total_tokens": tokens, "records": records}) if as_json else str(tokens))
+    if errors:
+        click.echo(f"{errors} of {records} records could not be counted.", err=True)
+        sys.exit(1)
+
+
+@main.command("count")
+@click.help_option("-h", "--help", is_eager=True)
+@click.argument("text_or_dash", nargs=-1)
+@click.option(
+    "-f",
+    "--file",
+    "file_path",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Read input text from file(s).",
+)
+@click.option(
+    "-r",
+    "--recursive",
+    "recursive_dirs",
+    multiple=True,
+    type=click.Path(exists=True, file_okay=False),
+    help="Read every file under directory DIR.",
+)
+@click.option(
+    "-g",
+    "--glob",
+    "glob_patterns",
+    multiple=True,
+    help="Read files matching a glob pattern ('**' recurses).",
+)
+@click.option("--include", multiple=True, help="Only keep discovered files matching this glob.")
+@click.option("--exclude", multiple=True, help="Skip discovered files matching this glob.")
+@click.option(
+    "--gitignore/--no-gitignore",
+    default=None,  # default comes from packaged defaults
+    help="Honour .gitignore files in --recursive directories.",
+)
+@click.option(
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=None,  # default comes from packaged defaults
+    help="Worker processes used to read and encode files.",
+)
+@click.option(
+    "-m",
+    "--model",
+    "models",
+    multiple=True,
+    type=DEFERRED_MODEL_TYPE,
+    help="Model name or prefix (repeatable; defaults to config).",
+)
+@click.option(
+    "--encoding",
+    "encodings",
+    multiple=True,
+    type=DEFERRED_ENCODING_TYPE,
+    help="Count with this tiktoken encoding directly (repeatable).",
+)
+@click.option(
+    "-j",
+    "--json",
+    "as_json",
+    is_flag=True,
+    default=None,  # default comes from packaged defaults
+    help="Emit JSON output.",
+)
+@click.option(
+    "--ndjson",
+    is_flag=True,
+    default=None,  # default comes from packaged defaults
+    help="Emit one JSON line per input as soon as it is counted (--total adds running sums).",
+)
+@click.option(
+    "--follow",
+    is_flag=True,
+    default=None,  # default comes from packaged defaults
+    help="Keep polling the -f files and report their running totals as they grow (see `cntkn watch`).",
+)
+@click.option(
+    "-q",
+    "--quiet",
+    is_flag=True,
+    default=None,  # default comes from packaged defaults
+    help="Suppress output.",
+)
+@click.option(
+    "--verbose",
+    is_flag=True,
+    default=None,  # default comes from packaged defaults
     help="Show detailed output.",
 )
 @click.option(
@@ -294,6 +1866,19 @@ def _emit_results(
     default=None,  # default comes from packaged defaults
     help="Show tokens instead of counts.",
 )
+@click.option(
+    "--tokens-format",
+    type=click.Choice(["text", "raw", "npy", "lp"]),
+    default=None,  # default comes from packaged defaults
+    help="Token output: text, or uint32 binary as raw, .npy or length-prefixed `lp` (implies --tokens).",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    default=None,
+    help="Write binary --tokens-format output to this file instead of stdout.",
+)
 @click.option(
     "--total",
     is_flag=True,
@@ -306,42 +1891,169 @@ def _emit_results(
     default=None,
     help="Force-enable or disable color output.",
 )
+@click.option(
+    "--threads",
+    type=click.IntRange(min=1),
+    default=None,  # default comes from packaged defaults
+    help="Number of encoder threads for multiple inputs.",
+)
+@click.option(
+    "--cache/--no-cache",
+    "use_cache",
+    default=None,  # default comes from config
+    help="Reuse token counts from the on-disk cache (not used with --stream or --tokens).",
+)
+@click.option(
+    "--server",
+    "use_server",
+    is_flag=True,
+    default=None,  # default comes from packaged defaults
+    help="Count via a running `cntkn serve` daemon, falling back to in-process counting.",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    default=None,  # default comes from packaged defaults
+    help="Read and encode inputs in chunks with constant memory.",
+)
+@click.option(
+    "--prefetch",
+    type=click.IntRange(min=0),
+    default=None,  # default comes from packaged defaults
+    help="Files read ahead of the encoder, and results queued for output (0: no pipelining).",
+)
+@click.option(
+    "--chunk-size",
+    type=click.IntRange(min=1),
+    default=None,  # default comes from packaged defaults
+    help="Characters read per chunk in --stream mode.",
+)
+@click.option(
+    "--estimate",
+    is_flag=True,
+    default=None,  # default comes from packaged defaults
+    help="Estimate counts from sampled windows (fast, approximate; --json adds a 95% interval).",
+)
+@click.option(
+    "--samples",
+    type=click.IntRange(min=0),
+    default=None,  # default comes from packaged defaults
+    help="Windows encoded per input with --estimate (0: calibrated ratio only).",
+)
+@click.option(
+    "--max-tokens",
+    type=click.IntRange(min=0),
+    default=None,
+    help=f"Stop encoding once an input (or the --total sum) exceeds N tokens; exit {EXIT_OVER_BUDGET} if so.",
+)
+@click.option(
+    "--jsonl",
+    "record_format",
+    flag_value="jsonl",
+    default=None,
+    help="Treat inputs as JSON Lines and count --field per record (NDJSON output).",
+)
+@click.option(
+    "--csv",
+    "record_format",
+    flag_value="csv",
+    help="Treat inputs as CSV with a header row and count --column per row (NDJSON output).",
+)
+@click.option(
+    "--field",
+    "--column",
+    "fields",
+    multiple=True,
+    help="Dotted JSON path (e.g. messages.content) or CSV column to count; repeatable.",
+)
+@click.option("--id-field", help="Field or column copied into each result as `id`.")
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=None,  # default comes from packaged defaults
+    help="Inputs, or --jsonl/--csv records, encoded per batch.",
+)
+@click.option(
+    "--stats",
+    is_flag=True,
+    default=None,
+    help="Report phase timings, bytes, tokens and throughput (stderr, or inside --json output).",
+)
+@click.option(
+    "--stats-prom",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    default=None,
+    help="Also write the stats to this file in Prometheus textfile format.",
+)
 @click.pass_context
-def count(
+def count(  # noqa: PLR0914
     ctx: click.Context,
     text_or_dash: list[str],
     file_path: list[str],
-    model: str | None,
+    models: list[str],
     *,
+    encodings: list[str],
+    recursive_dirs: list[str],
+    glob_patterns: list[str],
+    include: list[str],
+    exclude: list[str],
+    gitignore: bool | None,
+    jobs: int | None,
+    use_cache: bool | None,
+    use_server: bool | None,
     as_json: bool | None,
+    ndjson: bool | None,
+    follow: bool | None,
     quiet: bool | None,
     verbose: bool | None,
     show_tokens: bool | None,
+    tokens_format: str | None,
+    output: Path | None,
     total: bool | None,
     color: bool | None,
+    threads: int | None,
+    stream: bool | None,
+    prefetch: int | None,
+    chunk_size: int | None,
+    record_format: str | None,
+    fields: list[str],
+    id_field: str | None,
+    batch_size: int | None,
+    max_tokens: int | None,
+    estimate: bool | None,
+    samples: int | None,
+    stats: bool | None,
+    stats_prom: Path | None,
 ) -> None:
     # "Main command for counting tokens. Handles CLI args, resolves inputs, and delegates to core logic."
     cfg: Config = ctx.obj["config"]
     counter: TokenCounter = ctx.obj["counter"]
 
     # Resolve effective defaults (package → config → CLI flag)
-    resolved_model = model or cfg.default_model or COUNT_DEFAULTS["model"]
-
-    if not isinstance(resolved_model, str) or not resolved_model.strip():
-        msg = (
-            "Configured default model must be a non-empty string. "
-            "Check [tool.cntkn].default_model in your pyproject.toml "
-            "or pass --model explicitly."
-        )
-        raise click.ClickException(msg)
+    targets = _resolve_targets(models, encodings, cfg)
+    resolved_model = targets[0]
 
     # Derive flag defaults from packaged defaults when flags are omitted.
     # NOTE: color remains unused for now; we still parse/support the option.
     as_json = COUNT_DEFAULTS["json"] if as_json is None else as_json
+    ndjson = COUNT_DEFAULTS["ndjson"] if ndjson is None else ndjson
     quiet = COUNT_DEFAULTS["quiet"] if quiet is None else quiet
     verbose = COUNT_DEFAULTS["verbose"] if verbose is None else verbose
-    show_tokens = COUNT_DEFAULTS["tokens"] if show_tokens is None else show_tokens
+    tokens_format = COUNT_DEFAULTS["tokens_format"] if tokens_format is None else tokens_format
+    show_tokens = (
+        COUNT_DEFAULTS["tokens"] if show_tokens is None else show_tokens
+    ) or tokens_format != "text"
     total = COUNT_DEFAULTS["total"] if total is None else total
+    threads = COUNT_DEFAULTS["threads"] if threads is None else threads
+    stream = COUNT_DEFAULTS["stream"] if stream is None else stream
+    batch_size = COUNT_DEFAULTS["batch_size"] if batch_size is None else batch_size
+    prefetch = COUNT_DEFAULTS["prefetch"] if prefetch is None else prefetch
+    chunk_size = COUNT_DEFAULTS["chunk_size"] if chunk_size is None else chunk_size
+    gitignore = COUNT_DEFAULTS["gitignore"] if gitignore is None else gitignore
+    jobs = COUNT_DEFAULTS["jobs"] if jobs is None else jobs
+    use_server = COUNT_DEFAULTS["server"] if use_server is None else use_server
+    stats = COUNT_DEFAULTS["stats"] if stats is None else stats
+    run_stats = _start_stats(ctx.obj) if stats or stats_prom is not None else None
     # ----------------- removed dead code (no color output implemented yet) -----------------
     # NOTE: Previously computed resolved_color; it wasn't used anywhere.
     # Keeping the option for future ANSI output, but removing the unused computation.
@@ -352,27 +2064,133 @@ def count(
     # --------------------------------------------------------------------------------------
     _ = color  # intentionally unused until ANSI output is implemented
 
-    texts = resolve_input_texts(text_or_dash, file_path)
-
-    if not texts:
-        msg = (
-            "Error: no input provided.\n"
-            "Provide a string, `-`, file via `--file`, or pipe via stdin.\n"
-            "Example: echo 'hello world' | cntkn"
+    if recursive_dirs or glob_patterns:
+        discovered = _discover(
+            recursive_dirs,
+            glob_patterns,
+            include=include,
+            exclude=exclude,
+            gitignore=gitignore,
+            stats=run_stats,
         )
-        raise click.ClickException(msg)
+        file_path = [*file_path, *discovered]
 
-    # Build results once; resolve_input_texts already materialized (label, text)
-    results: list[tuple[str, int | list[int]]] = []
-    for label, text in texts:
-        enc = count_tokens(text, resolved_model, return_tokens=show_tokens, counter=counter)
-        results.append((label, enc))
-
-    _emit_results(
-        results,
-        as_json=as_json,
-        quiet=quiet,
-        verbose=verbose,
+    use_cache = cfg.cache_enabled if use_cache is None else use_cache
+    server = _check_targets(targets, models, encodings, server=_socket_path(cfg) if use_server else None)
+    estimate = COUNT_DEFAULTS["estimate"] if estimate is None else estimate
+    follow = COUNT_DEFAULTS["follow"] if follow is None else follow
+    _check_exclusive_modes(
         show_tokens=show_tokens,
-        total=total,
+        estimate=estimate,
+        max_tokens=max_tokens,
+        record_format=record_format,
+        stats=run_stats is not None,
+        several_targets=len(targets) > 1,
+        ndjson=ndjson,
+        follow=follow,
+    )
+    _check_token_output(
+        tokens_format, output, as_json=as_json, several_targets=len(targets) > 1, ndjson=ndjson
     )
+    if follow:
+        _follow(ctx, text_or_dash, file_path, targets[0], as_json=as_json or ndjson)
+        return
+    if estimate:
+        estimates = _collect_estimates(
+            text_or_dash,
+            file_path,
+            resolved_model,
+            counter=counter,
+            samples=COUNT_DEFAULTS["samples"] if samples is None else samples,
+            calibration_file=cfg.calibration_file,
+            chunk_size=chunk_size,
+        )
+        _emit_estimates(estimates, as_json=as_json, quiet=quiet, verbose=verbose, total=total)
+        return
+    if max_tokens is not None:
+        limited = _collect_limited(
+            text_or_dash,
+            file_path,
+            resolved_model,
+            counter=counter,
+            limit=max_tokens,
+            total=total,
+            chunk_size=chunk_size,
+        )
+        if _emit_limited(
+            limited, limit=max_tokens, as_json=as_json, quiet=quiet, verbose=verbose, total=total
+        ):
+            sys.exit(EXIT_OVER_BUDGET)
+        return
+    if record_format is not None:
+        _check_record_mode(record_format, fields, jobs=jobs)
+        with _open_cache(cfg) if use_cache else nullcontext() as cache:
+            _run_records(
+                text_or_dash,
+                file_path,
+                resolved_model,
+                counter=counter,
+                cache=cache,
+                server=server,
+                threads=threads,
+                record_format=record_format,
+                fields=fields,
+                id_field=id_field,
+                batch_size=batch_size,
+                as_json=as_json,
+                quiet=quiet,
+                total=total,
+            )
+        return
+
+    from cntkn.dedup import Deduplicator  # noqa: PLC0415
+
+    # Token lists are not kept across batches, so with --tokens memory still follows the batch.
+    dedup: Deduplicator[dict[str, Result]] = Deduplicator(keep_chars=0) if show_tokens else Deduplicator()
+    # The writer (this thread) emits while a pipeline thread reads and encodes the next inputs;
+    # closing stops that thread before the cache closes, even if output fails. --jobs workers
+    # already encode apart from the writer, and forking them from a thread risks deadlocks.
+    from cntkn.pipeline import run_ahead  # noqa: PLC0415
+
+    with (
+        _open_cache(cfg) if use_cache else nullcontext() as cache,
+        closing(
+            run_ahead(
+                _iter_results(
+                    text_or_dash,
+                    file_path,
+                    targets,
+                    counter=counter,
+                    show_tokens=show_tokens,
+                    threads=threads,
+                    stream=stream,
+                    chunk_size=chunk_size,
+                    jobs=jobs,
+                    batch_size=batch_size,
+                    cache=cache,
+                    server=server,
+                    stats=run_stats,
+                    compact=tokens_format != "text",
+                    prefetch=prefetch,
+                    dedup=dedup,
+                ),
+                depth=prefetch if jobs == 1 else 0,
+            )
+        ) as results,
+    ):
+        _emit_counts(
+            results,
+            targets,
+            run_stats,
+            report=stats,
+            prom_path=stats_prom,
+            as_json=as_json,
+            ndjson=ndjson,
+            quiet=quiet,
+            verbose=verbose,
+            show_tokens=show_tokens,
+            total=total,
+            tokens_format=tokens_format,
+            output=output,
+        )
+    _report_dedup(dedup, verbose=verbose)
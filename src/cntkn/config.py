@@ -8,39 +8,90 @@ from typing import Any
 
 from .defaults import package_defaults
 
+_PKG_DEFAULTS = package_defaults()
+_PKG_CONFIG = _PKG_DEFAULTS["config"]
+
 
 # "Configuration holder for cntkn; values are read-only at runtime."
 @dataclass(frozen=True, slots=True)
 class Config:
     # Initialize from packaged defaults so there are no hard-coded literals here.
-    _PKG_DEFAULTS = package_defaults()
-    default_model: str = _PKG_DEFAULTS["config"].get("default_model", _PKG_DEFAULTS["core"]["default_model"])
-    color_mode: str = _PKG_DEFAULTS["config"].get("color", "auto")  # "auto" | "on" | "off"
+    default_model: str = _PKG_CONFIG.get("default_model", _PKG_DEFAULTS["core"]["default_model"])
+    color_mode: str = _PKG_CONFIG.get("color", "auto")  # "auto" | "on" | "off"
+    cache_enabled: bool = _PKG_CONFIG.get("cache", False)
+    cache_dir: str = _PKG_CONFIG.get("cache_dir", "")  # "" -> $XDG_CACHE_HOME/cntkn
+    cache_max_entries: int = _PKG_CONFIG.get("cache_max_entries", 1_000_000)
+    server_socket: str = _PKG_CONFIG.get("server_socket", "")  # "" -> $XDG_RUNTIME_DIR/cntkn.sock
+    calibration_file: str = _PKG_CONFIG.get("calibration_file", "")  # "" -> packaged calibration.toml
+    encodings_dir: str = _PKG_CONFIG.get("encodings_dir", "")  # "" -> $XDG_CACHE_HOME/cntkn/encodings
+    offline: bool = _PKG_CONFIG.get("offline", False)
 
     @staticmethod
     def _coerce_str(dct: dict[str, Any], key: str, default: str) -> str:
         value = dct.get(key, default)
         return value if isinstance(value, str) and value else default
 
+    @staticmethod
+    def _coerce_bool(dct: dict[str, Any], key: str, default: bool) -> bool:  # noqa: FBT001
+        value = dct.get(key, default)
+        return value if isinstance(value, bool) else default
+
+    @staticmethod
+    def _coerce_int(dct: dict[str, Any], key: str, default: int) -> int:
+        value = dct.get(key, default)
+        return value if isinstance(value, int) and not isinstance(value, bool) and value > 0 else default
+
     @staticmethod
     def _coerce_color(value: str, default: str = "auto") -> str:
         allowed = {"auto", "on", "off"}
         return value if value in allowed else default
 
+    @classmethod
+    def _from_table(cls, table: dict[str, Any], base: Config | None = None) -> Config:
+        base = base or cls()
+        color_raw = cls._coerce_str(table, "color", base.color_mode)
+        return cls(
+            default_model=cls._coerce_str(table, "default_model", base.default_model),
+            color_mode=cls._coerce_color(color_raw),
+            cache_enabled=cls._coerce_bool(table, "cache", base.cache_enabled),
+            cache_dir=table["cache_dir"] if isinstance(table.get("cache_dir"), str) else base.cache_dir,
+            cache_max_entries=cls._coerce_int(table, "cache_max_entries", base.cache_max_entries),
+            server_socket=cls._coerce_str(table, "server_socket", base.server_socket),
+            calibration_file=cls._coerce_str(table, "calibration_file", base.calibration_file),
+            encodings_dir=cls._coerce_str(table, "encodings_dir", base.encodings_dir),
+            offline=cls._coerce_bool(table, "offline", base.offline),
+        )
+
     @classmethod
     def from_toml(cls, table: dict[str, Any]) -> Config:
         tool = table.get("tool", {})
         cntkn = tool.get("cntkn", {})
-        default_model = cls._coerce_str(cntkn, "default_model", cls.default_model)
-        color_raw = cls._coerce_str(cntkn, "color", cls.color_mode)
-        return cls(default_model=default_model, color_mode=cls._coerce_color(color_raw))
+        return cls._from_table(cntkn)
 
     @classmethod
-    def from_plain_toml(cls, cfg: dict[str, Any]) -> Config:
-        """Load from a plain cntkn.toml (top-level keys)."""
-        default_model = cls._coerce_str(cfg, "default_model", cls.default_model)
-        color_raw = cls._coerce_str(cfg, "color", cls.color_mode)
-        return cls(default_model=default_model, color_mode=cls._coerce_color(color_raw))
+    def from_plain_toml(cls, cfg: dict[str, Any], base: Config | None = None) -> Config:
+        """Load from a plain cntkn.toml (top-level keys), layered over `base` when given."""
+        return cls._from_table(cfg, base)
+
+
+# Where compiled encodings live and whether tiktoken may fetch missing ones; read by
+# cntkn.encodings whenever it loads an encoding, so setting them costs no import.
+_store: tuple[Path | None, bool] = (None, False)
+
+
+def configure_store(directory: Path | None = None, *, offline: bool = False) -> None:
+    """Set the encodings directory (None -> the default) and whether missing encodings may be fetched.
+
+    Affects encoders loaded after the call; the CLI applies `encodings_dir` and `offline` here on
+    every invocation.
+    """
+    global _store  # noqa: PLW0603
+    _store = (directory, offline)
+
+
+def store_settings() -> tuple[Path | None, bool]:
+    """Return the configured (directory, offline), for cntkn.encodings and worker processes."""
+    return _store
 
 
 def _read_toml(path: Path) -> dict[str, Any]:
@@ -50,22 +101,23 @@ def _read_toml(path: Path) -> dict[str, Any]:
     return tomllib.loads(data.decode("utf-8"))
 
 
-def _find_pyproject(start: Path) -> Path | None:
+def _find_config_files(start: Path) -> tuple[Path | None, Path | None]:
+    """Return the nearest (pyproject.toml, cntkn.toml) at or above `start`, in one walk."""
+    pyproject: Path | None = None
+    standalone: Path | None = None
     cur = start.resolve()
     for parent in [cur, *cur.parents]:
-        candidate = parent / "pyproject.toml"
-        if candidate.exists():
-            return candidate
-    return None
+        if pyproject is None and (candidate := parent / "pyproject.toml").exists():
+            pyproject = candidate
+        if standalone is None and (candidate := parent / "cntkn.toml").exists():
+            standalone = candidate
+        if pyproject is not None and standalone is not None:
+            break
+    return pyproject, standalone
 
 
-def _find_cntkn_toml(start: Path) -> Path | None:
-    cur = start.resolve()
-    for parent in [cur, *cur.parents]:
-        candidate = parent / "cntkn.toml"
-        if candidate.exists():
-            return candidate
-    return None
+def _find_pyproject(start: Path) -> Path | None:
+    return _find_config_files(start)[0]
 
 
 @lru_cache(maxsize=16)
@@ -77,7 +129,7 @@ def load_config(cwd: Path | None = None) -> Config:
     """
     base = Config()  # package defaults applied
     root = cwd or Path.cwd()
-    pyproject = _find_pyproject(root)
+    pyproject, standalone = _find_config_files(root)
     cfg = base
 
     if pyproject is not None:
@@ -85,9 +137,8 @@ def load_config(cwd: Path | None = None) -> Config:
         cfg = Config.from_toml(table)
 
     # If cntkn.toml exists, let it override pyproject values.
-    standalone = _find_cntkn_toml(root)
     if standalone is not None:
         plain = _read_toml(standalone)
-        cfg = Config.from_plain_toml({**cfg.__dict__, **plain})
+        cfg = Config.from_plain_toml(plain, base=cfg)
 
     return cfg
@@ -1,13 +1,68 @@
 from __future__ import annotations
 
-from typing import Protocol
+import bisect
+import collections
+import functools
+import os
+import re
+import time
+import weakref
+from array import array
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Protocol, cast
 
-import tiktoken
-from tiktoken.model import MODEL_PREFIX_TO_ENCODING, MODEL_TO_ENCODING
+from cntkn.chunking import DEFAULT_CHUNK_SIZE, find_split_point, iter_safe_chunks, limit_chunk_size
+from cntkn.tokenio import TOKEN_TYPECODE, to_array
 
-# pure data for tests and help text
-SUPPORTED_MODELS = sorted(MODEL_TO_ENCODING.keys())
-SUPPORTED_PREFIXES = sorted(MODEL_PREFIX_TO_ENCODING.keys())
+# tiktoken is imported lazily (see `_model_tables` and `_encoder_for_encoding`): loading it
+# costs more than the rest of the CLI. `--help` and `--version` never need it, and a `--server`
+# client leaves even model-name resolution to the daemon (see `cntkn.server`).
+
+# tiktoken's own default; its batch encoder releases the GIL inside the Rust core.
+DEFAULT_NUM_THREADS = 8
+
+if TYPE_CHECKING:
+    import asyncio  # pragma: no cover
+    from collections.abc import Iterable, Iterator, Mapping, Sequence  # pragma: no cover
+    from concurrent.futures import ThreadPoolExecutor  # pragma: no cover
+
+    import tiktoken  # pragma: no cover
+
+    from cntkn.cache import TokenCache  # pragma: no cover
+    from cntkn.stats import RunStats  # pragma: no cover
+
+
+@dataclass(frozen=True, slots=True)
+class _ModelTables:
+    exact: dict[str, str]
+    prefixes: dict[str, str]
+    # Precomputed prefix index: candidate prefixes of a name are looked up by hash instead of
+    # scanning every entry; the insertion rank preserves tiktoken's first-match-wins order.
+    prefix_rank: dict[str, int]
+    max_prefix_len: int
+
+
+@lru_cache(maxsize=1)
+def _model_tables() -> _ModelTables:
+    from tiktoken.model import MODEL_PREFIX_TO_ENCODING, MODEL_TO_ENCODING  # noqa: PLC0415
+
+    return _ModelTables(
+        exact=MODEL_TO_ENCODING,
+        prefixes=MODEL_PREFIX_TO_ENCODING,
+        prefix_rank={prefix: rank for rank, prefix in enumerate(MODEL_PREFIX_TO_ENCODING)},
+        max_prefix_len=max(map(len, MODEL_PREFIX_TO_ENCODING), default=0),
+    )
+
+
+def __getattr__(name: str) -> list[str]:
+    # pure data for tests and help text, built on first access
+    if name == "SUPPORTED_MODELS":
+        return sorted(_model_tables().exact)
+    if name == "SUPPORTED_PREFIXES":
+        return sorted(_model_tables().prefixes)
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
 
 
 class TokenCounter(Protocol):
@@ -15,25 +70,170 @@ class TokenCounter(Protocol):
 
     def encode(self, text: str, model: str, *, return_tokens: bool = False) -> int | list[int]: ...
 
+    def encode_batch(
+        self,
+        texts: Sequence[str],
+        model: str,
+        *,
+        return_tokens: bool = False,
+        num_threads: int = DEFAULT_NUM_THREADS,
+    ) -> list[int | list[int]]: ...
+
+
+@lru_cache(maxsize=256)
+def _lookup_encoding_name(model: str) -> str | None:
+    tables = _model_tables()
+    if model in tables.exact:
+        return tables.exact[model]
+    prefixes = (model[:end] for end in range(1, min(len(model), tables.max_prefix_len) + 1))
+    matches = [prefix for prefix in prefixes if prefix in tables.prefix_rank]
+    if matches:
+        return tables.prefixes[min(matches, key=tables.prefix_rank.__getitem__)]
+    # An encoding name stands for itself, so `--encoding cl100k_base` flows through the same paths.
+    return model if is_encoding_supported(model) else None
+
+
+@lru_cache(maxsize=1)
+def _encoding_names() -> frozenset[str]:
+    import tiktoken  # noqa: PLC0415
+
+    return frozenset(tiktoken.list_encoding_names())
+
+
+def is_encoding_supported(name: str) -> bool:
+    """Return True if `name` is an encoding known to tiktoken (e.g. cl100k_base)."""
+    return name in _encoding_names()
+
+
+def encoding_name_for_model(model: str) -> str:
+    """Return the tiktoken encoding name used by `model` (cached).
+
+    An encoding name is accepted too and maps to itself. Raises KeyError if the name is not
+    recognised, like tiktoken does.
+    """
+    if not isinstance(model, str):
+        msg = f"model must be a string, got {type(model).__name__}"
+        raise TypeError(msg)
+    name = _lookup_encoding_name(model)
+    if name is None:
+        msg = f"Could not map {model!r} to a tokenizer. Use `cntkn models` to see available models."
+        raise KeyError(msg)
+    return name
+
+
+class Encoder:
+    """Reusable handle around a resolved tiktoken encoding.
+
+    Hold one of these (see `get_encoder`) to skip model resolution entirely in hot loops.
+    """
+
+    __slots__ = ("_max_token_bytes", "_token_shapes", "encoding")
+
+    def __init__(self, encoding: tiktoken.Encoding) -> None:
+        self.encoding = encoding
+        self._max_token_bytes: int | None = None
+        # token -> (characters it completes, whether it starts inside a character)
+        self._token_shapes: dict[int, tuple[int, bool]] = {}
+
+    @property
+    def name(self) -> str:
+        return self.encoding.name
+
+    @property
+    def max_token_bytes(self) -> int:
+        """Byte length of the longest ordinary token, i.e. the most text one token can cover."""
+        if self._max_token_bytes is None:
+            self._max_token_bytes = max(map(len, self.encoding.token_byte_values()))
+        return self._max_token_bytes
+
+    def encode(self, text: str, *, return_tokens: bool = False) -> int | list[int]:
+        encoded = self.encoding.encode(text)
+        return encoded if return_tokens else len(encoded)
+
+    def encode_batch(
+        self,
+        texts: Sequence[str],
+        *,
+        return_tokens: bool = False,
+        num_threads: int = DEFAULT_NUM_THREADS,
+    ) -> list[int | list[int]]:
+        encoded = self.encoding.encode_batch(list(texts), num_threads=num_threads)
+        if return_tokens:
+            return list(encoded)
+        return [len(tokens) for tokens in encoded]
+
+    def token_offsets(self, tokens: Iterable[int]) -> list[int]:
+        """Return the character offset at which each of `tokens` starts in their decoded text.
+
+        Offsets come from each token's byte shape (cached per token), without decoding any
+        text. A token starting inside a multibyte character maps to that character's offset,
+        as with tiktoken's `decode_with_offsets`.
+        """
+        shapes = self._token_shapes
+        offsets = []
+        position = 0
+        for token in tokens:
+            shape = shapes.get(token)
+            if shape is None:
+                data = self.encoding.decode_single_token_bytes(token)
+                # UTF-8 continuation bytes are 0b10xxxxxx; every other byte starts a character.
+                shape = shapes[token] = (sum(b & 0xC0 != 0x80 for b in data), data[0] & 0xC0 == 0x80)  # noqa: PLR2004
+            chars, inside = shape
+            offsets.append(position - 1 if inside and position else position)
+            position += chars
+        return offsets
+
+
+@lru_cache(maxsize=16)
+def _encoder_for_encoding(encoding_name: str) -> Encoder:
+    # Compiled ranks from `cntkn warm` when present, so loading never needs the network.
+    from cntkn.encodings import load_encoding  # noqa: PLC0415
+
+    return Encoder(load_encoding(encoding_name))
+
+
+def get_encoder(model: str) -> Encoder:
+    """Return the cached `Encoder` for `model`."""
+    return _encoder_for_encoding(encoding_name_for_model(model))
+
 
 class TiktokenCounter:
     """Production encoder backed by tiktoken."""
 
     @staticmethod
     def encode(text: str, model: str, *, return_tokens: bool = False) -> int | list[int]:
-        if not isinstance(model, str):
-            msg = f"model must be a string, got {type(model).__name__}"
-            raise TypeError(msg)
-        enc = tiktoken.encoding_for_model(model)
-        encoded = enc.encode(text)
-        return encoded if return_tokens else len(encoded)
+        return get_encoder(model).encode(text, return_tokens=return_tokens)
+
+    @staticmethod
+    def encode_batch(
+        texts: Sequence[str],
+        model: str,
+        *,
+        return_tokens: bool = False,
+        num_threads: int = DEFAULT_NUM_THREADS,
+    ) -> list[int | list[int]]:
+        return get_encoder(model).encode_batch(texts, return_tokens=return_tokens, num_threads=num_threads)
+
+
+def distinct_encodings(models: Iterable[str]) -> dict[str, str]:
+    """Map each encoding behind `models` to the first of them that uses it, in order."""
+    representatives: dict[str, str] = {}
+    for model in models:
+        representatives.setdefault(encoding_name_for_model(model), model)
+    return representatives
 
 
 def is_model_supported(name: str) -> bool:
     """Return True if `name` is one of the known models, or starts with one of the supported prefixes."""
-    if name in MODEL_TO_ENCODING:
-        return True
-    return any(name.startswith(pref) for pref in MODEL_PREFIX_TO_ENCODING)
+    return _lookup_encoding_name(name) is not None
+
+
+def min_tokens(num_bytes: int, model: str) -> int:
+    """Return a lower bound on the token count of any text of `num_bytes` UTF-8 bytes.
+
+    A text's length in characters never exceeds its length in bytes, so it may be passed too.
+    """
+    return -(-num_bytes // get_encoder(model).max_token_bytes)
 
 
 def count_tokens(
@@ -42,14 +242,531 @@ def count_tokens(
     *,
     return_tokens: bool = False,
     counter: TokenCounter | None = None,
-) -> int | list[int]:
-    """Return number of tokens or the tokens themselves."""
+    cache: TokenCache | None = None,
+    limit: int | None = None,
+    stats: RunStats | None = None,
+    compact: bool = False,
+) -> int | list[int] | array[int]:
+    """Return number of tokens or the tokens themselves.
+
+    With `cache`, counts are looked up by content hash first and stored after encoding.
+    With `limit`, encoding stops as soon as the count exceeds it: a result above `limit`
+    is then only a lower bound (and is not cached), and text too long to fit is rejected
+    without encoding.
+    With `stats`, phase timings and the input's bytes, tokens and encode time are recorded.
+    With `compact`, tokens are returned as a uint32 `array` (see `cntkn.tokenio`).
+    """
     impl = counter or TiktokenCounter()
-    return impl.encode(text, model, return_tokens=return_tokens)
+    if compact and return_tokens:
+        tokens = count_tokens(
+            text, model, return_tokens=True, counter=impl, cache=cache, limit=limit, stats=stats
+        )
+        return to_array(cast("list[int]", tokens))
+    if limit is not None:
+        if return_tokens:
+            msg = "limit cannot be combined with return_tokens"
+            raise ValueError(msg)
+        return _count_within_limit(text, model, impl, limit=limit, cache=cache, stats=stats)
+    if stats is None and (cache is None or return_tokens):
+        return impl.encode(text, model, return_tokens=return_tokens)
+    return count_tokens_batch(
+        [text], model, num_threads=1, return_tokens=return_tokens, counter=impl, cache=cache, stats=stats
+    )[0]
+
+
+def _count_within_limit(
+    text: str, model: str, impl: TokenCounter, *, limit: int, cache: TokenCache | None, stats: RunStats | None
+) -> int:
+    # A cached count is exact, so it answers any limit; only exact counts (those within
+    # the limit) are stored, never the lower bound of a stopped encode.
+    if cache is not None:
+        encoding = encoding_name_for_model(model)
+        digest = cache.digest(text)
+        if (cached := cache.get(digest, encoding)) is not None:
+            return cached
+    if isinstance(impl, TiktokenCounter) and (bound := min_tokens(len(text), model)) > limit:
+        return bound
+    size = limit_chunk_size(limit)
+    parts = (text[i : i + size] for i in range(0, len(text), size))
+    n = cast(
+        "int", count_tokens_stream(parts, model, chunk_size=size, counter=impl, limit=limit, stats=stats)
+    )
+    if cache is not None and n <= limit:
+        cache.put(digest, encoding, n)
+    return n
+
+
+def count_tokens_batch(
+    texts: Sequence[str],
+    model: str = "gpt-4o",
+    *,
+    num_threads: int = DEFAULT_NUM_THREADS,
+    return_tokens: bool = False,
+    counter: TokenCounter | None = None,
+    cache: TokenCache | None = None,
+    stats: RunStats | None = None,
+    compact: bool = False,
+) -> list[int | list[int]] | list[array[int]]:
+    """Return token counts (or tokens) for each of `texts`, in order.
+
+    Encoding runs on `num_threads` threads; tiktoken releases the GIL while encoding,
+    so this scales across cores for large batches. With `cache`, only texts whose
+    content hash is not cached for the model's encoding are encoded. With `stats`, each
+    text is recorded as an input labelled by its index (cache hits with no encode time).
+    With `compact`, each text's tokens are returned as a uint32 `array`.
+    """
+    if num_threads < 1:
+        msg = f"num_threads must be >= 1, got {num_threads}"
+        raise ValueError(msg)
+    if not texts:
+        return []
+    impl = counter or TiktokenCounter()
+    if compact and return_tokens:
+        batch = count_tokens_batch(
+            texts, model, num_threads=num_threads, return_tokens=True, counter=impl, cache=cache, stats=stats
+        )
+        return [to_array(cast("list[int]", tokens)) for tokens in batch]
+    if stats is not None:
+        return _count_batch_with_stats(
+            texts, model, impl, num_threads=num_threads, return_tokens=return_tokens, cache=cache, stats=stats
+        )
+    if cache is None or return_tokens:
+        return impl.encode_batch(texts, model, return_tokens=return_tokens, num_threads=num_threads)
+
+    encoding = encoding_name_for_model(model)
+    digests = [cache.digest(text) for text in texts]
+    counts: dict[str, int] = cache.get_many(digests, encoding)
+    misses = list({d: i for i, d in enumerate(digests) if d not in counts}.items())
+    if misses:
+        fresh = impl.encode_batch([texts[i] for _, i in misses], model, num_threads=num_threads)
+        new_counts = {d: cast("int", n) for (d, _), n in zip(misses, fresh, strict=True)}
+        cache.put_many(new_counts.items(), encoding)
+        counts.update(new_counts)
+    return [counts[d] for d in digests]
+
+
+def count_tokens_multi(
+    texts: Sequence[str],
+    models: Sequence[str],
+    *,
+    num_threads: int = DEFAULT_NUM_THREADS,
+    return_tokens: bool = False,
+    counter: TokenCounter | None = None,
+    cache: TokenCache | None = None,
+) -> dict[str, list[int | list[int]]]:
+    """Return `count_tokens_batch` results for each of `models`, keyed by model.
+
+    Each text is encoded once per distinct encoding: models sharing an encoding (gpt-4 and
+    gpt-3.5-turbo both use cl100k_base, say) share its results.
+    """
+    by_encoding = {
+        encoding: count_tokens_batch(
+            texts, model, num_threads=num_threads, return_tokens=return_tokens, counter=counter, cache=cache
+        )
+        for encoding, model in distinct_encodings(models).items()
+    }
+    return {model: by_encoding[encoding_name_for_model(model)] for model in models}
+
+
+def _load_encoder(impl: TokenCounter, model: str, stats: RunStats) -> None:
+    """Load the BPE ranks up front so their cost shows as its own phase, not as encoding."""
+    if isinstance(impl, TiktokenCounter):
+        with stats.phase("load_encoder"):
+            get_encoder(model)
+
+
+def _timed_encode(
+    impl: TokenCounter, texts: Sequence[str], model: str, *, return_tokens: bool, num_threads: int
+) -> list[tuple[int | list[int], float]]:
+    """Encode `texts` on a thread pool, returning each result with its own encode time."""
+
+    def encode_one(text: str) -> tuple[int | list[int], float]:
+        start = time.perf_counter()
+        result = impl.encode(text, model, return_tokens=return_tokens)
+        return result, time.perf_counter() - start
+
+    if num_threads == 1 or len(texts) == 1:
+        return [encode_one(text) for text in texts]
+    from concurrent.futures import ThreadPoolExecutor  # noqa: PLC0415
+
+    with ThreadPoolExecutor(max_workers=num_threads) as pool:
+        return list(pool.map(encode_one, texts))
+
+
+def _count_batch_with_stats(
+    texts: Sequence[str],
+    model: str,
+    impl: TokenCounter,
+    *,
+    num_threads: int,
+    return_tokens: bool,
+    cache: TokenCache | None,
+    stats: RunStats,
+) -> list[int | list[int]]:
+    # Encoding text by text is what lets each input be timed; tiktoken still releases the
+    # GIL, so the pool keeps the batch parallel.
+    results: list[int | list[int] | None] = [None] * len(texts)
+    seconds = [0.0] * len(texts)
+    todo = list(range(len(texts)))
+    encoding = digests = None
+    if cache is not None and not return_tokens:
+        with stats.phase("cache"):
+            encoding = encoding_name_for_model(model)
+            digests = [cache.digest(text) for text in texts]
+            cached = cache.get_many(digests, encoding)
+        results = [cached.get(d) for d in digests]
+        todo = [i for i, n in enumerate(results) if n is None]
+    if todo:
+        _load_encoder(impl, model, stats)
+        with stats.phase("encode"):
+            timed = _timed_encode(
+                impl, [texts[i] for i in todo], model, return_tokens=return_tokens, num_threads=num_threads
+            )
+        for i, (result, elapsed) in zip(todo, timed, strict=True):
+            results[i], seconds[i] = result, elapsed
+    if cache is not None and encoding is not None and digests is not None and todo:
+        with stats.phase("cache"):
+            cache.put_many({digests[i]: cast("int", results[i]) for i in todo}.items(), encoding)
+    done = cast("list[int | list[int]]", results)
+    for i, (text, result) in enumerate(zip(texts, done, strict=True)):
+        tokens = result if isinstance(result, int) else len(result)
+        stats.record(f"#{i}", bytes_read=len(text.encode("utf-8")), tokens=tokens, seconds=seconds[i])
+    return done
+
+
+def count_tokens_stream(
+    chunks: Iterable[str],
+    model: str = "gpt-4o",
+    *,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    return_tokens: bool = False,
+    counter: TokenCounter | None = None,
+    limit: int | None = None,
+    stats: RunStats | None = None,
+    compact: bool = False,
+) -> int | list[int] | array[int]:
+    """Return the number of tokens (or the tokens) of the concatenation of `chunks`.
+
+    Chunks are re-cut at boundaries the pre-tokenizer never merges across, so the result is
+    identical to encoding the whole text while only about `chunk_size` characters are held.
+    With `limit`, no more chunks are read once the count exceeds it (see `count_tokens`).
+    With `stats`, reading and encoding are timed separately and the stream is recorded as
+    one input. With `compact`, tokens are accumulated in a uint32 `array` (4 bytes each)
+    instead of a list.
+    """
+    if limit is not None and return_tokens:
+        msg = "limit cannot be combined with return_tokens"
+        raise ValueError(msg)
+    impl = counter or TiktokenCounter()
+    if stats is not None:
+        return _count_stream_with_stats(
+            chunks,
+            model,
+            impl,
+            chunk_size=chunk_size,
+            return_tokens=return_tokens,
+            limit=limit,
+            stats=stats,
+            compact=compact,
+        )
+    total = 0
+    tokens: list[int] | array[int] = array(TOKEN_TYPECODE) if compact else []
+    for piece in iter_safe_chunks(chunks, chunk_size):
+        encoded = impl.encode(piece, model, return_tokens=return_tokens)
+        if isinstance(encoded, int):
+            total += encoded
+            if limit is not None and total > limit:
+                break
+        else:
+            tokens.extend(encoded)
+    return tokens if return_tokens else total
+
+
+def count_tokens_stream_multi(
+    chunks: Iterable[str],
+    models: Sequence[str],
+    *,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    return_tokens: bool = False,
+    counter: TokenCounter | None = None,
+) -> dict[str, int | list[int]]:
+    """Like `count_tokens_stream` for each of `models`, reading `chunks` only once.
+
+    Safe split points do not depend on the encoding, so every encoding sees the same pieces;
+    each piece is encoded once per distinct encoding.
+    """
+    impl = counter or TiktokenCounter()
+    representatives = distinct_encodings(models)
+    totals = dict.fromkeys(representatives, 0)
+    tokens: dict[str, list[int]] = {encoding: [] for encoding in representatives}
+    for piece in iter_safe_chunks(chunks, chunk_size):
+        for encoding, model in representatives.items():
+            encoded = impl.encode(piece, model, return_tokens=return_tokens)
+            if isinstance(encoded, int):
+                totals[encoding] += encoded
+            else:
+                tokens[encoding].extend(encoded)
+    results: Mapping[str, int | list[int]] = tokens if return_tokens else totals
+    return {model: results[encoding_name_for_model(model)] for model in models}
+
+
+def _count_stream_with_stats(
+    chunks: Iterable[str],
+    model: str,
+    impl: TokenCounter,
+    *,
+    chunk_size: int,
+    return_tokens: bool,
+    limit: int | None,
+    stats: RunStats,
+    compact: bool,
+) -> int | list[int] | array[int]:
+    _load_encoder(impl, model, stats)
+    nbytes = total = 0
+    encode_seconds = 0.0
+    tokens: list[int] | array[int] = array(TOKEN_TYPECODE) if compact else []
+    for piece in stats.timed("read", iter_safe_chunks(chunks, chunk_size)):
+        nbytes += len(piece.encode("utf-8"))
+        start = time.perf_counter()
+        encoded = impl.encode(piece, model, return_tokens=return_tokens)
+        encode_seconds += time.perf_counter() - start
+        if isinstance(encoded, int):
+            total += encoded
+            if limit is not None and total > limit:
+                break
+        else:
+            tokens.extend(encoded)
+    stats.add_time("encode", encode_seconds)
+    stats.record(
+        "stream", bytes_read=nbytes, tokens=len(tokens) if return_tokens else total, seconds=encode_seconds
+    )
+    return tokens if return_tokens else total
+
+
+@dataclass(frozen=True, slots=True)
+class TextChunk:
+    """A piece of a document from `split_by_tokens`; `text` is `document[start:end]`."""
+
+    text: str
+    start: int  # character offsets into the document
+    end: int
+    tokens: int  # document tokens the piece covers
+
+
+# Preferred chunk ends with `boundaries=True`: after a blank line, then after a sentence.
+_PARAGRAPH_END = re.compile(r"\n[^\S\n]*\n\s*")
+_SENTENCE_END = re.compile(r"[.!?\u3002][\"'\u201d\u2019)\]]*\s+")
+
+
+def split_by_tokens(
+    text: str,
+    model: str = "gpt-4o",
+    *,
+    max_tokens: int,
+    overlap: int = 0,
+    boundaries: bool = False,
+    encoder: Encoder | None = None,
+) -> Iterator[TextChunk]:
+    """Yield consecutive pieces of `text` of at most `max_tokens` tokens each.
+
+    Each piece repeats the last `overlap` tokens of the one before. `text` is encoded once
+    and the pieces are cut from that token stream, with character offsets taken from the
+    tokens' byte lengths, so nothing is decoded or encoded again per piece. With
+    `boundaries`, a piece ends at the last paragraph break in the second half of its
+    window, else the last sentence end, else the last point the tokenizer never merges
+    across (see `cntkn.chunking.find_split_point`), before falling back to exactly
+    `max_tokens`. `encoder` skips resolving `model`.
+    """
+    if max_tokens < 1:
+        msg = f"max_tokens must be >= 1, got {max_tokens}"
+        raise ValueError(msg)
+    if not 0 <= overlap < max_tokens:
+        msg = f"overlap must be >= 0 and below max_tokens, got {overlap}"
+        raise ValueError(msg)
+    encoder = encoder or get_encoder(model)
+    tokens = cast("list[int]", encoder.encode(text, return_tokens=True))
+    offsets = [*encoder.token_offsets(tokens), len(text)]
+    start = 0
+    while start < len(tokens):
+        end = min(start + max_tokens, len(tokens))
+        if boundaries and end < len(tokens):
+            # Never cut so early that the next piece would not move past this one's start.
+            end = _preferred_cut(text, offsets, max(start + overlap + 1, start + max_tokens // 2), end)
+        yield TextChunk(text[offsets[start] : offsets[end]], offsets[start], offsets[end], end - start)
+        if end == len(tokens):
+            return
+        start = end - overlap
+
+
+def _preferred_cut(text: str, offsets: Sequence[int], lo: int, hi: int) -> int:
+    """Return the token index in [lo, hi] where a piece ending by token `hi` should end."""
+    for pattern in (_PARAGRAPH_END, _SENTENCE_END):
+        last = None
+        for last in pattern.finditer(text, offsets[lo], offsets[hi]):  # noqa: B007
+            pass
+        if last is not None:
+            # Cut before the token holding the first character after the boundary.
+            return max(lo, bisect.bisect_right(offsets, last.end(), lo, hi + 1) - 1)
+    if cut := find_split_point(text[offsets[lo] : offsets[hi]]):
+        return bisect.bisect_left(offsets, offsets[lo] + cut, lo, hi + 1)
+    return hi
 
 
 def get_supported_models() -> dict[str, list[str]]:
+    tables = _model_tables()
     return {
-        "exact_models": SUPPORTED_MODELS,
-        "prefixes": SUPPORTED_PREFIXES,
+        "exact_models": sorted(tables.exact),
+        "prefixes": sorted(tables.prefixes),
     }
+
+
+# ------------------------------------ asyncio -----------------------------------
+# Threads on the executor shared by every event loop; each encodes one micro-batch at a time,
+# spread over this many of tiktoken's threads. One core is left to the event loop itself.
+ASYNC_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+# Micro-batch limits: at most this many texts, or this many characters, per executor job.
+ASYNC_BATCH_TEXTS = 256
+ASYNC_BATCH_CHARS = 1 << 20
+_DEFAULT_COUNTER = TiktokenCounter()
+# Batchers per event loop, so futures are only ever resolved on the loop that made them.
+_batchers: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple[object, ...], _MicroBatcher]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+@lru_cache(maxsize=1)
+def _async_executor() -> ThreadPoolExecutor:
+    from concurrent.futures import ThreadPoolExecutor  # noqa: PLC0415
+
+    return ThreadPoolExecutor(max_workers=ASYNC_WORKERS, thread_name_prefix="cntkn-async")
+
+
+def _encode_each(impl: TokenCounter, model: str, texts: list[str], *, return_tokens: bool) -> list[Any]:
+    """Encode `texts` one by one (on an executor thread); a failing text yields its exception."""
+    results: list[Any] = []
+    for text in texts:
+        try:
+            results.append(impl.encode(text, model, return_tokens=return_tokens))
+        except Exception as exc:  # noqa: BLE001 - handed to that text's awaiter
+            results.append(exc)
+    return results
+
+
+def _encode_batch(impl: TokenCounter, model: str, texts: list[str], *, return_tokens: bool) -> list[Any]:
+    """Encode one micro-batch (on an executor thread) with a single `encode_batch` call.
+
+    tiktoken releases the GIL while it encodes the batch's texts on its own threads. If the call
+    fails, the texts are encoded one by one so each failing text gets its own exception.
+    """
+    if len(texts) == 1:
+        return _encode_each(impl, model, texts, return_tokens=return_tokens)  # no thread pool for one
+    try:
+        return impl.encode_batch(texts, model, return_tokens=return_tokens, num_threads=ASYNC_WORKERS)
+    except Exception:  # noqa: BLE001 - retried per text below
+        return _encode_each(impl, model, texts, return_tokens=return_tokens)
+
+
+class _MicroBatcher:
+    """Coalesce requests made on one event loop into executor jobs of several texts.
+
+    Requests queue up while up to `ASYNC_WORKERS` jobs run, and the next job takes whatever
+    queued meanwhile, so batches grow with load and a lone request waits one loop iteration.
+    A request cancelled before its job starts is never encoded.
+    """
+
+    def __init__(
+        self, loop: asyncio.AbstractEventLoop, impl: TokenCounter, model: str, *, tokens: bool
+    ) -> None:
+        self._loop = loop
+        self._encode = functools.partial(_encode_batch, impl, model, return_tokens=tokens)
+        self._pending: collections.deque[tuple[str, asyncio.Future[Any]]] = collections.deque()
+        self._running = 0
+        self._scheduled = False
+
+    def submit(self, text: str) -> asyncio.Future[Any]:
+        future = self._loop.create_future()
+        self._pending.append((text, future))
+        if not self._scheduled and self._running < ASYNC_WORKERS:
+            self._scheduled = True
+            self._loop.call_soon(self._flush)
+        return future
+
+    def _flush(self) -> None:
+        self._scheduled = False
+        while self._pending and self._running < ASYNC_WORKERS:
+            batch = self._take()
+            if batch:
+                self._running += 1
+                job = self._loop.run_in_executor(_async_executor(), self._encode, [text for text, _ in batch])
+                job.add_done_callback(functools.partial(self._finish, [future for _, future in batch]))
+
+    def _take(self) -> list[tuple[str, asyncio.Future[Any]]]:
+        batch: list[tuple[str, asyncio.Future[Any]]] = []
+        chars = 0
+        while self._pending and len(batch) < ASYNC_BATCH_TEXTS:
+            text, future = self._pending[0]
+            if batch and chars + len(text) > ASYNC_BATCH_CHARS:
+                break
+            self._pending.popleft()
+            if not future.cancelled():
+                batch.append((text, future))
+                chars += len(text)
+        return batch
+
+    def _finish(self, futures: list[asyncio.Future[Any]], job: asyncio.Future[list[Any]]) -> None:
+        self._running -= 1
+        error = job.exception()
+        for future, result in zip(
+            futures, job.result() if error is None else [error] * len(futures), strict=True
+        ):
+            if future.done():
+                continue  # cancelled while encoding
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        if self._pending:
+            self._flush()
+
+
+def _submit(texts: Sequence[str], model: str, counter: TokenCounter | None, *, tokens: bool) -> list[Any]:
+    import asyncio  # noqa: PLC0415 - also loads socket, which plain counting never needs
+
+    encoding_name_for_model(model)  # reject unknown models here, not per batch
+    loop = asyncio.get_running_loop()
+    impl = counter or _DEFAULT_COUNTER
+    key = (impl, model, tokens)
+    batchers = _batchers.setdefault(loop, {})
+    batcher = batchers.get(key) or batchers.setdefault(key, _MicroBatcher(loop, impl, model, tokens=tokens))
+    return [batcher.submit(text) for text in texts]
+
+
+async def acount_tokens(
+    text: str, model: str = "gpt-4o", *, return_tokens: bool = False, counter: TokenCounter | None = None
+) -> int | list[int]:
+    """Return what `count_tokens` would, without blocking the running event loop.
+
+    Encoding runs on a shared executor of `ASYNC_WORKERS` threads, and concurrent calls for
+    the same model are encoded together in micro-batches. Cancelling the call drops the text
+    if it has not started encoding yet.
+    """
+    (future,) = _submit([text], model, counter, tokens=return_tokens)
+    return cast("int | list[int]", await future)
+
+
+async def acount_tokens_batch(
+    texts: Sequence[str],
+    model: str = "gpt-4o",
+    *,
+    return_tokens: bool = False,
+    counter: TokenCounter | None = None,
+) -> list[int | list[int]]:
+    """Return what `count_tokens_batch` would, in order, without blocking the event loop.
+
+    The texts join the same micro-batches as `acount_tokens` calls. Cancelling the call
+    cancels every text not encoded yet; the first error raised for a text is raised here.
+    """
+    import asyncio  # noqa: PLC0415
+
+    futures = _submit(texts, model, counter, tokens=return_tokens)
+    return list(await asyncio.gather(*futures))
@@ -0,0 +1,57 @@
+"""Encode each distinct input once per run (`count` with repeated files).
+
+CI runs often count the same license, vendored README or templated prompt many times. A
+`Deduplicator` sits in front of the encoder: inputs are looked up by content, only texts not
+seen yet are encoded, and every repeat gets the first result. Lookups hash the text with
+Python's string hash (fast, not cryptographic, and cached on the string) and confirm a match
+by comparing the texts, so a hash collision can never hand out another input's count.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable  # pragma: no cover
+
+# Characters of input text a run keeps to recognise repeats in later batches.
+DEDUP_KEEP_CHARS = 32 << 20
+
+
+class Deduplicator[R]:
+    """Run-wide memo of results by input text, with counts of what it saved."""
+
+    def __init__(self, *, keep_chars: int = DEDUP_KEEP_CHARS) -> None:
+        # `keep_chars` bounds the memory held for later batches; repeats within a batch are
+        # always found. 0 keeps nothing between batches.
+        self._seen: dict[str, R] = {}
+        self._room = keep_chars
+        self.inputs = 0
+        self.duplicates = 0
+        self.saved_bytes = 0  # bytes of repeated inputs that were not encoded again
+
+    def apply(self, texts: list[str], encode: Callable[[list[str]], list[R]]) -> tuple[list[R], list[bool]]:
+        """Return each text's result and whether it was reused, encoding only texts not seen before.
+
+        `encode` is called once, with the new texts in order of first appearance; every other
+        text is marked reused and gets the result of its first occurrence.
+        """
+        fresh = [text for text in dict.fromkeys(texts) if text not in self._seen]
+        batch = dict(zip(fresh, encode(fresh) if fresh else [], strict=True))
+        pending = set(batch)  # texts whose first occurrence is still ahead
+        results: list[R] = []
+        reused: list[bool] = []
+        for text in texts:
+            first = text in pending
+            pending.discard(text)
+            results.append(batch[text] if text in batch else self._seen[text])
+            reused.append(not first)
+            if not first:
+                self.duplicates += 1
+                self.saved_bytes += len(text.encode("utf-8"))
+        self.inputs += len(texts)
+        for text, result in batch.items():
+            if len(text) <= self._room:
+                self._seen[text] = result
+                self._room -= len(text)
+        return results, reused
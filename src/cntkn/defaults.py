@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import tomllib
+from functools import lru_cache
 from importlib import resources
 from typing import Any
 
@@ -8,11 +9,18 @@ from typing import Any
 def _load_bytes_from_package(rel_path: str) -> bytes:
     # We keep defaults inside the package so wheels/sdists carry them.
     pkg = "cntkn.resources"
-    with resources.as_file(resources.files(pkg) / rel_path) as p:
-        return p.read_bytes()
+    return resources.files(pkg).joinpath(rel_path).read_bytes()
 
 
+@lru_cache(maxsize=1)
 def package_defaults() -> dict[str, Any]:
-    """Load defaults shipped with the package."""
+    """Load defaults shipped with the package (parsed once; treat the result as read-only)."""
     raw = _load_bytes_from_package("default.toml")
     return tomllib.loads(raw.decode("utf-8"))
+
+
+@lru_cache(maxsize=1)
+def package_calibration() -> dict[str, Any]:
+    """Load the text-per-token calibration shipped with the package (see `cntkn.estimate`)."""
+    raw = _load_bytes_from_package("calibration.toml")
+    return tomllib.loads(raw.decode("utf-8"))
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import fnmatch
+import glob
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Sequence  # pragma: no cover
+
+# Never descend into VCS metadata, whatever the ignore files say.
+ALWAYS_SKIP_DIRS = frozenset({".git", ".hg", ".svn"})
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translate a gitignore-style glob into a regex over '/'-separated paths."""
+    out: list[str] = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif ch == "*":
+            out.append("[^/]*")
+            i += 1
+        elif ch == "?":
+            out.append("[^/]")
+            i += 1
+        elif ch == "[" and (close := pattern.find("]", i + 2)) != -1:
+            body = pattern[i + 1 : close]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            out.append(f"[{body.replace('\\', '\\\\')}]")
+            i = close + 1
+        elif ch == "\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(ch))
+            i += 1
+    return "".join(out)
+
+
+@dataclass(frozen=True, slots=True)
+class _Rule:
+    regex: re.Pattern[str]
+    negated: bool
+    dir_only: bool
+
+
+class GitIgnore:
+    """Patterns from one `.gitignore`, matched against paths relative to its directory."""
+
+    __slots__ = ("base", "rules")
+
+    def __init__(self, base: Path, lines: Iterable[str]) -> None:
+        self.base = base
+        self.rules = tuple(rule for line in lines if (rule := self._parse(line)) is not None)
+
+    @classmethod
+    def from_file(cls, path: Path) -> GitIgnore:
+        return cls(path.parent, path.read_text(encoding="utf-8", errors="replace").splitlines())
+
+    @staticmethod
+    def _parse(line: str) -> _Rule | None:
+        line = line.rstrip("\n")
+        if not line.endswith("\\ "):
+            line = line.rstrip(" ")
+        if not line or line.startswith("#"):
+            return None
+        negated = line.startswith("!")
+        if negated or line.startswith("\\!"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            return None
+        # A slash anywhere but the end anchors the pattern to the ignore file's directory.
+        anchored = "/" in line
+        line = line.removeprefix("/")
+        prefix = "" if anchored else "(?:.*/)?"
+        return _Rule(re.compile(f"{prefix}{_glob_to_regex(line)}"), negated, dir_only)
+
+    def match(self, rel_path: str, *, is_dir: bool) -> bool | None:
+        """Return True (ignored), False (re-included) or None (no rule applies)."""
+        verdict: bool | None = None
+        for rule in self.rules:
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.regex.fullmatch(rel_path):
+                verdict = not rule.negated
+        return verdict
+
+
+def _is_ignored(matchers: Sequence[GitIgnore], path: Path, *, is_dir: bool) -> bool:
+    ignored = False
+    for matcher in matchers:  # outer to inner: deeper ignore files win
+        verdict = matcher.match(path.relative_to(matcher.base).as_posix(), is_dir=is_dir)
+        if verdict is not None:
+            ignored = verdict
+    return ignored
+
+
+def matches_filters(rel_path: str, *, include: Sequence[str] = (), exclude: Sequence[str] = ()) -> bool:
+    """Apply --include/--exclude globs to a '/'-separated path (or its basename)."""
+    name = rel_path.rsplit("/", 1)[-1]
+
+    def hit(patterns: Sequence[str]) -> bool:
+        return any(fnmatch.fnmatchcase(rel_path, p) or fnmatch.fnmatchcase(name, p) for p in patterns)
+
+    if include and not hit(include):
+        return False
+    return not (exclude and hit(exclude))
+
+
+def walk_files(
+    root: Path,
+    *,
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    gitignore: bool = True,
+) -> Iterator[Path]:
+    """Yield regular files under `root` in a stable order, honouring filters and `.gitignore`."""
+    inherited: dict[str, list[GitIgnore]] = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        here = Path(dirpath)
+        matchers = inherited.pop(dirpath, [])
+        if gitignore and ".gitignore" in filenames:
+            matchers = [*matchers, GitIgnore.from_file(here / ".gitignore")]
+
+        kept_dirs = []
+        for name in sorted(dirnames):
+            if name in ALWAYS_SKIP_DIRS or _is_ignored(matchers, here / name, is_dir=True):
+                continue
+            kept_dirs.append(name)
+            inherited[os.path.join(dirpath, name)] = matchers  # noqa: PTH118
+        dirnames[:] = kept_dirs  # prune in place so os.walk skips ignored trees
+
+        for name in sorted(filenames):
+            path = here / name
+            if _is_ignored(matchers, path, is_dir=False):
+                continue
+            rel = path.relative_to(root).as_posix()
+            if matches_filters(rel, include=include, exclude=exclude) and path.is_file():
+                yield path
+
+
+def expand_globs(
+    patterns: Sequence[str],
+    *,
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+) -> Iterator[Path]:
+    """Yield files matching shell-style `patterns` (``**`` recurses), in sorted order."""
+    for pattern in patterns:
+        for match in sorted(glob.glob(pattern, recursive=True)):  # noqa: PTH207
+            path = Path(match)
+            if path.is_file() and matches_filters(path.as_posix(), include=include, exclude=exclude):
+                yield path
+
+
+def discover_files(
+    roots: Sequence[str],
+    patterns: Sequence[str],
+    *,
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    gitignore: bool = True,
+) -> list[str]:
+    """Return file paths from recursive `roots` and glob `patterns`, without duplicates."""
+    found: dict[str, None] = {}
+    for root in roots:
+        for path in walk_files(Path(root), include=include, exclude=exclude, gitignore=gitignore):
+            found.setdefault(str(path))
+    for path in expand_globs(patterns, include=include, exclude=exclude):
+        found.setdefault(str(path))
+    return list(found)
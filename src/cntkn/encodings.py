@@ -0,0 +1,262 @@
+"""Compiled BPE ranks in a local directory, so encodings load without the network (`cntkn warm`).
+
+tiktoken downloads an encoding's BPE file the first time a host uses it, and every process
+then parses some 200k base64 lines to load it. `warm` fetches each encoding once and writes
+it to the encodings directory (`encodings_dir`, by default `$XDG_CACHE_HOME/cntkn/encodings`)
+as `<name>.tkb`:
+
+    b"CNTKNBPE" | version, header size (uint32 LE) | header JSON (name, pattern, special
+    tokens, rank count) | ranks (uint32 LE) | token lengths (uint16 LE) | token bytes | SHA-256
+
+`load_encoding` rebuilds the `tiktoken.Encoding` from that file, checking the trailing digest
+so a torn or corrupted file is never used, and only asks tiktoken (which may download) when the
+file is missing. With `offline`, a missing file is an error instead. A directory can be packed
+into one tar bundle and restored on hosts without network access.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import operator
+import os
+import struct
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import IO, TYPE_CHECKING
+
+from cntkn.config import store_settings
+from cntkn.errors import EncodingStoreError
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable  # pragma: no cover
+    from pathlib import Path  # pragma: no cover
+
+    import tiktoken  # pragma: no cover
+
+SUFFIX = ".tkb"
+_MAGIC = b"CNTKNBPE"
+_VERSION = 1
+_PREAMBLE = struct.Struct("<8sII")
+_DIGEST_SIZE = hashlib.sha256().digest_size
+# Encoded by `warm` with both the compiled and tiktoken's own encoding; they must agree.
+_PROBE = "Hello, world! Ünïcödé text, 12345 numbers,\n\ttabs and  spaces; 日本語のテキスト 🙂"
+
+
+def default_encodings_dir() -> Path:
+    """Return `$XDG_CACHE_HOME/cntkn/encodings`, falling back to `~/.cache/cntkn/encodings`."""
+    from cntkn.cache import default_cache_dir  # noqa: PLC0415
+
+    return default_cache_dir() / "encodings"
+
+
+def encodings_dir() -> Path:
+    directory, _ = store_settings()
+    return directory or default_encodings_dir()
+
+
+def compiled_path(name: str, directory: Path | None = None) -> Path:
+    return (directory or encodings_dir()) / f"{name}{SUFFIX}"
+
+
+# ------------------------------- file format --------------------------------
+def _le(values: array[int]) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_le(typecode: str, data: bytes | memoryview) -> array[int]:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def compile_encoding(encoding: tiktoken.Encoding) -> bytes:
+    """Serialise `encoding` in the `.tkb` format."""
+    # The private attributes are tiktoken's documented way to extend or rebuild an encoding.
+    ranks = sorted(encoding._mergeable_ranks.items(), key=operator.itemgetter(1))  # noqa: SLF001
+    header = json.dumps({
+        "name": encoding.name,
+        "pat_str": encoding._pat_str,  # noqa: SLF001
+        "special_tokens": encoding._special_tokens,  # noqa: SLF001
+        "ranks": len(ranks),
+    }).encode("utf-8")
+    body = b"".join([
+        _PREAMBLE.pack(_MAGIC, _VERSION, len(header)),
+        header,
+        _le(array("I", (rank for _, rank in ranks))),
+        _le(array("H", (len(token) for token, _ in ranks))),
+        *(token for token, _ in ranks),
+    ])
+    return body + hashlib.sha256(body).digest()
+
+
+def read_compiled(path: Path) -> tiktoken.Encoding:
+    """Load the encoding in `path` (a `.tkb` file), checking its digest and layout."""
+    import tiktoken  # noqa: PLC0415
+
+    data = path.read_bytes()
+    body = memoryview(data)[:-_DIGEST_SIZE]
+    if len(data) < _PREAMBLE.size + _DIGEST_SIZE or hashlib.sha256(body).digest() != data[-_DIGEST_SIZE:]:
+        msg = f"{path} is corrupt (checksum mismatch); run `cntkn warm` to rebuild it."
+        raise EncodingStoreError(msg)
+    magic, version, header_size = _PREAMBLE.unpack_from(body)
+    if magic != _MAGIC or version != _VERSION:
+        msg = f"{path} is not a cntkn encoding file of version {_VERSION}; run `cntkn warm` to rebuild it."
+        raise EncodingStoreError(msg)
+    start = _PREAMBLE.size + header_size
+    header = json.loads(bytes(body[_PREAMBLE.size : start]))
+    count = header["ranks"]
+    ranks = _from_le("I", body[start : start + 4 * count])
+    lengths = _from_le("H", body[start + 4 * count : start + 6 * count])
+    blob = bytes(body[start + 6 * count :])
+    if sum(lengths) != len(blob):
+        msg = f"{path} is corrupt (token bytes do not match their lengths)."
+        raise EncodingStoreError(msg)
+    offsets = itertools.pairwise(itertools.accumulate(lengths, initial=0))
+    return tiktoken.Encoding(
+        header["name"],
+        pat_str=header["pat_str"],
+        mergeable_ranks=dict(zip((blob[a:b] for a, b in offsets), ranks, strict=True)),
+        special_tokens=header["special_tokens"],
+    )
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    # Readers sharing the directory see the old file or the new one, never a partial write.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+
+
+# --------------------------------- loading ----------------------------------
+def load_encoding(name: str) -> tiktoken.Encoding:
+    """Return encoding `name` from the encodings directory, else from tiktoken unless offline."""
+    path = compiled_path(name)
+    try:
+        return read_compiled(path)
+    except FileNotFoundError:
+        _, offline = store_settings()
+        if offline:
+            msg = f"Encoding {name!r} is not in {path.parent} and offline is set; run `cntkn warm` first."
+            raise EncodingStoreError(msg) from None
+    import tiktoken  # noqa: PLC0415
+
+    return tiktoken.get_encoding(name)
+
+
+@dataclass(frozen=True, slots=True)
+class WarmResult:
+    name: str
+    path: Path
+    tokens: int  # vocabulary size, special tokens included
+    size: int  # bytes on disk
+    action: str  # "present", "fetched" or "restored"
+
+
+def _result(name: str, path: Path, encoding: tiktoken.Encoding, action: str) -> WarmResult:
+    return WarmResult(name, path, encoding.n_vocab, path.stat().st_size, action)
+
+
+def warm(names: Iterable[str], *, directory: Path | None = None) -> list[WarmResult]:
+    """Make sure every encoding in `names` is compiled in the directory, fetching what is missing.
+
+    A present file is verified; a missing or corrupt one is rebuilt from tiktoken (which may
+    download it) and must encode a probe text exactly like tiktoken before it is kept.
+    """
+    import tiktoken  # noqa: PLC0415
+
+    results = []
+    for name in dict.fromkeys(names):
+        path = compiled_path(name, directory)
+        try:
+            results.append(_result(name, path, read_compiled(path), "present"))
+            continue
+        except (FileNotFoundError, EncodingStoreError):
+            pass
+        try:
+            source = tiktoken.get_encoding(name)
+        except Exception as exc:
+            msg = f"Could not fetch encoding {name!r}: {exc}"
+            raise EncodingStoreError(msg) from exc
+        _write_atomic(path, compile_encoding(source))
+        compiled = read_compiled(path)
+        if compiled.encode(_PROBE, allowed_special="all") != source.encode(_PROBE, allowed_special="all"):
+            path.unlink()
+            msg = f"Compiled encoding {name!r} does not match tiktoken's; nothing was written."
+            raise EncodingStoreError(msg)
+        results.append(_result(name, path, compiled, "fetched"))
+    return results
+
+
+# --------------------------------- bundles ----------------------------------
+def export_bundle(
+    bundle: Path, names: Iterable[str] | None = None, *, directory: Path | None = None
+) -> list[str]:
+    """Pack compiled encodings (all of them unless `names`) into the tar file `bundle`.
+
+    Each file is verified before it is packed. Returns the names packed.
+    """
+    import tarfile  # noqa: PLC0415
+
+    directory = directory or encodings_dir()
+    wanted = sorted(path.stem for path in directory.glob(f"*{SUFFIX}")) if names is None else list(names)
+    for name in wanted:
+        try:
+            read_compiled(compiled_path(name, directory))
+        except FileNotFoundError:
+            msg = f"Encoding {name!r} is not in {directory}; run `cntkn warm` first."
+            raise EncodingStoreError(msg) from None
+    if not wanted:
+        msg = f"No encodings in {directory}; run `cntkn warm` first."
+        raise EncodingStoreError(msg)
+    with tarfile.open(bundle, "w:gz") as tar:
+        for name in wanted:
+            tar.add(compiled_path(name, directory), arcname=f"{name}{SUFFIX}", recursive=False)
+    return wanted
+
+
+def import_bundle(bundle: Path, *, directory: Path | None = None) -> list[WarmResult]:
+    """Restore the encodings in tar file `bundle` into the directory.
+
+    Only top-level `.tkb` files are read, and each must pass `read_compiled` under its own
+    name before it replaces anything; other members are ignored.
+    """
+    import tarfile  # noqa: PLC0415
+
+    directory = directory or encodings_dir()
+    results = []
+    try:
+        with tarfile.open(bundle) as tar:
+            for member in tar:
+                name = member.name.removesuffix(SUFFIX)
+                if not member.isfile() or "/" in member.name or name == member.name:
+                    continue
+                results.append(_restore(tar.extractfile(member), name, directory))
+    except tarfile.TarError as exc:
+        msg = f"{bundle} is not an encodings bundle: {exc}"
+        raise EncodingStoreError(msg) from exc
+    return results
+
+
+def _restore(fileobj: IO[bytes] | None, name: str, directory: Path) -> WarmResult:
+    path = compiled_path(name, directory)
+    staged = path.with_name(f".{path.name}.{os.getpid()}.restore")
+    directory.mkdir(parents=True, exist_ok=True)
+    staged.write_bytes(fileobj.read() if fileobj is not None else b"")
+    try:
+        encoding = read_compiled(staged)
+        if encoding.name != name:
+            msg = f"Bundle entry {name}{SUFFIX} holds encoding {encoding.name!r}."
+            raise EncodingStoreError(msg)
+        staged.replace(path)
+    finally:
+        staged.unlink(missing_ok=True)
+    return _result(name, path, encoding, "restored")
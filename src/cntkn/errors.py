@@ -0,0 +1,5 @@
+"""Exceptions shared between cntkn modules, kept free of imports so the CLI can catch them cheaply."""
+
+
+class EncodingStoreError(RuntimeError):
+    """An encoding is missing from the encodings directory, cannot be fetched, or is corrupt."""
@@ -0,0 +1,285 @@
+"""Approximate token counts from sampled exact encoding or calibrated text-per-token ratios.
+
+Sampling encodes a fixed number of windows drawn at random from the input and scales their
+tokens-per-character ratio to the whole input (a ratio estimator), so the cost is bounded by
+``sample_count * sample_size`` characters whatever the input size. With ``sample_count=0``
+nothing is encoded and the encoding's calibrated ratio is used instead.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+import statistics
+import tomllib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from cntkn.core import TiktokenCounter, TokenCounter, encoding_name_for_model
+from cntkn.defaults import package_calibration
+from cntkn.inputs import detect_compression, iter_file_chunks, read_text
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Mapping, Sequence  # pragma: no cover
+    from pathlib import Path  # pragma: no cover
+
+DEFAULT_SAMPLE_COUNT = 32
+DEFAULT_SAMPLE_SIZE = 2048
+DEFAULT_CONFIDENCE = 0.95
+# Documents shorter than this are too noisy to contribute to the calibrated spread.
+_MIN_CALIBRATION_CHARS = 256
+
+
+@dataclass(frozen=True, slots=True)
+class Calibration:
+    """Average text per token for one encoding, measured over a reference corpus."""
+
+    chars_per_token: float
+    bytes_per_token: float
+    rel_stdev: float  # spread of per-document ratios, relative to their mean
+
+
+@dataclass(frozen=True, slots=True)
+class Estimate:
+    tokens: int
+    low: int
+    high: int
+    method: str  # "exact" | "sampled" | "calibrated"
+
+
+def load_calibration(path: Path | None = None) -> dict[str, Calibration]:
+    """Return calibrations by encoding name, from `path` or the packaged calibration.toml."""
+    table = tomllib.loads(path.read_text(encoding="utf-8")) if path is not None else package_calibration()
+    return {
+        name: Calibration(
+            chars_per_token=float(entry["chars_per_token"]),
+            bytes_per_token=float(entry["bytes_per_token"]),
+            rel_stdev=float(entry["rel_stdev"]),
+        )
+        for name, entry in table.get("encodings", {}).items()
+    }
+
+
+def _z(confidence: float) -> float:
+    if not 0 < confidence < 1:
+        msg = f"confidence must be between 0 and 1, got {confidence}"
+        raise ValueError(msg)
+    return statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+
+
+def _interval(tokens: float, half_width: float, method: str) -> Estimate:
+    return Estimate(
+        round(tokens), max(0, math.floor(tokens - half_width)), math.ceil(tokens + half_width), method
+    )
+
+
+def _exact(text: str, model: str, counter: TokenCounter) -> Estimate:
+    n = int(counter.encode(text, model))
+    return Estimate(n, n, n, "exact")
+
+
+def _calibrated(
+    size: int, model: str, calibration: Mapping[str, Calibration] | None, z: float, *, unit: str
+) -> Estimate:
+    calibrations = load_calibration() if calibration is None else calibration
+    encoding = encoding_name_for_model(model)
+    if encoding not in calibrations:
+        msg = f"no calibration for encoding {encoding!r}; run `cntkn calibrate` or sample instead"
+        raise KeyError(msg)
+    cal = calibrations[encoding]
+    tokens = size / (cal.chars_per_token if unit == "chars" else cal.bytes_per_token)
+    return _interval(tokens, z * tokens * cal.rel_stdev, "calibrated")
+
+
+def _trim(window: str) -> str:
+    """Cut a window taken mid-text back to whitespace so no partial word skews its count."""
+    start = window.find(" ") + 1
+    end = window.rfind(" ")
+    return window[start:end] if 0 < start <= end else window
+
+
+def _sampled(
+    windows: Sequence[str],
+    population: int,
+    model: str,
+    counter: TokenCounter,
+    z: float,
+    *,
+    measure: str = "chars",
+) -> Estimate:
+    """Scale the tokens-per-unit ratio of `windows` to `population` units (chars or bytes)."""
+    sizes = [len(w) if measure == "chars" else len(w.encode("utf-8")) for w in windows]
+    counts = [int(n) for n in counter.encode_batch(list(windows), model)]
+    ratio = sum(counts) / max(1, sum(sizes))
+    n = len(windows)
+    if n < 2:  # noqa: PLR2004
+        return _interval(population * ratio, 0.0, "sampled")
+    # Variance of a ratio estimator, with a finite-population correction for what was seen.
+    mean_size = sum(sizes) / n
+    residual = sum((t - ratio * s) ** 2 for t, s in zip(counts, sizes, strict=True)) / (n - 1)
+    fpc = max(0.0, 1 - sum(sizes) / population)
+    stderr = math.sqrt(residual / n * fpc) / mean_size
+    return _interval(population * ratio, z * population * stderr, "sampled")
+
+
+def estimate_tokens(
+    text: str,
+    model: str = "gpt-4o",
+    *,
+    sample_count: int = DEFAULT_SAMPLE_COUNT,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    confidence: float = DEFAULT_CONFIDENCE,
+    calibration: Mapping[str, Calibration] | None = None,
+    counter: TokenCounter | None = None,
+    seed: int | None = None,
+) -> Estimate:
+    """Estimate the token count of `text` with a `confidence` interval.
+
+    Text no longer than the sample budget is counted exactly. With `sample_count=0` the
+    calibrated chars-per-token ratio of the model's encoding is used without encoding.
+    """
+    impl = counter or TiktokenCounter()
+    z = _z(confidence)
+    if sample_count == 0:
+        return _calibrated(len(text), model, calibration, z, unit="chars")
+    if len(text) <= sample_count * sample_size:
+        return _exact(text, model, impl)
+    rng = random.Random(seed)  # noqa: S311  # sampling, not security
+    offsets = sorted(rng.randrange(len(text) - sample_size + 1) for _ in range(sample_count))
+    windows = [_trim(text[o : o + sample_size]) for o in offsets]
+    return _sampled(windows, len(text), model, impl, z)
+
+
+def estimate_file_tokens(
+    path: Path,
+    model: str = "gpt-4o",
+    *,
+    sample_count: int = DEFAULT_SAMPLE_COUNT,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    confidence: float = DEFAULT_CONFIDENCE,
+    calibration: Mapping[str, Calibration] | None = None,
+    counter: TokenCounter | None = None,
+    seed: int | None = None,
+) -> Estimate:
+    """Like `estimate_tokens`, but seek to the sampled windows so only they are read.
+
+    Compressed files cannot be seeked into, so they go through `estimate_tokens_stream`.
+    """
+    if detect_compression(path) is not None:
+        return estimate_tokens_stream(
+            iter_file_chunks(path),
+            model,
+            sample_count=sample_count,
+            sample_size=sample_size,
+            confidence=confidence,
+            calibration=calibration,
+            counter=counter,
+            seed=seed,
+        )
+    impl = counter or TiktokenCounter()
+    z = _z(confidence)
+    size = path.stat().st_size
+    if sample_count == 0:
+        return _calibrated(size, model, calibration, z, unit="bytes")
+    if size <= sample_count * sample_size:
+        return _exact(read_text(path), model, impl)
+    rng = random.Random(seed)  # noqa: S311  # sampling, not security
+    offsets = sorted(rng.randrange(size - sample_size + 1) for _ in range(sample_count))
+    windows: list[str] = []
+    with path.open("rb") as fh:
+        for offset in offsets:
+            fh.seek(offset)
+            # Characters split at the window edges are dropped, then trimmed away anyway.
+            windows.append(_trim(fh.read(sample_size).decode("utf-8", errors="ignore")))
+    return _sampled(windows, size, model, impl, z, measure="bytes")
+
+
+def estimate_tokens_stream(
+    chunks: Iterable[str],
+    model: str = "gpt-4o",
+    *,
+    sample_count: int = DEFAULT_SAMPLE_COUNT,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    confidence: float = DEFAULT_CONFIDENCE,
+    calibration: Mapping[str, Calibration] | None = None,
+    counter: TokenCounter | None = None,
+    seed: int | None = None,
+) -> Estimate:
+    """Estimate the tokens of the concatenation of `chunks` in one pass with bounded memory.
+
+    Every chunk is read (its length is needed), but only a uniform reservoir of
+    `sample_count` windows is kept and encoded.
+    """
+    impl = counter or TiktokenCounter()
+    z = _z(confidence)
+    if sample_count == 0:
+        return _calibrated(sum(map(len, chunks)), model, calibration, z, unit="chars")
+    budget = sample_count * sample_size
+    rng = random.Random(seed)  # noqa: S311  # sampling, not security
+    head: list[str] | None = []
+    reservoir: list[str] = []
+    total = seen = 0
+    for chunk in chunks:
+        total += len(chunk)
+        if head is not None:
+            head.append(chunk)
+            if total <= budget:
+                continue
+            chunk = "".join(head)  # noqa: PLW2901  # sample the buffered text from here on
+            head = None
+        for start in range(0, len(chunk), sample_size):
+            seen += 1
+            slot = chunk[start : start + sample_size]
+            if len(reservoir) < sample_count:
+                reservoir.append(slot)
+            elif (j := rng.randrange(seen)) < sample_count:
+                reservoir[j] = slot
+    if head is not None:
+        return _exact("".join(head), model, impl)
+    return _sampled([_trim(w) for w in reservoir], total, model, impl, z)
+
+
+def calibrate(
+    texts: Iterable[str],
+    models: Sequence[str],
+    *,
+    counter: TokenCounter | None = None,
+) -> dict[str, Calibration]:
+    """Measure text-per-token ratios of the encodings behind `models` over `texts`."""
+    impl = counter or TiktokenCounter()
+    # One representative model per encoding: models sharing an encoding share its ratios.
+    by_encoding = {encoding_name_for_model(m): m for m in models}
+    chars = size = 0
+    tokens = dict.fromkeys(by_encoding, 0)
+    ratios: dict[str, list[float]] = {name: [] for name in by_encoding}
+    for text in texts:
+        chars += len(text)
+        size += len(text.encode("utf-8"))
+        for name, model in by_encoding.items():
+            n = int(impl.encode(text, model))
+            tokens[name] += n
+            if len(text) >= _MIN_CALIBRATION_CHARS:
+                ratios[name].append(n / len(text))
+    result: dict[str, Calibration] = {}
+    for name, n in tokens.items():
+        if not n:
+            continue
+        spread = (
+            statistics.pstdev(ratios[name]) / statistics.fmean(ratios[name]) if len(ratios[name]) > 1 else 0.0
+        )
+        result[name] = Calibration(chars_per_token=chars / n, bytes_per_token=size / n, rel_stdev=spread)
+    return result
+
+
+def calibration_to_toml(calibrations: Mapping[str, Calibration], *, source: str) -> str:
+    """Render `calibrations` in the calibration.toml format."""
+    lines = [f"# Generated by `cntkn calibrate` from {source}.", ""]
+    for name, cal in sorted(calibrations.items()):
+        lines += [
+            f"[encodings.{name}]",
+            f"  chars_per_token = {cal.chars_per_token:.4f}",
+            f"  bytes_per_token = {cal.bytes_per_token:.4f}",
+            f"  rel_stdev       = {cal.rel_stdev:.4f}",
+            "",
+        ]
+    return "\n".join(lines)
@@ -0,0 +1,151 @@
+"""Incremental token counts for append-only files (`cntkn watch`, `count --follow`).
+
+For each file a `FollowState` remembers a byte `boundary` at a safe split point (see
+`cntkn.chunking.find_split_point`) and the tokens of the text before it, which can never
+change as the file grows. A poll reads from the boundary on, moves the boundary to the last
+safe point in what it read, and encodes only the text after the old boundary, so its cost
+follows the appended bytes (plus the short unfinished tail), not the file size. A file
+replaced under the same name (rotation), truncated, or rewritten in place starts over.
+States persist as JSON, so a later `cntkn watch --once` picks up where the last run stopped.
+"""
+
+from __future__ import annotations
+
+import codecs
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from cntkn.chunking import DEFAULT_CHUNK_SIZE, find_split_point
+from cntkn.inputs import translate_newlines
+
+if TYPE_CHECKING:
+    from collections.abc import Callable  # pragma: no cover
+    from typing import BinaryIO  # pragma: no cover
+
+STATE_FILENAME = "follow.json"
+# Leading bytes hashed to notice a file rewritten in place rather than appended to.
+_HEAD_SIZE = 4096
+
+
+def default_state_path() -> Path:
+    """Return `$XDG_STATE_HOME/cntkn/follow.json`, falling back to `~/.local/state/cntkn`."""
+    base = os.environ.get("XDG_STATE_HOME") or Path.home() / ".local" / "state"
+    return Path(base) / "cntkn" / STATE_FILENAME
+
+
+@dataclass(slots=True)
+class FollowState:
+    device: int
+    inode: int
+    size: int  # file size at the last poll
+    boundary: int  # bytes before the last safe split point; their tokens are final
+    committed: int  # tokens of the text before `boundary`
+    tail_tokens: int  # tokens of the text after `boundary`, as of the last poll
+    head: str  # digest of the first `head_size` bytes
+    head_size: int
+
+    @property
+    def total(self) -> int:
+        return self.committed + self.tail_tokens
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def poll(
+    path: Path,
+    state: FollowState | None,
+    encode: Callable[[str], int],
+    *,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> tuple[FollowState, bool]:
+    """Bring `state` (None: never seen) up to date with `path`; return (state, restarted).
+
+    `restarted` is True when `state` was dropped and the file counted from the start
+    because it was rotated, truncated, or rewritten in place. Raises OSError if `path`
+    cannot be read and UnicodeDecodeError if the appended bytes are not UTF-8.
+    """
+    with path.open("rb") as fh:
+        info = os.fstat(fh.fileno())
+        if state is not None and (info.st_dev, info.st_ino, info.st_size) == (
+            state.device,
+            state.inode,
+            state.size,
+        ):
+            return state, False  # unchanged: no reading at all
+        restarted = state is not None and not _same_file(fh, info, state)
+        if state is None or restarted:
+            state = FollowState(info.st_dev, info.st_ino, 0, 0, 0, 0, _digest(b""), 0)
+        _advance(fh, state, encode, chunk_size=chunk_size)
+        state.size = info.st_size
+        if state.head_size < _HEAD_SIZE:
+            fh.seek(0)
+            head = fh.read(_HEAD_SIZE)
+            state.head, state.head_size = _digest(head), len(head)
+    return state, restarted
+
+
+def _same_file(fh: BinaryIO, info: os.stat_result, state: FollowState) -> bool:
+    """Return True if the open file is `state`'s file, only ever appended to since."""
+    if (info.st_dev, info.st_ino) != (state.device, state.inode) or info.st_size < state.size:
+        return False
+    fh.seek(0)
+    return _digest(fh.read(state.head_size)) == state.head
+
+
+def _advance(fh: BinaryIO, state: FollowState, encode: Callable[[str], int], *, chunk_size: int) -> None:
+    """Encode from `state.boundary` to the end of `fh`, committing text up to safe split points."""
+    fh.seek(state.boundary)
+    # Not final: a character still being written is left for the next poll.
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    while block := fh.read(chunk_size):
+        pending += decoder.decode(block)
+        if len(pending) >= chunk_size:
+            pending = _commit(pending, state, encode)
+    pending = _commit(pending, state, encode)
+    state.tail_tokens = encode(translate_newlines(pending)) if pending else 0
+
+
+def _commit(pending: str, state: FollowState, encode: Callable[[str], int]) -> str:
+    """Count `pending` up to its last safe split point into `state`; return the rest."""
+    cut = find_split_point(pending)
+    if not cut:
+        return pending
+    # A safe cut never falls between "\r" and "\n", so each side translates on its own.
+    state.committed += encode(translate_newlines(pending[:cut]))
+    state.boundary += len(pending[:cut].encode("utf-8"))
+    return pending[cut:]
+
+
+class FollowStore:
+    """Follow states persisted as one JSON file, keyed by encoding and absolute path."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._states: dict[str, dict[str, Any]] = {}
+        if path.exists():
+            self._states = json.loads(path.read_text(encoding="utf-8"))
+
+    @staticmethod
+    def key(path: Path, encoding: str) -> str:
+        return f"{encoding}:{path.resolve()}"
+
+    def get(self, key: str) -> FollowState | None:
+        data = self._states.get(key)
+        return FollowState(**data) if data is not None else None
+
+    def put(self, key: str, state: FollowState) -> None:
+        self._states[key] = asdict(state)
+
+    def save(self) -> None:
+        """Write the states atomically, so an interrupted run never leaves a partial file."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self._states, indent=2) + "\n", encoding="utf-8")
+        tmp.replace(self.path)
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import codecs
+import importlib
+import io
+import itertools
+import mmap
+import stat
+from typing import TYPE_CHECKING, TextIO, cast
+
+from cntkn.chunking import DEFAULT_CHUNK_SIZE, find_split_point
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator  # pragma: no cover
+    from pathlib import Path  # pragma: no cover
+
+# Files at least this large are read through a memory map (and `count` streams them even
+# without --stream); smaller ones are cheaper to read with one buffered call.
+MMAP_MIN_SIZE = 64 << 20
+
+# Compressed formats read transparently, by leading magic bytes, and their stdlib modules.
+COMPRESSIONS = {"gzip": (b"\x1f\x8b", "gzip"), "bz2": (b"BZh", "bz2"), "xz": (b"\xfd7zXZ\x00", "lzma")}
+_MAGIC_SIZE = max(len(magic) for magic, _ in COMPRESSIONS.values())
+# Bytes searched for a safe cut after each even split of a file into shards.
+SHARD_PROBE = 64 << 10
+
+
+def read_chunks(stream: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """Yield `stream` in pieces of at most `chunk_size` characters."""
+    while chunk := stream.read(chunk_size):
+        yield chunk
+
+
+def iter_file_chunks(path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """Yield the UTF-8 text of `path` in pieces, never holding the whole file.
+
+    gzip, bz2 and xz files are decompressed as they are read; other files of at least
+    `MMAP_MIN_SIZE` bytes are decoded straight from a memory map.
+    """
+    if detect_compression(path) is None and is_large_file(path):
+        yield from iter_mapped_chunks(path, chunk_size)
+        return
+    with open_text(path) as fh:
+        yield from read_chunks(fh, chunk_size)
+
+
+def detect_compression(path: Path) -> str | None:
+    """Return "gzip", "bz2" or "xz" if `path` starts with that format's magic bytes, else None."""
+    try:
+        with path.open("rb") as fh:
+            return _sniff(fh.read(_MAGIC_SIZE))
+    except OSError:
+        return None
+
+
+def _sniff(head: bytes) -> str | None:
+    return next((name for name, (magic, _) in COMPRESSIONS.items() if head.startswith(magic)), None)
+
+
+def open_text(path: Path, *, newline: str | None = None) -> TextIO:
+    """Open `path` as UTF-8 text, decompressing gzip, bz2 and xz files on the fly (no temp files)."""
+    raw = path.open("rb")
+    try:
+        compression = _sniff(raw.peek(_MAGIC_SIZE)[:_MAGIC_SIZE])
+    except BaseException:
+        raw.close()
+        raise
+    if compression is None:
+        # Plain text, the common case, is sniffed and read through the same handle.
+        return io.TextIOWrapper(raw, encoding="utf-8", newline=newline)
+    raw.close()  # the decompressors never close a file object they are handed, so pass the path
+    # Imported on first use: lzma and bz2 load shared libraries most runs never need.
+    module = importlib.import_module(COMPRESSIONS[compression][1])
+    return cast("TextIO", module.open(path, "rt", encoding="utf-8", newline=newline))
+
+
+def read_text(path: Path) -> str:
+    """Return the UTF-8 text of `path` (see `open_text`), with newlines translated as in text mode."""
+    with open_text(path) as fh:
+        return fh.read()
+
+
+def translate_newlines(text: str) -> str:
+    """Return `text` with CRLF and CR turned into LF, as reading it in text mode would."""
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def is_large_file(path: Path) -> bool:
+    """Return True if `path` is a regular file of at least `MMAP_MIN_SIZE` bytes."""
+    try:
+        info = path.stat()
+    except OSError:
+        return False
+    return stat.S_ISREG(info.st_mode) and info.st_size >= MMAP_MIN_SIZE
+
+
+def iter_mapped_chunks(
+    path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE, *, start: int = 0, end: int | None = None
+) -> Iterator[str]:
+    """Yield the UTF-8 text of `path`, decoded from a read-only memory map in pieces.
+
+    Each piece comes from about `chunk_size` bytes of the map (whole pages), decoded without
+    copying them to an intermediate `bytes`; multibyte characters and CRLF pairs cut at a piece boundary are
+    carried over, and newlines are translated as in text mode, so the concatenation equals
+    `path.read_text(encoding="utf-8")`. Pages already decoded are dropped from the process
+    where the platform allows it, so resident memory stays around `chunk_size` per file.
+    With `start`/`end`, only that byte range is decoded (`start` must begin a character, as
+    the ranges from `shard_ranges` do). Raises ValueError for an empty file, which cannot be
+    mapped.
+    """
+    decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder("utf-8")(), translate=True)
+    with path.open("rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        _advise(mapped, "MADV_SEQUENTIAL")
+        size = len(mapped) if end is None else min(end, len(mapped))
+        step = max(chunk_size - chunk_size % mmap.PAGESIZE, mmap.PAGESIZE)
+        with memoryview(mapped) as view:
+            for pos in range(start, size, step):
+                stop = min(pos + step, size)
+                # Release each window even when decoding fails, or the map cannot be closed.
+                with view[pos:stop] as window:
+                    text = decoder.decode(window)
+                if text:
+                    yield text
+                page = pos - pos % mmap.PAGESIZE  # madvise wants a page-aligned start
+                _advise(mapped, "MADV_DONTNEED", page, stop - page)
+        if tail := decoder.decode(b"", final=True):
+            yield tail
+
+
+def _advise(mapped: mmap.mmap, name: str, *args: int) -> None:
+    option = getattr(mmap, name, None)  # madvise flags are platform-specific
+    if option is not None:
+        mapped.madvise(option, *args)
+
+
+def shard_ranges(path: Path, shards: int) -> list[tuple[int, int]]:
+    """Split `path` into at most `shards` byte ranges that can be encoded independently.
+
+    Each cut sits at a safe split point (see `cntkn.chunking.find_split_point`) found within
+    `SHARD_PROBE` bytes after an even split, so decoding the ranges separately and encoding
+    them one by one gives exactly the tokens of the whole file. A cut with no safe point
+    nearby is dropped, leaving fewer, larger ranges.
+    """
+    size = path.stat().st_size
+    cuts = [0]
+    with path.open("rb") as fh:
+        for k in range(1, shards):
+            nominal = size * k // shards
+            if nominal <= cuts[-1]:
+                continue
+            fh.seek(nominal)
+            cut = _safe_cut(fh.read(SHARD_PROBE))
+            if cut is not None:
+                cuts.append(nominal + cut)
+    cuts.append(size)
+    return [(a, b) for a, b in itertools.pairwise(cuts) if a < b]
+
+
+def _safe_cut(window: bytes) -> int | None:
+    """Return the byte offset of a safe split point in `window` (read from mid-file), or None."""
+    # Continuation bytes (0b10xxxxxx) finish a character that started before the window.
+    lead = next((i for i, byte in enumerate(window[:4]) if byte & 0xC0 != 0x80), None)  # noqa: PLR2004
+    if lead is None:
+        return None
+    try:
+        # Not final: a character cut at the end of the window is left out rather than rejected.
+        text = codecs.getincrementaldecoder("utf-8")().decode(window[lead:])
+    except UnicodeDecodeError:
+        return None  # not UTF-8 here; leave the file whole and let decoding report it
+    cut = find_split_point(text)
+    return lead + len(text[:cut].encode("utf-8")) if cut else None
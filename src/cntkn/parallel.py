@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import itertools
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, cast
+
+from cntkn.cache import TokenCache
+from cntkn.chunking import DEFAULT_CHUNK_SIZE
+from cntkn.config import configure_store, store_settings
+from cntkn.core import count_tokens_stream_multi, distinct_encodings, encoding_name_for_model, get_encoder
+from cntkn.inputs import (
+    detect_compression,
+    is_large_file,
+    iter_file_chunks,
+    iter_mapped_chunks,
+    read_text,
+    shard_ranges,
+)
+from cntkn.tokenio import to_array
+
+if TYPE_CHECKING:
+    from array import array  # pragma: no cover
+    from collections.abc import Callable, Iterator, Sequence  # pragma: no cover
+    from concurrent.futures import Future  # pragma: no cover
+
+    from cntkn.stats import RunStats  # pragma: no cover
+
+# Tasks submitted per worker ahead of the one whose result is yielded next.
+_TASKS_PER_WORKER = 2
+# Files whose new counts the parent buffers before writing them to the cache in one transaction.
+_CACHE_WRITE_BATCH = 64
+
+# Per-process read connection to the parent's cache (opened in the pool initializer).
+_worker_cache: TokenCache | None = None
+
+
+def _init_worker(models: tuple[str, ...], cache_dir: str | None, encodings: tuple[Path | None, bool]) -> None:
+    global _worker_cache  # noqa: PLW0603
+    directory, offline = encodings
+    configure_store(directory, offline=offline)
+    if cache_dir is None:
+        # Load the BPE ranks once per process rather than once per file.
+        for model in models:
+            get_encoder(model)
+    else:
+        # With a cache, a warm rerun may never need the encoder, so load it lazily.
+        _worker_cache = TokenCache(Path(cache_dir))
+
+
+# One unit of work: a file, or a byte range of a sharded file.
+type Task = tuple[str, tuple[int, int] | None]
+# What a worker returns for a task: (results per model, digest, cache hits, seconds).
+type _Part = tuple[list[int | list[int]] | list[array[int]], str | None, list[bool], float]
+
+
+def _timed_encode_file(
+    task: Task,
+    *,
+    models: tuple[str, ...],
+    return_tokens: bool,
+    chunk_size: int | None,
+    compact: bool,
+) -> _Part:
+    start = time.perf_counter()
+    path, byte_range = task
+    if byte_range is None:
+        results, digest, hits = _encode_file(
+            path, models=models, return_tokens=return_tokens, chunk_size=chunk_size
+        )
+    else:
+        results, digest, hits = _encode_shard(
+            path, byte_range, models=models, return_tokens=return_tokens, chunk_size=chunk_size
+        )
+    if compact and return_tokens:
+        # Arrays also pickle to a quarter of the size of lists on the way back to the parent.
+        return [to_array(cast("list[int]", r)) for r in results], digest, hits, time.perf_counter() - start
+    return results, digest, hits, time.perf_counter() - start
+
+
+def _encode_file(
+    path: str,
+    *,
+    models: tuple[str, ...],
+    return_tokens: bool,
+    chunk_size: int | None,
+) -> tuple[list[int | list[int]], str | None, list[bool]]:
+    """Return (results, digest, hits), one result and hit flag per model (each a distinct encoding).
+
+    The file is read once whatever the number of models; digest is set whenever the parent
+    should cache or touch it. Large files are streamed even without `chunk_size`.
+    """
+    if chunk_size is None and is_large_file(Path(path)):
+        chunk_size = DEFAULT_CHUNK_SIZE  # decode from a memory map instead of reading it whole
+    if chunk_size is not None:
+        by_model = count_tokens_stream_multi(
+            iter_file_chunks(Path(path), chunk_size),
+            models,
+            chunk_size=chunk_size,
+            return_tokens=return_tokens,
+        )
+        return [by_model[m] for m in models], None, [False] * len(models)
+    text = read_text(Path(path))
+    if _worker_cache is None or return_tokens:
+        return (
+            [get_encoder(m).encode(text, return_tokens=return_tokens) for m in models],
+            None,
+            [False] * len(models),
+        )
+    digest = _worker_cache.digest(text)
+    results: list[int | list[int]] = []
+    hits: list[bool] = []
+    for model in models:
+        cached = _worker_cache.get(digest, encoding_name_for_model(model), touch=False)
+        results.append(get_encoder(model).encode(text) if cached is None else cached)
+        hits.append(cached is not None)
+    return results, digest, hits
+
+
+def _encode_shard(
+    path: str,
+    byte_range: tuple[int, int],
+    *,
+    models: tuple[str, ...],
+    return_tokens: bool,
+    chunk_size: int | None,
+) -> tuple[list[int | list[int]], None, list[bool]]:
+    """`_encode_file` for one range from `shard_ranges`, streamed from a memory map."""
+    size = chunk_size or DEFAULT_CHUNK_SIZE
+    start, end = byte_range
+    by_model = count_tokens_stream_multi(
+        iter_mapped_chunks(Path(path), size, start=start, end=end),
+        models,
+        chunk_size=size,
+        return_tokens=return_tokens,
+    )
+    return [by_model[m] for m in models], None, [False] * len(models)
+
+
+def _plan(path: str | Path, jobs: int) -> list[Task]:
+    """Tasks for one file: byte ranges across the pool for large plain files, else the whole file."""
+    path = Path(path)
+    if jobs > 1 and is_large_file(path) and detect_compression(path) is None:
+        return [(str(path), byte_range) for byte_range in shard_ranges(path, jobs)]
+    return [(str(path), None)]
+
+
+def _merge_parts(
+    parts: list[_Part],
+) -> tuple[list[int | list[int] | array[int]], str | None, list[bool], float]:
+    """Combine the shards of one file: counts add up, tokens concatenate in order."""
+    if len(parts) == 1:
+        results, digest, hits, seconds = parts[0]
+        return list(results), digest, hits, seconds
+    merged: list[int | list[int] | array[int]] = []
+    for shard_results in zip(*(results for results, _, _, _ in parts), strict=True):
+        first = shard_results[0]
+        if isinstance(first, int):
+            merged.append(sum(cast("tuple[int, ...]", shard_results)))
+        else:
+            tokens = first[:0]  # an empty list or array of the same kind
+            for shard in shard_results:
+                tokens.extend(cast("list[int]", shard))
+            merged.append(tokens)
+    seconds = sum(seconds for _, _, _, seconds in parts)
+    return merged, None, [False] * len(merged), seconds
+
+
+def _map_files(
+    pool: ProcessPoolExecutor,
+    worker: Callable[[Task], _Part],
+    paths: Sequence[str | Path],
+    jobs: int,
+) -> Iterator[tuple[str | Path, tuple[list[int | list[int] | array[int]], str | None, list[bool], float]]]:
+    """Run `worker` over every file's tasks on `pool`; yield (path, merged result) in order.
+
+    Tasks are planned and submitted as results are taken, at most `_TASKS_PER_WORKER * jobs`
+    at a time, so a run over many files holds only a window of results, not all of them.
+    """
+    tasks = ((index, task) for index, path in enumerate(paths) for task in _plan(path, jobs))
+    window: deque[tuple[int, Future[_Part]]] = deque()
+    parts: list[_Part] = []
+    while True:
+        room = _TASKS_PER_WORKER * jobs - len(window)
+        window.extend((index, pool.submit(worker, task)) for index, task in itertools.islice(tasks, room))
+        if not window:
+            return
+        index, future = window.popleft()
+        parts.append(future.result())
+        if not window or window[0][0] != index:  # that was the file's last task
+            yield paths[index], _merge_parts(parts)
+            parts = []
+
+
+class _CacheWriter:
+    """Buffer the parent's cache writes for a few files at a time, one transaction per flush.
+
+    Only the parent writes, so workers never contend for the database lock.
+    """
+
+    def __init__(self, cache: TokenCache, encodings: Sequence[str]) -> None:
+        self.cache = cache
+        self.fresh: dict[str, list[tuple[str, int]]] = {encoding: [] for encoding in encodings}
+        self.hits: dict[str, list[str]] = {encoding: [] for encoding in encodings}
+        self.files = 0
+
+    def add(self, digest: str, results: Sequence[int | list[int] | array[int]], hits: list[bool]) -> None:
+        for encoding, result, hit in zip(self.fresh, results, hits, strict=True):
+            if hit:
+                self.hits[encoding].append(digest)
+            else:
+                self.fresh[encoding].append((digest, cast("int", result)))
+        self.files += 1
+        if self.files >= _CACHE_WRITE_BATCH:
+            self.flush()
+
+    def flush(self) -> None:
+        for encoding, entries in self.fresh.items():
+            self.cache.touch(self.hits[encoding], encoding)
+            self.cache.put_many(entries, encoding)
+            self.hits[encoding].clear()
+            entries.clear()
+        self.files = 0
+
+
+def encode_files(
+    paths: Sequence[str | Path],
+    model: str,
+    *,
+    jobs: int,
+    return_tokens: bool = False,
+    chunk_size: int | None = None,
+    cache: TokenCache | None = None,
+    stats: RunStats | None = None,
+    compact: bool = False,
+) -> Iterator[int | list[int] | array[int]]:
+    """Read and encode `paths` across `jobs` worker processes, yielding results in input order.
+
+    With `chunk_size`, each worker streams its file in chunks instead of reading it whole.
+    Files of at least `MMAP_MIN_SIZE` bytes are split into up to `jobs` byte ranges at safe
+    split points (see `shard_ranges`) and encoded by several workers at once, with the same
+    result as encoding them whole.
+    With `cache`, workers look counts up by content hash and new counts are stored here as
+    results arrive, a few files per transaction.
+    With `stats`, each file is recorded with its size and the time its worker spent on it
+    (reading included, since the two happen in the same process; summed over a sharded file's
+    workers). With `compact`, tokens
+    come back as uint32 arrays.
+    """
+    for by_model in encode_files_multi(
+        paths,
+        [model],
+        jobs=jobs,
+        return_tokens=return_tokens,
+        chunk_size=chunk_size,
+        cache=cache,
+        stats=stats,
+        compact=compact,
+    ):
+        yield by_model[model]
+
+
+def encode_files_multi(
+    paths: Sequence[str | Path],
+    models: Sequence[str],
+    *,
+    jobs: int,
+    return_tokens: bool = False,
+    chunk_size: int | None = None,
+    cache: TokenCache | None = None,
+    stats: RunStats | None = None,
+    compact: bool = False,
+) -> Iterator[dict[str, int | list[int] | array[int]]]:
+    """Like `encode_files` for each of `models`, yielding {model: result} per file.
+
+    Each file is read once and encoded once per distinct encoding. Stats record one entry per
+    file, with its tokens summed over the distinct encodings.
+    """
+    if not paths:
+        return
+    representatives = distinct_encodings(models)
+    encodings = list(representatives)
+    worker = partial(
+        _timed_encode_file,
+        models=tuple(representatives.values()),
+        return_tokens=return_tokens,
+        chunk_size=chunk_size,
+        compact=compact,
+    )
+    cache_dir = str(cache.directory) if cache is not None else None
+    writer = _CacheWriter(cache, encodings) if cache is not None else None
+    initargs = (tuple(representatives.values()), cache_dir, store_settings())
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=initargs) as pool:
+        try:
+            for path, (results, digest, hit_flags, seconds) in _map_files(pool, worker, paths, jobs):
+                if stats is not None:
+                    tokens = sum(r if isinstance(r, int) else len(r) for r in results)
+                    size = Path(path).stat().st_size
+                    stats.record(str(path), bytes_read=size, tokens=tokens, seconds=seconds)
+                if writer is not None and digest is not None:
+                    writer.add(digest, results, hit_flags)
+                by_encoding = dict(zip(encodings, results, strict=True))
+                yield {model: by_encoding[encoding_name_for_model(model)] for model in models}
+        finally:
+            # Counts already computed are kept even if the caller stops early or a file fails.
+            if writer is not None:
+                writer.flush()
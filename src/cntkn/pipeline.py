@@ -0,0 +1,108 @@
+"""Overlap reading, encoding and writing for many-input runs.
+
+`count` runs as three stages linked by bounded queues, so a fast stage waits for a slow one
+instead of buffering the whole run:
+
+- reader threads fetch inputs ahead of the encoder, at most `depth` at a time (`read_ahead`);
+- the encoder consumes them in input order on a background thread (`run_ahead`);
+- the writer, the caller's thread, takes finished results from a queue of at most `depth`.
+
+File reads and tiktoken both release the GIL, so threads are enough to hide disk and network
+latency behind encoding. A depth of 0 runs everything in the caller's thread.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, cast
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator  # pragma: no cover
+    from concurrent.futures import Future  # pragma: no cover
+
+READER_THREADS = 8
+_POLL_SECONDS = 0.1  # how often a blocked producer checks whether the consumer went away
+
+
+def read_ahead[T, R](
+    items: Iterable[T], fn: Callable[[T], R], *, depth: int, workers: int = READER_THREADS
+) -> Iterator[R]:
+    """Yield `fn(item)` for every item, in order, keeping up to `depth` calls running ahead.
+
+    Calls run on up to `workers` threads; exceptions surface when their result is reached.
+    """
+    if depth < 1:
+        yield from map(fn, items)
+        return
+    with ThreadPoolExecutor(max_workers=min(depth, workers), thread_name_prefix="cntkn-read") as pool:
+        pending: deque[Future[R]] = deque()
+        try:
+            for item in items:
+                pending.append(pool.submit(fn, item))
+                if len(pending) > depth:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def run_ahead[T](items: Iterable[T], *, depth: int) -> Iterator[T]:
+    """Produce `items` on a background thread, at most `depth` results ahead of the consumer.
+
+    The producer's exceptions are re-raised in the consumer. Closing the returned generator
+    stops the producer (after the item it is working on) and closes `items` in its thread.
+    """
+    if depth < 1:
+        yield from items
+        return
+    results: _Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=_produce, args=(items, results, stop), name="cntkn-encode", daemon=True
+    )
+    producer.start()
+    try:
+        while True:
+            kind, value = results.get()
+            if kind == "error":
+                raise cast("BaseException", value)
+            if kind == "done":
+                return
+            yield cast("T", value)
+    finally:
+        stop.set()
+        producer.join()
+
+
+type _Queue = queue.Queue[tuple[str, object]]
+
+
+def _produce(items: Iterable[object], results: _Queue, stop: threading.Event) -> None:
+    it = iter(items)
+    try:
+        for item in it:
+            if not _put(results, stop, "item", item):
+                return
+        _put(results, stop, "done", None)
+    except BaseException as exc:  # noqa: BLE001 - handed to the consumer, which re-raises it
+        _put(results, stop, "error", exc)
+    finally:
+        close = getattr(it, "close", None)
+        if close is not None:
+            close()
+
+
+def _put(results: _Queue, stop: threading.Event, kind: str, value: object) -> bool:
+    """Queue (kind, value) unless the consumer has gone; return whether it was queued."""
+    while not stop.is_set():
+        try:
+            results.put((kind, value), timeout=_POLL_SECONDS)
+        except queue.Full:
+            continue
+        return True
+    return False
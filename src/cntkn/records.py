@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import csv
+import itertools
+import json
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator, Sequence  # pragma: no cover
+
+# Records per encode call: large enough to keep tiktoken's threads busy, small enough that
+# results start flowing immediately and memory stays flat on arbitrarily long inputs.
+DEFAULT_BATCH_SIZE = 1024
+
+type FieldPath = tuple[str, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class Record:
+    """One input record: its 1-based line (or CSV row), optional id, and the texts to count."""
+
+    line: int
+    id: Any = None
+    texts: tuple[str, ...] = ()
+    error: str | None = None
+
+
+def parse_field_path(spec: str) -> FieldPath:
+    """Split a dotted field spec such as ``messages.content`` or ``choices.0.text``."""
+    parts = tuple(spec.split("."))
+    if not all(parts):
+        msg = f"invalid field path {spec!r}"
+        raise ValueError(msg)
+    return parts
+
+
+def _as_text(value: object) -> str:
+    # Non-string leaves (numbers, nested objects) are counted as their compact JSON.
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def extract_texts(obj: object, path: FieldPath) -> list[str]:
+    """Return every value at `path` in `obj`.
+
+    A list met on the way is traversed element by element unless the next path segment is
+    an index, so ``messages.content`` selects the content of every message. Nulls are
+    skipped; a key missing everywhere raises KeyError.
+    """
+    nodes = [obj]
+    for key in path:
+        found: list[object] = []
+        for node in nodes:
+            found.extend(_step(node, key))
+        if not found:
+            raise KeyError(".".join(path))
+        nodes = found
+    return [_as_text(node) for node in nodes if node is not None]
+
+
+def _step(node: object, key: str) -> list[object]:
+    if isinstance(node, dict):
+        return [node[key]] if key in node else []
+    if isinstance(node, list):
+        if key.lstrip("-").isdigit():
+            index = int(key)
+            return [node[index]] if -len(node) <= index < len(node) else []
+        return [value for item in node for value in _step(item, key)]
+    return []
+
+
+def _lookup_id(obj: object, path: FieldPath | None) -> object:
+    if path is None:
+        return None
+    node = obj
+    for key in path:
+        nodes = _step(node, key)
+        if not nodes:
+            return None
+        node = nodes[0]
+    return node
+
+
+def iter_jsonl_records(
+    lines: Iterable[str],
+    fields: Sequence[FieldPath],
+    *,
+    id_field: FieldPath | None = None,
+) -> Iterator[Record]:
+    """Yield one Record per non-blank line of JSON Lines text."""
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield Record(line_no, error=f"invalid JSON: {exc.msg}")
+            continue
+        record_id = _lookup_id(obj, id_field)
+        try:
+            texts = tuple(text for path in fields for text in extract_texts(obj, path))
+        except KeyError as exc:
+            yield Record(line_no, record_id, error=f"missing field {exc.args[0]!r}")
+            continue
+        yield Record(line_no, record_id, texts)
+
+
+def _column_index(header: Sequence[str], column: str) -> int:
+    if column in header:
+        return header.index(column)
+    if column.isdigit() and int(column) < len(header):
+        return int(column)
+    msg = f"no CSV column {column!r} (header: {', '.join(header)})"
+    raise ValueError(msg)
+
+
+def iter_csv_records(
+    lines: Iterable[str],
+    columns: Sequence[str],
+    *,
+    id_column: str | None = None,
+) -> Iterator[Record]:
+    """Return an iterator of one Record per data row of CSV text, whose first row is the header.
+
+    Columns are selected by header name or 0-based index; the header is read eagerly so an
+    unknown column raises ValueError here rather than mid-stream. `line` is the 1-based data row.
+    """
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return iter(())
+    selected = [_column_index(header, column) for column in columns]
+    id_index = _column_index(header, id_column) if id_column is not None else None
+    return _csv_rows(reader, selected, id_index)
+
+
+def _csv_rows(reader: Iterator[list[str]], selected: list[int], id_index: int | None) -> Iterator[Record]:
+    for row_no, row in enumerate(reader, start=1):
+        if not row:
+            continue
+        record_id = row[id_index] if id_index is not None and id_index < len(row) else None
+        if any(index >= len(row) for index in selected):
+            yield Record(row_no, record_id, error=f"row has only {len(row)} columns")
+            continue
+        yield Record(row_no, record_id, tuple(row[index] for index in selected))
+
+
+def count_records(
+    records: Iterable[Record],
+    encode_batch: Callable[[list[str]], Sequence[int]],
+    *,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[tuple[Record, int | None]]:
+    """Yield (record, tokens) in input order, encoding the texts of `batch_size` records per call.
+
+    `tokens` is the sum over the record's texts, or None for records that carry an error.
+    """
+    it = iter(records)
+    while batch := list(itertools.islice(it, batch_size)):
+        texts = [text for record in batch for text in record.texts]
+        counts = iter(encode_batch(texts)) if texts else iter(())
+        for record in batch:
+            if record.error is not None:
+                yield record, None
+            else:
+                yield record, sum(itertools.islice(counts, len(record.texts)))
+
+
+def record_result(
+    record: Record, tokens: int | None, *, with_id: bool, source: str | None = None
+) -> dict[str, Any]:
+    """Build the NDJSON object written for one record."""
+    result: dict[str, Any] = {}
+    if source is not None:
+        result["source"] = source
+    result["line"] = record.line
+    if with_id:
+        result["id"] = record.id
+    if record.error is not None:
+        result["error"] = record.error
+    else:
+        result["tokens"] = tokens
+    return result
@@ -0,0 +1,162 @@
+"""Token totals of a git tree, counted per blob and rolled up per directory (`cntkn repo`).
+
+Files are listed with `git ls-tree` and read with `git cat-file --batch`, so only a local
+`git` binary is needed. Counts are cached under the blob's object id, which names its
+content: after a commit, only blobs the commit added are read and encoded, and every other
+file is a cache lookup. Blobs that are not UTF-8 text are cached as `NOT_TEXT` so they are
+not read again either.
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+import posixpath
+import subprocess  # noqa: S404
+from dataclasses import dataclass
+from typing import IO, TYPE_CHECKING, cast
+
+from cntkn.core import encoding_name_for_model
+from cntkn.inputs import translate_newlines
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Mapping  # pragma: no cover
+    from pathlib import Path  # pragma: no cover
+
+    from cntkn.cache import TokenCache  # pragma: no cover
+    from cntkn.core import TokenCounter  # pragma: no cover
+
+# Cached "count" of a blob that is not UTF-8 text (binary files); such files are skipped.
+NOT_TEXT = -1
+# Blob ids are namespaced in the token cache, apart from its content hashes.
+_KEY_PREFIX = "git:"
+_SYMLINK_MODE = b"120000"
+
+
+class RepoError(RuntimeError):
+    """git is not installed, or could not list or read the requested tree."""
+
+
+@dataclass(frozen=True, slots=True)
+class TreeEntry:
+    path: str  # relative to the directory `list_tree` was given, '/'-separated
+    blob: str
+    size: int
+
+
+@dataclass(frozen=True, slots=True)
+class RepoCounts:
+    files: dict[str, int]  # path -> tokens, or NOT_TEXT
+    encoded_blobs: int  # read and encoded this run
+    cached_blobs: int  # answered by the cache
+
+    @property
+    def total(self) -> int:
+        return sum(tokens for tokens in self.files.values() if tokens != NOT_TEXT)
+
+
+def _git(repo: Path, *args: str) -> bytes:
+    try:
+        result = subprocess.run(["git", "-C", str(repo), *args], capture_output=True, check=True)  # noqa: S603, S607
+    except FileNotFoundError as exc:
+        msg = "git was not found on PATH."
+        raise RepoError(msg) from exc
+    except subprocess.CalledProcessError as exc:
+        raise RepoError(exc.stderr.decode("utf-8", "replace").strip()) from exc
+    return result.stdout
+
+
+def list_tree(repo: Path, rev: str = "HEAD") -> list[TreeEntry]:
+    """Return the files of `rev` under `repo` (a repository or a directory inside one).
+
+    Submodules and symlinks are left out: neither is file content of this repository.
+    """
+    entries = []
+    for record in _git(repo, "ls-tree", "-r", "-l", "-z", rev).split(b"\0"):
+        if not record:
+            continue
+        meta, _, path = record.partition(b"\t")
+        mode, kind, blob, size = meta.split()
+        if kind == b"blob" and mode != _SYMLINK_MODE:
+            entries.append(TreeEntry(os.fsdecode(path), blob.decode("ascii"), int(size)))
+    return entries
+
+
+def iter_blob_texts(repo: Path, blobs: Iterable[str]) -> Iterator[tuple[str, str | None]]:
+    """Yield (blob, text) for each blob id, reading them through one `git cat-file --batch`.
+
+    Text has newlines translated as `count -f` reads files; it is None for blobs that are not
+    UTF-8. Blobs are requested one at a time, so only one is held in memory.
+    """
+    try:
+        proc = subprocess.Popen(  # noqa: S603
+            ["git", "-C", str(repo), "cat-file", "--batch"],  # noqa: S607
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+    except FileNotFoundError as exc:
+        msg = "git was not found on PATH."
+        raise RepoError(msg) from exc
+    # Leaving the block closes both pipes (so git exits) and waits, even if iteration stops early.
+    with proc:
+        requests, replies = cast("IO[bytes]", proc.stdin), cast("IO[bytes]", proc.stdout)
+        for blob in blobs:
+            requests.write(f"{blob}\n".encode("ascii"))
+            requests.flush()
+            header = replies.readline().split()
+            if len(header) != 3:  # noqa: PLR2004 - "<id> missing" instead of "<id> blob <size>"
+                msg = f"git object {blob} cannot be read."
+                raise RepoError(msg)
+            data = replies.read(int(header[2]))
+            replies.read(1)  # the newline after each object
+            try:
+                yield blob, translate_newlines(data.decode("utf-8"))
+            except UnicodeDecodeError:
+                yield blob, None
+
+
+def count_tree(
+    repo: Path,
+    entries: Iterable[TreeEntry],
+    model: str,
+    *,
+    counter: TokenCounter,
+    cache: TokenCache,
+    batch_size: int = 64,
+) -> RepoCounts:
+    """Count every entry, reading and encoding only blobs that `cache` does not hold yet."""
+    entries = list(entries)
+    encoding = encoding_name_for_model(model)
+    blobs = list(dict.fromkeys(entry.blob for entry in entries))
+    cached = cache.get_many([_KEY_PREFIX + blob for blob in blobs], encoding)
+    counts = {key.removeprefix(_KEY_PREFIX): tokens for key, tokens in cached.items()}
+    missing = [blob for blob in blobs if blob not in counts]
+    for batch in itertools.batched(iter_blob_texts(repo, missing), batch_size, strict=False):
+        texts = {blob: text for blob, text in batch if text is not None}
+        encoded = cast("list[int]", counter.encode_batch(list(texts.values()), model)) if texts else []
+        found = dict.fromkeys((blob for blob, _ in batch), NOT_TEXT)
+        found.update(zip(texts, encoded, strict=True))
+        cache.put_many(((_KEY_PREFIX + blob, tokens) for blob, tokens in found.items()), encoding)
+        counts.update(found)
+    return RepoCounts(
+        files={entry.path: counts[entry.blob] for entry in entries},
+        encoded_blobs=len(missing),
+        cached_blobs=len(blobs) - len(missing),
+    )
+
+
+def rollup(files: Mapping[str, int], *, depth: int | None = None) -> dict[str, int]:
+    """Return token totals per directory ("." for the top), down to `depth` levels, by path.
+
+    Files that are not text (`NOT_TEXT`) add nothing, but their directories are listed.
+    """
+    totals: dict[str, int] = {".": 0}
+    for path, tokens in files.items():
+        directory = posixpath.dirname(path)
+        parts = directory.split("/") if directory else []
+        for level in range(len(parts) + 1):
+            if depth is not None and level > depth:
+                break
+            key = "/".join(parts[:level]) or "."
+            totals[key] = totals.get(key, 0) + max(tokens, 0)
+    return dict(sorted(totals.items()))
@@ -0,0 +1,185 @@
+"""Warm-encoder daemon speaking newline-delimited JSON over a Unix socket.
+
+Each request is one JSON object per line::
+
+    {"op": "count" | "encode" | "ping", "model": "gpt-4o", "texts": ["..."]}
+
+and each response is one line: ``{"ok": true, "results": [...]}`` or
+``{"ok": false, "error": "..."}``. A connection may carry any number of requests.
+
+With ``"models": [...]`` instead of ``"model"``, the daemon resolves the names, encodes once
+per distinct encoding and answers ``"results": {"<model>": [...], ...}``. Clients send model
+names as given, so they never load tiktoken; an empty ``texts`` just checks the names.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import signal
+import socket
+import socketserver
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence  # pragma: no cover
+
+SOCKET_NAME = "cntkn.sock"
+# Generous enough for big batches, but a wedged daemon cannot hang a git hook forever.
+DEFAULT_TIMEOUT = 30.0
+
+
+def default_socket_path() -> Path:
+    """Return `$XDG_RUNTIME_DIR/cntkn.sock`, falling back to the cache directory."""
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return Path(runtime) / SOCKET_NAME
+    from cntkn.cache import default_cache_dir  # noqa: PLC0415
+
+    return default_cache_dir() / SOCKET_NAME
+
+
+class ServerError(RuntimeError):
+    """The daemon answered, but reported a failure."""
+
+
+def _handle_request(
+    request: dict[str, Any],
+) -> list[int | list[int]] | dict[str, list[int | list[int]]] | str:
+    from cntkn.core import distinct_encodings, encoding_name_for_model, get_encoder  # noqa: PLC0415
+
+    op = request.get("op")
+    if op == "ping":
+        return "pong"
+    if op not in {"count", "encode"}:
+        msg = f"unknown op {op!r}"
+        raise ValueError(msg)
+    texts = request.get("texts")
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        msg = "texts must be a list of strings"
+        raise TypeError(msg)
+    if "models" not in request:
+        return get_encoder(request.get("model", "")).encode_batch(texts, return_tokens=op == "encode")
+    models = request["models"]
+    if not isinstance(models, list) or not all(isinstance(m, str) for m in models):
+        msg = "models must be a list of strings"
+        raise TypeError(msg)
+    by_encoding = {
+        encoding: get_encoder(model).encode_batch(texts, return_tokens=op == "encode")
+        for encoding, model in distinct_encodings(models).items()
+    }
+    return {model: by_encoding[encoding_name_for_model(model)] for model in models}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                response = {"ok": True, "results": _handle_request(json.loads(line))}
+            except Exception as exc:  # noqa: BLE001  # report every failure to the client
+                response = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class TokenServer(socketserver.ThreadingUnixStreamServer):
+    """Threaded server; tiktoken releases the GIL, so requests encode concurrently."""
+
+    daemon_threads = True
+    # socketserver's default backlog of 5 makes bursts of hook invocations fail with EAGAIN.
+    request_queue_size = 128
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if path.exists():
+            if is_server_running(path):
+                msg = f"a cntkn server is already listening on {path}"
+                raise OSError(msg)
+            path.unlink()  # stale socket left by a crashed daemon
+        # Bind under a private umask, so the socket is never reachable by others, not even briefly.
+        umask = os.umask(0o077)
+        try:
+            super().__init__(str(path), _Handler)
+        finally:
+            os.umask(umask)
+        self.path = path
+
+    def server_close(self) -> None:
+        super().server_close()
+        with contextlib.suppress(FileNotFoundError):
+            self.path.unlink()
+
+
+def serve(path: Path, models: Sequence[str]) -> None:
+    """Preload encoders for `models` and answer requests on `path` until interrupted."""
+    from cntkn.core import get_encoder  # noqa: PLC0415
+
+    for model in models:
+        get_encoder(model)
+    # Treat SIGTERM like Ctrl-C so service managers get a clean shutdown and socket removal.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    with TokenServer(path) as server, contextlib.suppress(KeyboardInterrupt):
+        server.serve_forever()
+
+
+def _connect(path: Path, timeout: float) -> socket.socket | None:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(str(path))
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return None
+    return sock
+
+
+def is_server_running(path: Path) -> bool:
+    sock = _connect(path, timeout=1.0)
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+
+def request_tokens(
+    texts: Sequence[str],
+    model: str,
+    *,
+    return_tokens: bool = False,
+    path: Path | None = None,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> list[int | list[int]] | None:
+    """Ask a running daemon to count (or encode) `texts`; return None if none is listening."""
+    request = {"op": "encode" if return_tokens else "count", "model": model, "texts": list(texts)}
+    return _request(request, path or default_socket_path(), timeout)
+
+
+def request_tokens_multi(
+    texts: Sequence[str],
+    models: Sequence[str],
+    *,
+    return_tokens: bool = False,
+    path: Path | None = None,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> dict[str, list[int | list[int]]] | None:
+    """Like `request_tokens` for each of `models`, keyed by model; the daemon resolves the names."""
+    request = {"op": "encode" if return_tokens else "count", "models": list(models), "texts": list(texts)}
+    return _request(request, path or default_socket_path(), timeout)
+
+
+def _request(request: dict[str, Any], path: Path, timeout: float) -> Any:  # noqa: ANN401  # JSON results
+    sock = _connect(path, timeout)
+    if sock is None:
+        return None
+    with sock, sock.makefile("rwb") as stream:
+        stream.write(json.dumps(request).encode("utf-8") + b"\n")
+        stream.flush()
+        response = json.loads(stream.readline() or b"null")
+    if not isinstance(response, dict):
+        msg = "cntkn server closed the connection without answering"
+        raise ServerError(msg)
+    if not response.get("ok"):
+        raise ServerError(response.get("error", "unknown error"))
+    return response["results"]
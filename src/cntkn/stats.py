@@ -0,0 +1,155 @@
+"""Per-run timing and throughput instrumentation (`count --stats`).
+
+A `RunStats` collects wall-clock time per phase (config, discovery, read, load_encoder,
+encode, cache, output, ...) and bytes/tokens/encode time per input. The core counting
+functions accept one through their `stats` argument, so library users get the same figures.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, cast
+
+if TYPE_CHECKING:
+    from collections.abc import Generator, Iterable, Iterator  # pragma: no cover
+    from contextlib import AbstractContextManager  # pragma: no cover
+    from pathlib import Path  # pragma: no cover
+
+_MB = 1 << 20
+_DONE = object()
+
+
+@dataclass(slots=True)
+class InputStats:
+    label: str
+    bytes_read: int
+    tokens: int
+    seconds: float  # time spent encoding this input
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "label": self.label,
+            "bytes": self.bytes_read,
+            "tokens": self.tokens,
+            "seconds": self.seconds,
+            "tokens_per_s": _rate(self.tokens, self.seconds),
+            "mb_per_s": _rate(self.bytes_read / _MB, self.seconds),
+        }
+
+
+def _rate(amount: float, seconds: float) -> float | None:
+    return amount / seconds if seconds > 0 else None
+
+
+class RunStats:
+    """Phase timings and per-input counters for one run."""
+
+    def __init__(self, started: float | None = None) -> None:
+        # `started` is a `time.perf_counter()` reading, for runs that began before this object.
+        self.started = time.perf_counter() if started is None else started
+        self.phases: dict[str, float] = {}
+        self.inputs: list[InputStats] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Generator[None]:
+        """Add the time spent in the `with` block to phase `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def timed[T](self, name: str, items: Iterable[T]) -> Iterator[T]:
+        """Yield from `items`, charging the time spent producing each one to phase `name`."""
+        it = iter(items)
+        while True:
+            start = time.perf_counter()
+            item = next(it, _DONE)
+            self.add_time(name, time.perf_counter() - start)
+            if item is _DONE:
+                return
+            yield cast("T", item)
+
+    def record(self, label: str, *, bytes_read: int, tokens: int, seconds: float) -> None:
+        self.inputs.append(InputStats(label, bytes_read, tokens, seconds))
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def as_dict(self) -> dict[str, Any]:
+        elapsed = self.elapsed
+        total_bytes = sum(i.bytes_read for i in self.inputs)
+        total_tokens = sum(i.tokens for i in self.inputs)
+        return {
+            "elapsed_seconds": elapsed,
+            "phases": dict(self.phases),
+            "bytes": total_bytes,
+            "tokens": total_tokens,
+            "tokens_per_s": _rate(total_tokens, elapsed),
+            "mb_per_s": _rate(total_bytes / _MB, elapsed),
+            "inputs": [i.as_dict() for i in self.inputs],
+        }
+
+    def format_text(self) -> str:
+        """Render a human-readable breakdown (what `--stats` prints to stderr)."""
+        data = self.as_dict()
+        elapsed = data["elapsed_seconds"]
+        lines = [f"cntkn stats: {elapsed * 1000:.1f} ms total"]
+        for name, seconds in data["phases"].items():
+            share = seconds / elapsed * 100 if elapsed else 0.0
+            lines.append(f"  {name:<13} {seconds * 1000:10.1f} ms {share:5.1f}%")
+        lines.append(
+            f"  {data['bytes']} bytes, {data['tokens']} tokens: "
+            f"{_fmt_rate(data['tokens_per_s'], 'tokens/s')}, {_fmt_rate(data['mb_per_s'], 'MB/s')} overall"
+        )
+        lines.extend(
+            f"  {entry['label']}: {entry['bytes']} bytes, {entry['tokens']} tokens, "
+            f"{_fmt_rate(entry['tokens_per_s'], 'tokens/s')}, {_fmt_rate(entry['mb_per_s'], 'MB/s')}"
+            for entry in data["inputs"]
+        )
+        return "\n".join(lines)
+
+    def to_prometheus(self) -> str:
+        """Render the run in Prometheus text exposition format (for node_exporter's textfile collector)."""
+        data = self.as_dict()
+        metrics = [
+            ("cntkn_run_seconds", "Wall-clock time of the last cntkn run.", [("", data["elapsed_seconds"])]),
+            (
+                "cntkn_phase_seconds",
+                "Time spent per phase in the last cntkn run.",
+                [(f'{{phase="{name}"}}', seconds) for name, seconds in data["phases"].items()],
+            ),
+            ("cntkn_inputs", "Inputs counted in the last cntkn run.", [("", len(data["inputs"]))]),
+            ("cntkn_bytes", "Bytes read in the last cntkn run.", [("", data["bytes"])]),
+            ("cntkn_tokens", "Tokens produced in the last cntkn run.", [("", data["tokens"])]),
+            ("cntkn_last_run_timestamp_seconds", "Unix time of the last cntkn run.", [("", time.time())]),
+        ]
+        lines: list[str] = []
+        for name, help_text, samples in metrics:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            lines += [f"{name}{labels} {value}" for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Path) -> None:
+        """Write `to_prometheus()` to `path` atomically, so a scraper never sees a partial file."""
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(self.to_prometheus(), encoding="utf-8")
+        tmp.replace(path)
+
+
+def maybe_phase(stats: RunStats | None, name: str) -> AbstractContextManager[None]:
+    """`stats.phase(name)`, or a no-op context when not collecting stats."""
+    return stats.phase(name) if stats is not None else nullcontext()
+
+
+def _fmt_rate(value: float | None, unit: str) -> str:
+    if value is None:
+        return f"- {unit}"
+    return f"{value:,.0f} {unit}" if value >= 100 else f"{value:.2f} {unit}"  # noqa: PLR2004
@@ -0,0 +1,73 @@
+"""Compact token arrays and binary token files for training-data pipelines.
+
+Tokens are held as ``array('I')`` (4-byte unsigned ints, exposed through the buffer protocol,
+so ``numpy.frombuffer(arr, dtype="<u4")`` wraps them without a copy) and written as
+little-endian uint32 in one of three layouts:
+
+- ``raw``: the tokens of every input, concatenated;
+- ``npy``: the same concatenation as a 1-D ``<u4`` NumPy ``.npy`` file (no NumPy needed to write);
+- ``lp``: per input, a little-endian uint32 token count followed by that many tokens.
+"""
+
+from __future__ import annotations
+
+import struct
+import sys
+from array import array
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable  # pragma: no cover
+    from typing import BinaryIO  # pragma: no cover
+
+# uint32: "I" on every mainstream platform, "L" where unsigned int is not 4 bytes.
+TOKEN_TYPECODE = "I" if array("I").itemsize == 4 else "L"  # noqa: PLR2004
+
+FORMATS = ("raw", "npy", "lp")
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+_NPY_ALIGN = 64
+
+
+def to_array(tokens: Iterable[int]) -> array[int]:
+    """Return `tokens` as a compact uint32 array (arrays are returned as they are)."""
+    if isinstance(tokens, array) and tokens.typecode == TOKEN_TYPECODE:
+        return tokens
+    return array(TOKEN_TYPECODE, tokens)
+
+
+def _little_endian(tokens: array[int]) -> array[int]:
+    if sys.byteorder == "little":
+        return tokens
+    swapped = array(tokens.typecode, tokens)  # pragma: no cover
+    swapped.byteswap()  # pragma: no cover
+    return swapped  # pragma: no cover
+
+
+def npy_header(length: int) -> bytes:
+    """Return the .npy (format 1.0) header for a 1-D little-endian uint32 array of `length`."""
+    header = f"{{'descr': '<u4', 'fortran_order': False, 'shape': ({length},), }}"
+    # Magic, version and the 2-byte header length take 10 bytes; pad so the data is aligned.
+    padding = -(len(_NPY_MAGIC) + 2 + len(header) + 1) % _NPY_ALIGN
+    encoded = (header + " " * padding + "\n").encode("latin-1")
+    return _NPY_MAGIC + struct.pack("<H", len(encoded)) + encoded
+
+
+def write_tokens(out: BinaryIO, token_lists: Iterable[Iterable[int]], fmt: str) -> int:
+    """Write `token_lists` (one per input) to `out` in `fmt`; return the number of bytes written.
+
+    raw and lp write each input as it arrives; npy needs the total length up front, so it
+    collects the inputs first.
+    """
+    if fmt not in FORMATS:
+        msg = f"unknown token format {fmt!r}; expected one of {', '.join(FORMATS)}"
+        raise ValueError(msg)
+    arrays: Iterable[array[int]] = (_little_endian(to_array(tokens)) for tokens in token_lists)
+    written = 0
+    if fmt == "npy":
+        arrays = list(arrays)
+        written += out.write(npy_header(sum(map(len, arrays))))
+    for tokens in arrays:
+        if fmt == "lp":
+            written += out.write(struct.pack("<I", len(tokens)))
+        written += out.write(memoryview(tokens).cast("B"))
+    return written
@@ -1,4 +1,7 @@
 import pytest
+import tiktoken
+
+from cntkn.core import Encoder
 
 MAX_OUTPUT_LINES = 32
 
@@ -21,3 +24,44 @@ def pytest_runtest_logreport(report: pytest.TestReport) -> None:
             else:
                 new_sections.append((title, content))
         report.sections = new_sections
+
+
+# Offline stand-in for the real BPE files: byte-level vocab plus a few merges, split with
+# cl100k_base's pre-tokenizer so chunk-boundary behaviour matches the real encodings.
+TOY_PAT_STR = (
+    r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+"""
+    r"""|\s++$|\s*[\r\n]|\s+(?!\S)|\s"""
+)
+TOY_MERGES = [
+    b"th",
+    b"he",
+    b"the",
+    b" t",
+    b" th",
+    b" the",
+    b"in",
+    b"ng",
+    b"ing",
+    b"er",
+    b"  ",
+    b"\n\n",
+    b"ll",
+]
+
+
+@pytest.fixture(scope="session")
+def toy_encoding():
+    ranks = {bytes([i]): i for i in range(256)}
+    for merge in TOY_MERGES:
+        ranks[merge] = len(ranks)
+    return tiktoken.Encoding(
+        name="toy_bytes",
+        pat_str=TOY_PAT_STR,
+        mergeable_ranks=ranks,
+        special_tokens={"<|endoftext|>": len(ranks)},
+    )
+
+
+@pytest.fixture
+def toy_encoder(toy_encoding):
+    return Encoder(toy_encoding)
@@ -0,0 +1,78 @@
+import pytest
+
+from cntkn.cache import TokenCache, default_cache_dir
+from cntkn.core import count_tokens, count_tokens_batch
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with TokenCache(tmp_path / "cache", max_entries=3) as c:
+        yield c
+
+
+class CountingCounter:
+    def __init__(self):
+        self.seen = []
+
+    def encode(self, text, model, *, return_tokens=False):
+        self.seen.append(text)
+        return len(text.split())
+
+    def encode_batch(self, texts, model, *, return_tokens=False, num_threads=8):
+        return [self.encode(t, model) for t in texts]
+
+
+def test_default_cache_dir_uses_xdg(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert default_cache_dir() == tmp_path / "cntkn"
+
+
+def test_put_and_get_are_keyed_by_encoding(cache):
+    key = cache.digest("hello")
+    cache.put(key, "cl100k_base", 1)
+    assert cache.get(key, "cl100k_base") == 1
+    assert cache.get(key, "o200k_base") is None
+
+
+def test_lru_eviction_keeps_recently_used(cache):
+    keys = [cache.digest(str(i)) for i in range(4)]
+    for n, key in enumerate(keys[:3]):
+        cache.put(key, "enc", n)
+    cache.touch([keys[0]], "enc")  # keys[1] is now least recently used
+    cache.put(keys[3], "enc", 3)
+    assert cache.get_many(keys, "enc") == {keys[0]: 0, keys[2]: 2, keys[3]: 3}
+
+
+def test_eviction_counts_rows_only_when_over_the_cap(tmp_path, monkeypatch):
+    scans = []
+    count = TokenCache._count
+    monkeypatch.setattr(TokenCache, "_count", lambda self: scans.append(1) or count(self))
+    with TokenCache(tmp_path / "cache", max_entries=128) as cache:
+        for i in range(128):
+            cache.put(cache.digest(str(i)), "enc", i)
+        assert len(scans) == 1  # on the first write only
+        cache.put(cache.digest("one more"), "enc", 1)
+        assert len(scans) == 2
+        # The row over the cap goes, plus 1/64 of the cap, so the next writes fit.
+        assert cache.stats().entries == 126
+        cache.put(cache.digest("and another"), "enc", 1)
+        assert len(scans) == 2
+
+
+def test_stats_and_clear(cache):
+    cache.put_many([(cache.digest("a"), 1), (cache.digest("b"), 2)], "enc")
+    stats = cache.stats()
+    assert stats.entries == 2
+    assert stats.by_encoding == {"enc": 2}
+    assert stats.size_bytes > 0
+    assert cache.clear() == 2
+    assert cache.stats().entries == 0
+
+
+def test_count_tokens_batch_encodes_only_misses(cache):
+    counter = CountingCounter()
+    assert count_tokens_batch(["a b", "c"], "gpt-4o", counter=counter, cache=cache) == [2, 1]
+    assert count_tokens_batch(["a b", "d e f", "d e f"], "gpt-4o", counter=counter, cache=cache) == [2, 3, 3]
+    assert counter.seen == ["a b", "c", "d e f"]
+    assert count_tokens("c", "gpt-4o", counter=counter, cache=cache) == 1
+    assert counter.seen == ["a b", "c", "d e f"]
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+
+from cntkn.chunking import (
+    DEFAULT_CHUNK_SIZE,
+    MIN_LIMIT_CHUNK_SIZE,
+    find_split_point,
+    iter_safe_chunks,
+    limit_chunk_size,
+)
+from cntkn.core import count_tokens_stream
+
+SAMPLES = [
+    "",
+    "hello world",
+    "the thing\n\nin the  end\r\nthere's 123456 more.\nok",
+    "punct.\n/path and   spaces   \n\n\nthen",
+    "unicode café 中文 ✓\nnext line",
+    "a" * 200,
+]
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("abc\ndef", 4),
+        ("abc def", 3),
+        ("abc  def", 0),  # space run: the pre-tokenizer may split it either way
+        ("abc \ndef", 0),  # whitespace before the newline binds to it
+        ("abc\n def", 0),
+        ("abc", 0),
+    ],
+)
+def test_find_split_point(text, expected):
+    assert find_split_point(text) == expected
+
+
+class ToyCounter:
+    def __init__(self, encoder):
+        self.encoder = encoder
+
+    def encode(self, text, model, *, return_tokens=False):
+        return self.encoder.encode(text, return_tokens=return_tokens)
+
+
+def _pieces(text, size):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+@pytest.mark.parametrize("size", [1, 2, 5, 64])
+def test_safe_chunks_reassemble_and_match_whole_encoding(toy_encoding, text, size):
+    chunks = list(iter_safe_chunks(_pieces(text, size), size))
+    assert "".join(chunks) == text
+    tokens = [t for chunk in chunks for t in toy_encoding.encode(chunk)]
+    assert tokens == toy_encoding.encode(text)
+
+
+def test_random_text_differential(toy_encoding):
+    rng = random.Random(1234)  # noqa: S311
+    alphabet = list("ab AB\n\n  \t\r.,'s/12é中x")
+    for _ in range(500):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 80)))
+        chunks = iter_safe_chunks(_pieces(text, 3), 3)
+        assert [t for c in chunks for t in toy_encoding.encode(c)] == toy_encoding.encode(text)
+
+
+def test_chunk_without_split_point_keeps_growing():
+    chunks = list(iter_safe_chunks(["x" * 10] * 10, 4))
+    assert chunks == ["x" * 100]
+
+
+def test_count_tokens_stream_matches_whole_text(toy_encoder):
+    text = "the thing in the end\n" * 50
+    counter = ToyCounter(toy_encoder)
+    assert count_tokens_stream(_pieces(text, 7), chunk_size=16, counter=counter) == toy_encoder.encode(text)
+    tokens = count_tokens_stream(_pieces(text, 7), chunk_size=16, return_tokens=True, counter=counter)
+    assert tokens == toy_encoder.encode(text, return_tokens=True)
+
+
+def test_count_tokens_stream_stops_past_limit(toy_encoder):
+    pulled = []
+
+    def chunks():
+        for i in range(100):
+            pulled.append(i)
+            yield "the thing in the end\n"
+
+    counter = ToyCounter(toy_encoder)
+    n = count_tokens_stream(chunks(), chunk_size=16, counter=counter, limit=10)
+    assert n > 10
+    assert len(pulled) < 10
+    assert count_tokens_stream(["the end"], counter=counter, limit=10) == toy_encoder.encode("the end")
+
+
+def test_limit_chunk_size():
+    assert limit_chunk_size(10) == MIN_LIMIT_CHUNK_SIZE
+    assert limit_chunk_size(100_000) == 800_000
+    assert limit_chunk_size(10**9) == DEFAULT_CHUNK_SIZE
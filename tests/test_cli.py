@@ -1,11 +1,24 @@
+import gzip
+import json
+import lzma
+import os
+import subprocess
+import sys
+import threading
+from array import array
 from importlib.metadata import version as pkg_version
 from pathlib import Path
 
 import pytest
+import tiktoken
 from click.testing import CliRunner
 
-from cntkn.cli import ModelName, _color_from_config, main
-from cntkn.config import Config, _find_pyproject, load_config
+from cntkn.cli import ModelName, _color_from_config, _iter_results, main
+from cntkn.config import Config, _find_pyproject, load_config, store_settings
+from cntkn.core import Encoder
+from cntkn.dedup import Deduplicator
+from cntkn.server import TokenServer
+from cntkn.stats import RunStats
 
 
 @pytest.fixture
@@ -32,6 +45,7 @@ def test_models_command_json(runner):
         (["count", "hello world"], None, "2"),
         (["count", "-"], "hello world", "2"),
         (["count"], "stdin input", lambda o: o.strip().isdigit()),
+        ([], "hello world", "2"),  # no command: main runs `count` with its defaults
     ],
 )
 def test_various_input_modes(runner, args, stdin, expected):
@@ -210,3 +224,495 @@ def test_load_config_without_pyproject(tmp_path: Path) -> None:
     cfg = load_config(cwd=tmp_path)
     assert cfg.default_model  # defaults returned
     assert _find_pyproject(tmp_path) is None
+
+
+def test_threads_option_keeps_input_order(tmp_path, runner):
+    file1 = tmp_path / "file1.txt"
+    file1.write_text("hello world")
+    result = runner.invoke(main, ["count", "foo", "-f", str(file1), "--threads", "2"])
+    assert result.exit_code == 0
+    assert list(map(int, result.stdout.strip().splitlines())) == [2, 1]
+
+
+def test_stream_matches_whole_text_count(tmp_path, runner):
+    sample = tmp_path / "big.txt"
+    sample.write_text("the quick brown fox\njumps over the lazy dog\n" * 500)
+    whole = runner.invoke(main, ["count", "-f", str(sample)])
+    streamed = runner.invoke(main, ["count", "-f", str(sample), "--stream", "--chunk-size", "64"])
+    assert streamed.exit_code == 0
+    assert streamed.stdout == whole.stdout
+
+
+def test_stream_from_stdin(runner):
+    result = runner.invoke(main, ["count", "--stream"], input="hello world")
+    assert result.exit_code == 0
+    assert result.stdout.strip() == "2"
+
+
+def test_recursive_with_jobs_matches_serial(tmp_path, runner):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "one.txt").write_text("hello world")
+    (tmp_path / "sub" / "two.txt").write_text("foo")
+    (tmp_path / "skip.log").write_text("ignored by gitignore")
+    (tmp_path / ".gitignore").write_text("*.log\n")
+    serial = runner.invoke(main, ["count", "-r", str(tmp_path), "--exclude", ".gitignore", "--verbose"])
+    parallel = runner.invoke(
+        main, ["count", "-r", str(tmp_path), "--exclude", ".gitignore", "--verbose", "--jobs", "2"]
+    )
+    assert parallel.exit_code == 0
+    assert parallel.stdout == serial.stdout
+    assert "skip.log" not in parallel.stdout
+    assert "two.txt → 1 tokens" in parallel.stdout
+
+
+def test_recursive_without_matches_is_error(tmp_path, runner):
+    result = runner.invoke(main, ["count", "-r", str(tmp_path)])
+    assert result.exit_code != 0
+    assert "No files matched" in result.stderr
+
+
+def test_cache_commands(monkeypatch, tmp_path, runner):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    stats = runner.invoke(main, ["cache", "stats", "--json"])
+    assert stats.exit_code == 0
+    assert '"entries": 0' in stats.stdout
+    cleared = runner.invoke(main, ["cache", "clear"])
+    assert cleared.exit_code == 0
+    assert "Removed 0" in cleared.stdout
+
+
+def test_count_with_cache_reuses_counts(monkeypatch, tmp_path, runner):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    first = runner.invoke(main, ["count", "hello world", "--cache"])
+    second = runner.invoke(main, ["count", "hello world", "--cache"])
+    assert first.stdout == second.stdout == "2\n"
+    assert '"entries": 1' in runner.invoke(main, ["cache", "stats", "--json"]).stdout
+
+
+def test_server_flag_falls_back_without_daemon(monkeypatch, tmp_path, runner):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    result = runner.invoke(main, ["count", "hello world", "--server"])
+    assert result.exit_code == 0
+    assert result.stdout.strip() == "2"
+
+
+def test_server_client_does_not_load_tiktoken(monkeypatch, tmp_path, toy_encoder):
+    # The daemon resolves model names, so a client run never pays for importing tiktoken.
+    monkeypatch.setattr("cntkn.core.get_encoder", lambda model: toy_encoder)
+    with TokenServer(tmp_path / "cntkn.sock") as server:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                "-m",
+                "cntkn",
+                "count",
+                "hello world",
+                "-m",
+                "gpt-4",
+                "--server",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=tmp_path,
+            env={**os.environ, "XDG_RUNTIME_DIR": str(tmp_path)},
+        )
+        server.shutdown()
+        thread.join()
+    assert result.stdout.strip() == str(toy_encoder.encode("hello world"))
+    imported = {
+        line.rsplit("|", 1)[-1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:")
+    }
+    assert "socket" in imported
+    assert not {name for name in imported if name.split(".")[0] == "tiktoken"}
+
+
+def test_watch_once_resumes_from_saved_offsets(tmp_path, runner):
+    log = tmp_path / "log.txt"
+    log.write_text("hello world\n", encoding="utf-8")
+    args = ["watch", str(log), "--once", "--json", "--state", str(tmp_path / "state.json")]
+    first = json.loads(runner.invoke(main, args).stdout)
+    assert first == {"source": str(log), "tokens": 3, "delta": 3, "offset": 12, "restarted": False}
+    assert not runner.invoke(main, args).stdout  # unchanged since the saved poll
+    with log.open("a", encoding="utf-8") as fh:
+        fh.write("hello\n")
+    second = json.loads(runner.invoke(main, args).stdout)
+    assert (second["tokens"], second["delta"], second["offset"]) == (5, 2, 18)
+
+
+def test_follow_rejects_inline_text_and_other_modes(tmp_path, runner):
+    log = tmp_path / "log.txt"
+    log.write_text("hello\n", encoding="utf-8")
+    result = runner.invoke(main, ["count", "--follow", "hello"])
+    assert result.exit_code == 2
+    assert "--follow needs files" in result.output
+    result = runner.invoke(main, ["count", "--follow", "--estimate", "-f", str(log)])
+    assert result.exit_code == 2
+    assert "--estimate cannot be combined with --follow" in result.output
+
+
+def test_split_streams_chunks_with_offsets(tmp_path, runner):
+    doc = tmp_path / "doc.txt"
+    doc.write_text("First sentence here. Second one follows.\n\nA new paragraph.\n", encoding="utf-8")
+    result = runner.invoke(
+        main, ["split", "-f", str(doc), "--max-tokens", "6", "--overlap", "1", "--boundaries"]
+    )
+    assert result.exit_code == 0
+    chunks = [json.loads(line) for line in result.stdout.splitlines()]
+    text = doc.read_text(encoding="utf-8")
+    assert [c["index"] for c in chunks] == list(range(len(chunks)))
+    assert all(c["text"] == text[c["start"] : c["end"]] and c["tokens"] <= 6 for c in chunks)
+    assert chunks[-1]["end"] == len(text)
+    result = runner.invoke(main, ["split", "hello", "--max-tokens", "2", "--overlap", "2"])
+    assert result.exit_code == 2
+
+
+def test_cli_import_does_not_load_heavy_modules():
+    lazy = {"tiktoken", "sqlite3", "socket", "concurrent.futures", "csv", "hashlib"}
+    lazy |= {f"cntkn.{name}" for name in ("dedup", "encodings", "pipeline", "records", "stats")}
+    code = f"import sys, cntkn.cli; print(sorted({lazy!r} & set(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+def test_jsonl_mode_streams_one_result_per_record(tmp_path, runner):
+    data = tmp_path / "data.jsonl"
+    data.write_text(
+        '{"id": "a", "messages": [{"content": "hello world"}, {"content": "hello"}]}\n'
+        '{"id": "b", "messages": []}\n'
+    )
+    result = runner.invoke(
+        main, ["count", "--jsonl", "-f", str(data), "--field", "messages.content", "--id-field", "id"]
+    )
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert lines == [
+        {"line": 1, "id": "a", "tokens": 3},
+        {"line": 2, "id": "b", "error": "missing field 'messages.content'"},
+    ]
+    assert result.exit_code == 1
+    assert "1 of 2 records" in result.stderr
+
+
+def test_csv_mode_total(tmp_path, runner):
+    data = tmp_path / "data.csv"
+    data.write_text("id,text\n1,hello world\n2,hello\n")
+    result = runner.invoke(main, ["count", "--csv", "-f", str(data), "--column", "text", "--total"])
+    assert result.exit_code == 0
+    assert result.stdout == "3\n"
+
+
+def test_record_mode_requires_field(runner):
+    result = runner.invoke(main, ["count", "--jsonl", "{}"])
+    assert result.exit_code != 0
+    assert "--field" in result.stderr
+
+
+def test_max_tokens_exit_code(tmp_path, runner):
+    big = tmp_path / "big.txt"
+    big.write_text("hello world " * 100_000)
+    over = runner.invoke(main, ["count", "-f", str(big), "--max-tokens", "100", "--quiet"])
+    assert over.exit_code == 3
+    assert not over.stdout
+    fits = runner.invoke(main, ["count", "hello world", "--max-tokens", "100"])
+    assert fits.exit_code == 0
+    assert fits.stdout == "2\n"
+    total = runner.invoke(main, ["count", "hello", "hello world", "--max-tokens", "2", "--total"])
+    assert total.exit_code == 3
+    assert total.stdout == ">2\n"
+
+
+def test_max_tokens_size_bound_allows_for_crlf(tmp_path, runner, toy_encoding, monkeypatch):
+    # Merged newline runs make a token cover 8 bytes, so 64 CRLFs (128 bytes on disk, 64 after
+    # newline translation) are 8 tokens; the raw size alone would bound them at 16.
+    ranks = dict(toy_encoding._mergeable_ranks)
+    for run in (b"\n" * 4, b"\n" * 8):
+        ranks[run] = len(ranks)
+    wide = tiktoken.Encoding(
+        "wide_newlines", pat_str=toy_encoding._pat_str, mergeable_ranks=ranks, special_tokens={}
+    )
+    monkeypatch.setattr("cntkn.core.get_encoder", lambda model: Encoder(wide))
+    crlf = tmp_path / "crlf.txt"
+    crlf.write_bytes(b"\r\n" * 64)
+    result = runner.invoke(main, ["count", "-f", str(crlf), "--max-tokens", "10", "--quiet"])
+    assert result.exit_code == 0
+
+
+def test_estimate_json_reports_interval(runner):
+    result = runner.invoke(main, ["count", "hello world", "--estimate", "--json"])
+    assert result.exit_code == 0
+    assert json.loads(result.stdout) == {"hello world": {"tokens": 2, "low": 2, "high": 2, "method": "exact"}}
+
+
+def test_estimate_without_samples_uses_packaged_calibration(runner):
+    text = "hello world " * 400
+    result = runner.invoke(main, ["count", text, "--estimate", "--samples", "0", "--json"])
+    assert result.exit_code == 0, result.output
+    (estimate,) = json.loads(result.stdout).values()
+    assert estimate["method"] == "calibrated"
+    assert estimate["low"] < estimate["tokens"] < estimate["high"]
+
+
+def test_estimate_rejects_other_modes(runner):
+    result = runner.invoke(main, ["count", "hello", "--estimate", "--max-tokens", "3"])
+    assert result.exit_code != 0
+    assert "--estimate cannot be combined with --max-tokens" in result.stderr
+
+
+def test_stats_join_json_output(runner):
+    result = runner.invoke(main, ["count", "hello world", "--stats", "--json"])
+    assert result.exit_code == 0
+    data = json.loads(result.stdout)
+    assert data["results"] == {"hello world": 2}
+    assert data["stats"]["tokens"] == 2
+    assert data["stats"]["inputs"][0]["label"] == "hello world"
+    assert {"config", "encode"} <= data["stats"]["phases"].keys()
+
+
+def test_stats_text_goes_to_stderr(tmp_path, runner):
+    prom = tmp_path / "cntkn.prom"
+    result = runner.invoke(main, ["count", "hello", "hello world", "--stats", "--stats-prom", str(prom)])
+    assert result.exit_code == 0
+    assert result.stdout == "1\n2\n"
+    assert "cntkn stats:" in result.stderr
+    assert "hello world: 11 bytes, 2 tokens" in result.stderr
+    assert "cntkn_tokens 3" in prom.read_text().splitlines()
+
+
+def test_stats_rejects_estimate(runner):
+    result = runner.invoke(main, ["count", "hello", "--stats", "--estimate"])
+    assert result.exit_code != 0
+    assert "--stats cannot be combined with --estimate" in result.stderr
+
+
+def test_multiple_models_grouped_json(tmp_path, runner):
+    path = tmp_path / "a.txt"
+    path.write_text("hello world")
+    args = [
+        "count",
+        "-f",
+        str(path),
+        "hi",
+        "--json",
+        "-m",
+        "gpt-4o",
+        "-m",
+        "gpt-4",
+        "--encoding",
+        "cl100k_base",
+    ]
+    result = runner.invoke(main, args)
+    assert result.exit_code == 0
+    data = json.loads(result.stdout)
+    assert list(data) == ["gpt-4o", "gpt-4", "cl100k_base"]
+    assert data["gpt-4"] == data["cl100k_base"] == {str(path): 2, "hi": 1}
+    jobs = runner.invoke(main, [*args, "--jobs", "2"])
+    assert json.loads(jobs.stdout) == data
+
+
+def test_multiple_models_reject_other_modes(runner):
+    result = runner.invoke(main, ["count", "hi", "-m", "gpt-4o", "-m", "gpt-4", "--max-tokens", "3"])
+    assert result.exit_code != 0
+    assert "Several --model/--encoding values cannot be combined with --max-tokens" in result.stderr
+
+
+def test_tokens_format_binary_output(tmp_path, runner):
+    expected = runner.invoke(main, ["count", "hello world", "--json", "--tokens"])
+    tokens = json.loads(expected.stdout)["hello world"]
+    raw = runner.invoke(main, ["count", "hello world", "--tokens-format", "raw"])
+    assert raw.exit_code == 0
+    assert list(array("I", raw.stdout_bytes)) == tokens
+    out = tmp_path / "tokens.lp"
+    lp = runner.invoke(main, ["count", "hello world", "hi", "--tokens-format", "lp", "-o", str(out)])
+    assert lp.exit_code == 0
+    assert not lp.stdout_bytes
+    assert out.read_bytes()[:4] == len(tokens).to_bytes(4, "little")
+
+
+def test_tokens_format_rejects_json(runner):
+    result = runner.invoke(main, ["count", "hi", "--tokens-format", "npy", "--json"])
+    assert result.exit_code != 0
+    assert "cannot be combined with --json" in result.stderr
+
+
+def test_text_spelling_stdin_is_not_read_from_stdin(tmp_path, runner):
+    (tmp_path / "a.txt").write_text("STDIN", encoding="utf-8")
+    piped = "hello world and much more text on stdin"
+    for mode in [[], ["--prefetch", "0"], ["--stream"], ["--max-tokens", "100"]]:
+        result = runner.invoke(
+            main, ["count", "-f", str(tmp_path / "a.txt"), "STDIN", "--json", *mode], input=piped
+        )
+        assert result.exit_code == 0, (mode, result.output)
+        counts = json.loads(result.stdout)
+        assert counts[str(tmp_path / "a.txt")] == counts["STDIN"], mode
+    result = runner.invoke(main, ["count", "-", "STDIN", "--json"], input=piped)
+    assert json.loads(result.stdout)["stdin"] > json.loads(result.stdout)["STDIN"]
+
+
+def test_ndjson_streams_running_totals(tmp_path, runner):
+    (tmp_path / "a.txt").write_text("hello world", encoding="utf-8")
+    args = ["count", "-f", str(tmp_path / "a.txt"), "hello", "--ndjson", "--total"]
+    result = runner.invoke(main, args)
+    assert result.exit_code == 0
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [line["source"] for line in lines] == [str(tmp_path / "a.txt"), "hello"]
+    assert lines[1]["total_tokens"] == lines[0]["tokens"] + lines[1]["tokens"]
+
+
+def test_ndjson_rejects_json(runner):
+    result = runner.invoke(main, ["count", "hi", "--ndjson", "--json"])
+    assert result.exit_code != 0
+    assert "--ndjson cannot be combined with --json" in result.stderr
+
+
+def test_results_are_yielded_before_later_inputs_are_encoded():
+    class RecordingCounter:
+        def __init__(self):
+            self.batches = []
+
+        def encode_batch(self, texts, model, *, return_tokens=False, num_threads=8):
+            self.batches.append(texts)
+            return [len(t.split()) for t in texts]
+
+    counter = RecordingCounter()
+    results = _iter_results(
+        ["a b", "c", "d e f"],
+        [],
+        ["gpt-4o"],
+        counter=counter,
+        show_tokens=False,
+        threads=1,
+        stream=False,
+        chunk_size=1024,
+        jobs=1,
+        batch_size=1,
+        cache=None,
+        server=None,
+    )
+    assert next(results) == ("a b", {"gpt-4o": 2})
+    assert counter.batches == [["a b"]]
+    assert list(results) == [("c", {"gpt-4o": 1}), ("d e f", {"gpt-4o": 3})]
+
+
+def test_repeated_inputs_are_encoded_once_and_keep_their_labels():
+    class RecordingCounter:
+        def __init__(self):
+            self.batches = []
+
+        def encode_batch(self, texts, model, *, return_tokens=False, num_threads=8):
+            self.batches.append(texts)
+            return [len(t.split()) for t in texts]
+
+        def encode(self, text, model, *, return_tokens=False):
+            self.batches.append([text])
+            return len(text.split())
+
+    counter = RecordingCounter()
+    stats = RunStats()
+    dedup = Deduplicator()
+    results = _iter_results(
+        ["a b", "c", "a b", "c", "d e f", "a b"],
+        [],
+        ["gpt-4o"],
+        counter=counter,
+        show_tokens=False,
+        threads=1,
+        stream=False,
+        chunk_size=1024,
+        jobs=1,
+        batch_size=2,
+        cache=None,
+        server=None,
+        stats=stats,
+        dedup=dedup,
+    )
+    assert [(label, r["gpt-4o"]) for label, r in results] == [
+        ("a b", 2),
+        ("c", 1),
+        ("a b", 2),
+        ("c", 1),
+        ("d e f", 3),
+        ("a b", 2),
+    ]
+    assert counter.batches == [["a b"], ["c"], ["d e f"]]  # --stats times each input on its own
+    assert [(s.label, s.tokens) for s in stats.inputs] == [
+        ("a b", 2),
+        ("c", 1),
+        ("a b", 2),
+        ("c", 1),
+        ("d e f", 3),
+        ("a b", 2),
+    ]
+    assert (dedup.inputs, dedup.duplicates) == (6, 3)
+
+
+def test_verbose_reports_deduplicated_inputs(tmp_path, runner):
+    for name in ("a.txt", "b.txt", "c.txt"):
+        (tmp_path / name).write_text("the same license text\n", encoding="utf-8")
+    (tmp_path / "d.txt").write_text("something else\n", encoding="utf-8")
+    result = runner.invoke(main, ["count", "-r", str(tmp_path), "--json", "--verbose"])
+    assert result.exit_code == 0
+    counts = json.loads(result.stdout)
+    assert sorted(Path(label).name for label in counts) == ["a.txt", "b.txt", "c.txt", "d.txt"]
+    assert "Deduplicated 2 of 4 inputs (44 bytes not encoded again)." in result.stderr
+    quiet = runner.invoke(main, ["count", "-r", str(tmp_path), "--json"])
+    assert json.loads(quiet.stdout) == counts
+    assert "Deduplicated" not in quiet.stderr
+
+
+def test_warm_export_and_restore_encodings(tmp_path, monkeypatch, runner, toy_encoding):
+    def get_encoding(name):
+        return tiktoken.Encoding(
+            name,
+            pat_str=toy_encoding._pat_str,
+            mergeable_ranks=toy_encoding._mergeable_ranks,
+            special_tokens=toy_encoding._special_tokens,
+        )
+
+    monkeypatch.setattr(tiktoken, "get_encoding", get_encoding)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    result = runner.invoke(main, ["warm", "-m", "gpt-4", "--encoding", "cl100k_base", "--json"])
+    assert result.exit_code == 0, result.output
+    (entry,) = json.loads(result.stdout)["encodings"]
+    assert (entry["name"], entry["action"]) == ("cl100k_base", "fetched")
+
+    bundle = tmp_path / "encodings.tar.gz"
+    result = runner.invoke(main, ["export-encodings", str(bundle)])
+    assert result.stdout == f"Packed cl100k_base into {bundle}.\n"
+
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "other"))
+    result = runner.invoke(main, ["warm", "--from", str(bundle)])
+    assert result.exit_code == 0
+    assert result.stdout.startswith("cl100k_base: restored (")
+    assert (tmp_path / "other" / "cntkn" / "encodings" / "cl100k_base.tkb").exists()
+    result = runner.invoke(main, ["export-encodings", str(tmp_path / "x.tar.gz"), "-m", "gpt-4o"])
+    assert result.exit_code != 0
+    assert "'o200k_base' is not in" in result.stderr
+
+
+def test_every_invocation_applies_the_encodings_store_config(tmp_path, monkeypatch, runner):
+    configs = iter([Config(encodings_dir=str(tmp_path), offline=True), Config()])
+    monkeypatch.setattr("cntkn.cli.load_config", lambda: next(configs))
+    assert runner.invoke(main, ["models"]).exit_code == 0
+    assert store_settings() == (tmp_path, True)
+    assert runner.invoke(main, ["models"]).exit_code == 0
+    assert store_settings() == (None, False)
+
+
+def test_compressed_inputs_keep_their_labels(tmp_path, runner):
+    text = "hello world\nthis is plain text\n"
+    (tmp_path / "a.txt").write_text(text, encoding="utf-8")
+    (tmp_path / "b.txt.gz").write_bytes(gzip.compress(text.encode()))
+    (tmp_path / "c.txt.xz").write_bytes(lzma.compress(text.encode()))
+    serial = runner.invoke(main, ["count", "-r", str(tmp_path), "--json"])
+    assert serial.exit_code == 0
+    counts = json.loads(serial.stdout)
+    assert len(set(counts.values())) == 1
+    assert sorted(Path(label).name for label in counts) == ["a.txt", "b.txt.gz", "c.txt.xz"]
+    jobs = runner.invoke(main, ["count", "-r", str(tmp_path), "--json", "--jobs", "2", "--stream"])
+    assert json.loads(jobs.stdout) == counts
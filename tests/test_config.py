@@ -1,8 +1,29 @@
 from pathlib import Path
 
-from cntkn.config import _read_toml
+from cntkn.config import Config, _read_toml, load_config
 
 
 def test_read_toml_missing_returns_empty(tmp_path: Path) -> None:
     missing = tmp_path / "nope.toml"
     assert _read_toml(missing) == {}
+
+
+def test_cntkn_toml_layers_over_pyproject(tmp_path: Path) -> None:
+    (tmp_path / "pyproject.toml").write_text('[tool.cntkn]\ncolor = "on"\ncache = true\noffline = true\n')
+    (tmp_path / "cntkn.toml").write_text(
+        'default_model = "gpt-4"\ncache_max_entries = 10\nencodings_dir = "/srv/bpe"\n'
+    )
+    cfg = load_config(cwd=tmp_path)
+    assert cfg.default_model == "gpt-4"
+    assert cfg.color_mode == "on"
+    assert cfg.cache_enabled is True
+    assert cfg.cache_max_entries == 10
+    assert (cfg.encodings_dir, cfg.offline) == ("/srv/bpe", True)
+
+
+def test_invalid_values_fall_back_to_defaults() -> None:
+    cfg = Config.from_toml({
+        "tool": {"cntkn": {"cache": "yes", "cache_max_entries": -1, "color": "blue", "offline": 1}}
+    })
+    assert cfg == Config()
+    assert isinstance(Config().default_model, str)
@@ -1,7 +1,28 @@
+import asyncio
+import threading
+
 import pytest
 import tiktoken.model
 
-from cntkn.core import SUPPORTED_MODELS, SUPPORTED_PREFIXES, is_model_supported
+import cntkn.core
+from cntkn.cache import TokenCache
+from cntkn.core import (
+    SUPPORTED_MODELS,
+    SUPPORTED_PREFIXES,
+    acount_tokens,
+    acount_tokens_batch,
+    count_tokens,
+    count_tokens_batch,
+    count_tokens_multi,
+    count_tokens_stream_multi,
+    distinct_encodings,
+    encoding_name_for_model,
+    is_encoding_supported,
+    is_model_supported,
+    split_by_tokens,
+)
+
+MIXED_TEXT = "The thing is café — 日本語 🙂 done.\n\nNext paragraph here. And more!\nlast line  \n"
 
 
 @pytest.mark.parametrize("model", SUPPORTED_MODELS[:5])
@@ -25,3 +46,260 @@ def test_supported_lists_match_tiktoken():
     # spot-check that the core lists mirror tiktoken.model
     assert set(SUPPORTED_MODELS) == set(tiktoken.model.MODEL_TO_ENCODING.keys())
     assert set(SUPPORTED_PREFIXES) == set(tiktoken.model.MODEL_PREFIX_TO_ENCODING.keys())
+
+
+class RecordingCounter:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, text, model, *, return_tokens=False):
+        tokens = list(range(len(text.split())))
+        return tokens if return_tokens else len(tokens)
+
+    def encode_batch(self, texts, model, *, return_tokens=False, num_threads=8):
+        self.calls.append((list(texts), model, num_threads))
+        return [self.encode(t, model, return_tokens=return_tokens) for t in texts]
+
+
+def test_count_tokens_batch_uses_single_batch_call():
+    counter = RecordingCounter()
+    result = count_tokens_batch(["a b", "c", "d e f"], "gpt-4o", num_threads=4, counter=counter)
+    assert result == [2, 1, 3]
+    assert counter.calls == [(["a b", "c", "d e f"], "gpt-4o", 4)]
+
+
+def test_count_tokens_batch_return_tokens_and_empty():
+    counter = RecordingCounter()
+    assert count_tokens_batch(["x y"], return_tokens=True, counter=counter) == [[0, 1]]
+    assert count_tokens_batch([], counter=counter) == []
+
+
+def test_count_tokens_batch_rejects_bad_thread_count():
+    with pytest.raises(ValueError, match="num_threads"):
+        count_tokens_batch(["x"], num_threads=0, counter=RecordingCounter())
+
+
+@pytest.mark.parametrize(
+    "model",
+    [*SUPPORTED_MODELS, *(prefix + "x" for prefix in SUPPORTED_PREFIXES), "ft:gpt-4o-2024"],
+)
+def test_encoding_name_matches_tiktoken(model):
+    assert encoding_name_for_model(model) == tiktoken.model.encoding_name_for_model(model)
+
+
+def test_encoding_name_for_unknown_model():
+    with pytest.raises(KeyError, match="cntkn models"):
+        encoding_name_for_model("foo-bar")
+    with pytest.raises(TypeError):
+        encoding_name_for_model(42)
+
+
+def test_encoder_handle(toy_encoder):
+    assert toy_encoder.name == "toy_bytes"
+    assert toy_encoder.encode("the thing") == len(toy_encoder.encode("the thing", return_tokens=True))
+    assert toy_encoder.encode_batch(["the", "x y"]) == [1, 3]
+    assert toy_encoder.encode_batch(["the"], return_tokens=True) == [
+        toy_encoder.encode("the", return_tokens=True)
+    ]
+
+
+def test_encoder_max_token_bytes(toy_encoder):
+    assert toy_encoder.max_token_bytes == len(b" the")  # longest toy merge
+
+
+def test_token_offsets_match_tiktoken(toy_encoder):
+    tokens = toy_encoder.encode(MIXED_TEXT, return_tokens=True)
+    # The toy vocabulary splits multibyte characters across tokens.
+    assert toy_encoder.token_offsets(tokens) == toy_encoder.encoding.decode_with_offsets(tokens)[1]
+
+
+@pytest.mark.parametrize("max_tokens", [1, 5, 16, 1000])
+@pytest.mark.parametrize("boundaries", [False, True])
+def test_split_by_tokens_covers_the_text(toy_encoder, max_tokens, boundaries):
+    chunks = list(
+        split_by_tokens(MIXED_TEXT, max_tokens=max_tokens, boundaries=boundaries, encoder=toy_encoder)
+    )
+    assert "".join(c.text for c in chunks) == MIXED_TEXT
+    assert all(c.text == MIXED_TEXT[c.start : c.end] for c in chunks)
+    assert all(0 < c.tokens <= max_tokens for c in chunks)
+    assert sum(c.tokens for c in chunks) == toy_encoder.encode(MIXED_TEXT)
+    if not boundaries:
+        assert all(c.tokens == max_tokens for c in chunks[:-1])
+
+
+def test_split_by_tokens_overlaps_and_prefers_boundaries(toy_encoder):
+    tokens = toy_encoder.encode(MIXED_TEXT, return_tokens=True)
+    offsets = toy_encoder.token_offsets(tokens)
+    chunks = list(split_by_tokens(MIXED_TEXT, max_tokens=10, overlap=3, encoder=toy_encoder))
+    assert [c.start for c in chunks] == offsets[: len(tokens) - 3 : 7]
+    assert all(c.tokens == 10 for c in chunks[:-1])
+    pieces = split_by_tokens(MIXED_TEXT, max_tokens=20, boundaries=True, encoder=toy_encoder)
+    assert [c.text for c in pieces] == [
+        "The thing is café — ",  # no sentence end in reach: a safe split point
+        "日本語 🙂 done.\n\n",
+        "Next paragraph here. ",
+        "And more!\nlast line  \n",
+    ]
+
+
+def test_split_by_tokens_rejects_bad_sizes(toy_encoder):
+    with pytest.raises(ValueError, match="max_tokens"):
+        next(split_by_tokens("x", max_tokens=0, encoder=toy_encoder))
+    with pytest.raises(ValueError, match="overlap"):
+        next(split_by_tokens("x", max_tokens=2, overlap=2, encoder=toy_encoder))
+    assert list(split_by_tokens("", max_tokens=2, encoder=toy_encoder)) == []
+
+
+def test_count_tokens_limit():
+    counter = RecordingCounter()
+    text = "w " * 100_000
+    assert count_tokens(text, counter=counter, limit=50) > 50
+    assert count_tokens("a b c", counter=counter, limit=50) == 3
+    with pytest.raises(ValueError, match="return_tokens"):
+        count_tokens("a", counter=counter, limit=5, return_tokens=True)
+    with pytest.raises(ValueError, match="return_tokens"):
+        count_tokens("a", counter=counter, limit=5, return_tokens=True, compact=True)
+
+
+def test_count_tokens_limit_uses_cache(tmp_path):
+    class Seen(RecordingCounter):
+        def encode(self, text, model, *, return_tokens=False):
+            self.calls.append(text)
+            return super().encode(text, model, return_tokens=return_tokens)
+
+    counter = Seen()
+    with TokenCache(tmp_path) as cache:
+        assert count_tokens("a b c", "gpt-4", counter=counter, cache=cache, limit=50) == 3
+        assert count_tokens("w " * 200, "gpt-4", counter=counter, cache=cache, limit=50) > 50
+        calls = len(counter.calls)
+        # A cached count is exact, so it is returned even above a smaller limit.
+        assert count_tokens("a b c", "gpt-4", counter=counter, cache=cache, limit=2) == 3
+        assert len(counter.calls) == calls
+        # The stopped count was a lower bound, so it was not stored.
+        assert count_tokens("w " * 200, "gpt-4", counter=counter, cache=cache) == 200
+
+
+def test_encoding_names_resolve_to_themselves():
+    assert is_encoding_supported("cl100k_base")
+    assert not is_encoding_supported("gpt-4")
+    assert encoding_name_for_model("o200k_base") == "o200k_base"
+    assert distinct_encodings(["gpt-4", "gpt-3.5-turbo", "cl100k_base", "gpt-4o"]) == {
+        "cl100k_base": "gpt-4",
+        "o200k_base": "gpt-4o",
+    }
+
+
+def test_count_tokens_multi_encodes_once_per_encoding():
+    counter = RecordingCounter()
+    result = count_tokens_multi(["a b", "c"], ["gpt-4", "gpt-4o", "gpt-3.5-turbo"], counter=counter)
+    assert result == {"gpt-4": [2, 1], "gpt-4o": [2, 1], "gpt-3.5-turbo": [2, 1]}
+    assert [model for _, model, _ in counter.calls] == ["gpt-4", "gpt-4o"]
+
+
+def test_count_tokens_stream_multi_reads_chunks_once():
+    class Seen(RecordingCounter):
+        def encode(self, text, model, *, return_tokens=False):
+            self.calls.append(model)
+            return super().encode(text, model, return_tokens=return_tokens)
+
+    counter = Seen()
+    # A one-shot iterator: a second pass for another encoding would see nothing.
+    result = count_tokens_stream_multi(
+        iter(["a b ", "c d"]), ["gpt-4", "gpt-3.5-turbo", "gpt-4o"], counter=counter
+    )
+    assert result == {"gpt-4": 4, "gpt-3.5-turbo": 4, "gpt-4o": 4}
+    assert sorted(set(counter.calls)) == ["gpt-4", "gpt-4o"]
+
+
+@pytest.fixture
+def async_executor():
+    yield
+    # Idle executor threads would make later fork()-based tests warn.
+    cntkn.core._async_executor().shutdown()
+    cntkn.core._async_executor.cache_clear()
+
+
+class AsyncToyCounter:
+    def __init__(self, encoder, gate=None):
+        self.encoder = encoder
+        self.gate = gate
+        self.seen = []
+        self.batches = []
+
+    def encode(self, text, model, *, return_tokens=False):
+        if self.gate is not None:
+            self.gate.wait(5)
+        if text == "bad":
+            raise ValueError(text)
+        self.seen.append(text)
+        return self.encoder.encode(text, return_tokens=return_tokens)
+
+    def encode_batch(self, texts, model, *, return_tokens=False, num_threads=8):
+        self.batches.append(list(texts))
+        return [self.encode(text, model, return_tokens=return_tokens) for text in texts]
+
+
+def test_async_counts_coalesce_into_micro_batches(monkeypatch, toy_encoder, async_executor):
+    jobs = []
+    encode_batch = cntkn.core._encode_batch
+
+    def recording(impl, model, texts, **kwargs):
+        jobs.append(len(texts))
+        return encode_batch(impl, model, texts, **kwargs)
+
+    monkeypatch.setattr(cntkn.core, "_encode_batch", recording)
+    counter = AsyncToyCounter(toy_encoder)
+    texts = [f"the thing {i}" for i in range(600)]
+
+    async def main():
+        singles = await asyncio.gather(*(acount_tokens(t, counter=counter) for t in texts))
+        batch = await acount_tokens_batch(texts, return_tokens=True, counter=counter)
+        return singles, batch
+
+    singles, batch = asyncio.run(main())
+    assert singles == [toy_encoder.encode(t) for t in texts]
+    assert batch == [toy_encoder.encode(t, return_tokens=True) for t in texts]
+    assert sum(jobs) == 1200
+    assert max(jobs) == cntkn.core.ASYNC_BATCH_TEXTS
+    assert len(jobs) < 20
+
+
+def test_concurrent_async_counts_share_one_encode_batch_call(toy_encoder, async_executor):
+    counter = AsyncToyCounter(toy_encoder)
+    texts = [f"the thing {i}" for i in range(50)]
+
+    async def main():
+        return await asyncio.gather(*(acount_tokens(t, counter=counter) for t in texts))
+
+    assert asyncio.run(main()) == [toy_encoder.encode(t) for t in texts]
+    assert counter.batches == [texts]
+
+
+def test_async_cancellation_and_errors(monkeypatch, toy_encoder, async_executor):
+    monkeypatch.setattr(cntkn.core, "ASYNC_WORKERS", 1)
+    gate = threading.Event()
+    counter = AsyncToyCounter(toy_encoder, gate)
+
+    async def main():
+        first = asyncio.ensure_future(acount_tokens("first", counter=counter))
+        await asyncio.sleep(0.05)  # "first" is now encoding; the next ones queue behind it
+        dropped = asyncio.ensure_future(acount_tokens("dropped", counter=counter))
+        kept = asyncio.ensure_future(acount_tokens_batch(["kept", "bad"], counter=counter))
+        await asyncio.sleep(0)
+        dropped.cancel()
+        gate.set()
+        with pytest.raises(ValueError, match="bad"):
+            await kept
+        with pytest.raises(asyncio.CancelledError):
+            await dropped
+        return await first
+
+    assert asyncio.run(main()) == toy_encoder.encode("first")
+    assert "dropped" not in counter.seen
+    assert "kept" in counter.seen
+    assert counter.batches == [["kept", "bad"]]  # retried text by text after "bad" failed it
+
+
+def test_async_rejects_unknown_models():
+    with pytest.raises(KeyError, match="Could not map"):
+        asyncio.run(acount_tokens("x", "no-such-model"))
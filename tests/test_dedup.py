@@ -0,0 +1,40 @@
+from cntkn.dedup import Deduplicator
+
+
+class Colliding(str):  # noqa: FURB189 - must hash differently yet compare as str
+    __slots__ = ()
+
+    def __hash__(self):
+        return 0
+
+
+def _encoder(calls):
+    def encode(texts):
+        calls.append(texts)
+        return [len(text.split()) for text in texts]
+
+    return encode
+
+
+def test_repeats_are_encoded_once_across_batches():
+    calls = []
+    dedup = Deduplicator()
+    assert dedup.apply(["a b", "c", "a b"], _encoder(calls)) == ([2, 1, 2], [False, False, True])
+    assert dedup.apply(["c", "d e f"], _encoder(calls)) == ([1, 3], [True, False])
+    assert calls == [["a b", "c"], ["d e f"]]
+    assert (dedup.inputs, dedup.duplicates, dedup.saved_bytes) == (5, 2, 4)
+
+
+def test_keep_chars_bounds_what_later_batches_see():
+    calls = []
+    dedup = Deduplicator(keep_chars=0)
+    assert dedup.apply(["a b", "a b"], _encoder(calls))[1] == [False, True]
+    dedup.apply(["a b"], _encoder(calls))
+    assert calls == [["a b"], ["a b"]]
+
+
+def test_hash_collisions_are_confirmed_by_content():
+    calls = []
+    texts = [Colliding("one"), Colliding("two words"), Colliding("one")]
+    assert Deduplicator().apply(texts, _encoder(calls)) == ([1, 2, 1], [False, False, True])
+    assert calls == [["one", "two words"]]
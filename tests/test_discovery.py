@@ -0,0 +1,82 @@
+from pathlib import Path
+
+import pytest
+
+from cntkn.discovery import GitIgnore, discover_files, matches_filters, walk_files
+
+
+@pytest.fixture
+def tree(tmp_path: Path) -> Path:
+    files = {
+        "a.txt": "a",
+        "notes.log": "log",
+        "docs/readme.md": "doc",
+        "docs/keep.log": "keep",
+        "build/out.txt": "out",
+        "src/pkg/mod.py": "py",
+        "src/pkg/.gitignore": "*.py\n!keep.py\n",
+        "src/pkg/keep.py": "kept",
+        ".git/HEAD": "ref",
+        ".gitignore": "# comment\n*.log\n!docs/keep.log\nbuild/\n/a.txt\n",
+    }
+    for rel, body in files.items():
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(body)
+    return tmp_path
+
+
+def _rel(paths, root):
+    return sorted(p.relative_to(root).as_posix() for p in paths)
+
+
+def test_walk_files_honours_gitignore(tree):
+    assert _rel(walk_files(tree), tree) == [
+        ".gitignore",
+        "docs/keep.log",
+        "docs/readme.md",
+        "src/pkg/.gitignore",
+        "src/pkg/keep.py",
+    ]
+
+
+def test_walk_files_without_gitignore_still_skips_vcs_dirs(tree):
+    found = _rel(walk_files(tree, gitignore=False), tree)
+    assert "build/out.txt" in found
+    assert "notes.log" in found
+    assert not any(p.startswith(".git/") for p in found)
+
+
+def test_walk_files_include_exclude(tree):
+    found = _rel(walk_files(tree, include=["*.md", "*.py"], exclude=["docs/*"]), tree)
+    assert found == ["src/pkg/keep.py"]
+
+
+@pytest.mark.parametrize(
+    ("pattern", "path", "is_dir", "expected"),
+    [
+        ("*.log", "x/y/z.log", False, True),
+        ("/top.txt", "sub/top.txt", False, None),
+        ("/top.txt", "top.txt", False, True),
+        ("out/", "out", False, None),
+        ("out/", "a/out", True, True),
+        ("a/**/b", "a/x/y/b", False, True),
+        ("a/**/b", "a/b", False, True),
+        ("**/cache", "deep/er/cache", True, True),
+        ("file[0-9].txt", "file7.txt", False, True),
+        ("\\#lit", "#lit", False, True),
+    ],
+)
+def test_gitignore_patterns(tmp_path, pattern, path, is_dir, expected):
+    assert GitIgnore(tmp_path, [pattern]).match(path, is_dir=is_dir) is expected
+
+
+def test_matches_filters_basename_and_path():
+    assert matches_filters("a/b/c.py", include=["*.py"])
+    assert matches_filters("a/b/c.py", include=["a/*"])
+    assert not matches_filters("a/b/c.py", exclude=["c.py"])
+
+
+def test_discover_files_merges_roots_and_globs_without_duplicates(tree):
+    found = discover_files([str(tree / "docs")], [str(tree / "docs" / "*.md")])
+    assert found == [str(tree / "docs" / "keep.log"), str(tree / "docs" / "readme.md")]
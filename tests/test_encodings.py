@@ -0,0 +1,140 @@
+import io
+import tarfile
+
+import pytest
+import tiktoken
+
+from cntkn.config import configure_store
+from cntkn.encodings import (
+    EncodingStoreError,
+    compile_encoding,
+    compiled_path,
+    export_bundle,
+    import_bundle,
+    load_encoding,
+    read_compiled,
+    warm,
+)
+
+TEXT = "the thing\n\nwith  spaces, ünïcödé and <|endoftext|>"
+
+
+@pytest.fixture
+def named_toy(toy_encoding):
+    def make(name):
+        return tiktoken.Encoding(
+            name,
+            pat_str=toy_encoding._pat_str,
+            mergeable_ranks=toy_encoding._mergeable_ranks,
+            special_tokens=toy_encoding._special_tokens,
+        )
+
+    return make
+
+
+@pytest.fixture
+def fetches(monkeypatch, named_toy):
+    fetched = []
+
+    def get_encoding(name):
+        fetched.append(name)
+        return named_toy(name)
+
+    monkeypatch.setattr(tiktoken, "get_encoding", get_encoding)
+    return fetched
+
+
+@pytest.fixture
+def store(tmp_path):
+    directory = tmp_path / "encodings"
+    configure_store(directory)
+    yield directory
+    configure_store()
+
+
+def test_compiled_encoding_round_trips(tmp_path, toy_encoding):
+    path = tmp_path / "toy_bytes.tkb"
+    path.write_bytes(compile_encoding(toy_encoding))
+    loaded = read_compiled(path)
+    assert loaded.name == "toy_bytes"
+    assert loaded._mergeable_ranks == toy_encoding._mergeable_ranks
+    assert loaded._special_tokens == toy_encoding._special_tokens
+    assert loaded.encode(TEXT, allowed_special="all") == toy_encoding.encode(TEXT, allowed_special="all")
+
+
+def _torn_write(data):
+    return data[: len(data) // 2]
+
+
+def _flip_a_bit(data):
+    return data[:40] + bytes([data[40] ^ 1]) + data[41:]
+
+
+def _empty(_):
+    return b""
+
+
+@pytest.mark.parametrize("damage", [_torn_write, _flip_a_bit, _empty])
+def test_damaged_files_are_rejected(tmp_path, toy_encoding, damage):
+    path = tmp_path / "toy_bytes.tkb"
+    path.write_bytes(damage(compile_encoding(toy_encoding)))
+    with pytest.raises(EncodingStoreError, match="corrupt"):
+        read_compiled(path)
+
+
+def test_warm_fetches_once_then_loads_offline(store, fetches, monkeypatch, toy_encoding):
+    first = warm(["cl100k_base", "cl100k_base"])
+    assert [(r.name, r.action) for r in first] == [("cl100k_base", "fetched")]
+    assert first[0].path == store / "cl100k_base.tkb"
+    assert [r.action for r in warm(["cl100k_base"])] == ["present"]
+    assert fetches == ["cl100k_base"]
+
+    configure_store(store, offline=True)
+    monkeypatch.setattr(tiktoken, "get_encoding", pytest.fail)
+    assert load_encoding("cl100k_base").encode(TEXT, allowed_special="all") == toy_encoding.encode(
+        TEXT, allowed_special="all"
+    )
+    with pytest.raises(EncodingStoreError, match="run `cntkn warm` first"):
+        load_encoding("o200k_base")
+
+
+def test_warm_rebuilds_corrupt_files(store, fetches):
+    warm(["cl100k_base"])
+    compiled_path("cl100k_base").write_bytes(b"not an encoding")
+    assert [r.action for r in warm(["cl100k_base"])] == ["fetched"]
+    assert fetches == ["cl100k_base", "cl100k_base"]
+    read_compiled(compiled_path("cl100k_base"))
+
+
+def test_bundles_restore_only_verified_encodings(store, fetches, tmp_path, named_toy):
+    warm(["cl100k_base", "o200k_base"])
+    bundle = tmp_path / "encodings.tar.gz"
+    assert export_bundle(bundle) == ["cl100k_base", "o200k_base"]
+
+    other = tmp_path / "restored"
+    restored = import_bundle(bundle, directory=other)
+    assert [(r.name, r.action) for r in restored] == [("cl100k_base", "restored"), ("o200k_base", "restored")]
+    assert (other / "o200k_base.tkb").read_bytes() == compiled_path("o200k_base").read_bytes()
+
+    # Paths outside the directory and other files are skipped; a mislabelled encoding is refused.
+    hostile = tmp_path / "hostile.tar"
+    with tarfile.open(hostile, "w") as tar:
+        for name, data in [
+            ("../escape.tkb", compile_encoding(named_toy("escape"))),
+            ("notes.txt", b"hello"),
+            ("p50k_base.tkb", compile_encoding(named_toy("r50k_base"))),
+        ]:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    with pytest.raises(EncodingStoreError, match="holds encoding 'r50k_base'"):
+        import_bundle(hostile, directory=other)
+    assert sorted(p.name for p in other.iterdir()) == ["cl100k_base.tkb", "o200k_base.tkb"]
+    assert not (tmp_path / "escape.tkb").exists()
+
+
+def test_export_needs_compiled_encodings(store, tmp_path):
+    with pytest.raises(EncodingStoreError, match="No encodings"):
+        export_bundle(tmp_path / "bundle.tar.gz")
+    with pytest.raises(EncodingStoreError, match="'cl100k_base' is not in"):
+        export_bundle(tmp_path / "bundle.tar.gz", ["cl100k_base"])
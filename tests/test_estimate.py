@@ -0,0 +1,88 @@
+import gzip
+import random
+
+import pytest
+
+from cntkn.estimate import (
+    Calibration,
+    calibrate,
+    calibration_to_toml,
+    estimate_file_tokens,
+    estimate_tokens,
+    estimate_tokens_stream,
+    load_calibration,
+)
+
+
+class WordCounter:
+    def encode(self, text, model, *, return_tokens=False):
+        return len(text.split())
+
+    def encode_batch(self, texts, model, *, return_tokens=False, num_threads=8):
+        return [self.encode(t, model) for t in texts]
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = random.Random(7)  # noqa: S311
+    words = ["a", "bb", "ccc", "dddd", "eeeeeeee"]
+    return " ".join(rng.choice(words) for _ in range(200_000))
+
+
+def test_short_text_is_counted_exactly():
+    est = estimate_tokens("a b c", counter=WordCounter())
+    assert (est.tokens, est.low, est.high, est.method) == (3, 3, 3, "exact")
+
+
+def test_sampled_estimate_covers_exact_count(corpus):
+    exact = len(corpus.split())
+    est = estimate_tokens(corpus, counter=WordCounter(), seed=1)
+    assert est.method == "sampled"
+    assert est.low <= exact <= est.high
+    assert abs(est.tokens - exact) / exact < 0.05
+
+
+def test_file_and_stream_estimates_agree(corpus, tmp_path):
+    path = tmp_path / "corpus.txt"
+    path.write_text(corpus)
+    exact = len(corpus.split())
+    from_file = estimate_file_tokens(path, counter=WordCounter(), seed=2)
+    chunks = (corpus[i : i + 10_000] for i in range(0, len(corpus), 10_000))
+    from_stream = estimate_tokens_stream(chunks, counter=WordCounter(), seed=3)
+    assert from_file.low <= exact <= from_file.high
+    assert from_stream.low <= exact <= from_stream.high
+
+
+def test_compressed_file_estimate_streams(corpus, tmp_path):
+    path = tmp_path / "corpus.txt.gz"
+    path.write_bytes(gzip.compress(corpus.encode()))
+    exact = len(corpus.split())
+    est = estimate_file_tokens(path, counter=WordCounter(), seed=4)
+    assert est.low <= exact <= est.high
+
+
+def test_calibrated_estimate_without_sampling():
+    calibration = {"o200k_base": Calibration(chars_per_token=4.0, bytes_per_token=4.0, rel_stdev=0.1)}
+    est = estimate_tokens("x" * 4000, "gpt-4o", sample_count=0, calibration=calibration)
+    assert est.method == "calibrated"
+    assert est.tokens == 1000
+    assert est.low < 1000 < est.high
+    with pytest.raises(KeyError, match="no calibration"):
+        estimate_tokens("x", "gpt-4o", sample_count=0, calibration={})
+
+
+def test_packaged_calibration_covers_common_encodings():
+    assert set(load_calibration()) == {"gpt2", "r50k_base", "p50k_base", "cl100k_base", "o200k_base"}
+
+
+def test_calibrate_round_trips_through_toml(tmp_path):
+    docs = ["aa bb " * 100, "c " * 300]
+    calibrations = calibrate(docs, ["gpt-4o", "gpt-4o-mini"], counter=WordCounter())
+    assert list(calibrations) == ["o200k_base"]
+    cal = calibrations["o200k_base"]
+    assert cal.chars_per_token == pytest.approx(sum(map(len, docs)) / 500)
+    path = tmp_path / "calibration.toml"
+    path.write_text(calibration_to_toml(calibrations, source="test docs"))
+    loaded = load_calibration(path)["o200k_base"]
+    assert loaded.chars_per_token == pytest.approx(cal.chars_per_token, abs=1e-4)
+    assert loaded.rel_stdev == pytest.approx(cal.rel_stdev, abs=1e-4)
@@ -0,0 +1,91 @@
+import pytest
+
+from cntkn.follow import FollowStore, default_state_path, poll
+
+
+@pytest.fixture
+def encode(toy_encoder):
+    seen = []
+
+    def encode(text):
+        seen.append(text)
+        return toy_encoder.encode(text)
+
+    encode.seen = seen
+    return encode
+
+
+def _whole(toy_encoder, path):
+    # A character still being written is not counted yet.
+    text = path.read_bytes().decode("utf-8", errors="ignore")
+    return toy_encoder.encode(text.replace("\r\n", "\n").replace("\r", "\n"))
+
+
+def test_appends_match_a_full_recount(tmp_path, toy_encoder, encode):
+    path = tmp_path / "log.txt"
+    # Cuts fall inside a multibyte character, a CRLF pair and a word.
+    writes = [b"the thing\r", b"\nnext line caf\xc3", b"\xa9 done\n", b"more", b" words\nend\n\n", b""]
+    path.write_bytes(b"")
+    state = None
+    for data in writes:
+        with path.open("ab") as fh:
+            fh.write(data)
+        state, restarted = poll(path, state, encode, chunk_size=8)
+        assert not restarted
+        assert state.total == _whole(toy_encoder, path)
+        assert state.size == path.stat().st_size
+
+
+def test_only_appended_bytes_are_encoded(tmp_path, toy_encoder, encode):
+    path = tmp_path / "log.txt"
+    path.write_text("first line\n" * 1000, encoding="utf-8")
+    state, _ = poll(path, None, encode)
+    encode.seen.clear()
+    with path.open("a", encoding="utf-8") as fh:
+        fh.write("second line\n")
+    state, _ = poll(path, state, encode)
+    assert sum(map(len, encode.seen)) < 30
+    assert state.total == _whole(toy_encoder, path)
+    encode.seen.clear()
+    assert poll(path, state, encode) == (state, False)
+    assert encode.seen == []
+
+
+def test_truncation_and_rewrites_restart(tmp_path, toy_encoder, encode):
+    path = tmp_path / "log.txt"
+    path.write_text("the long thing\n" * 10, encoding="utf-8")
+    state, _ = poll(path, None, encode)
+    path.write_text("short\n", encoding="utf-8")
+    state, restarted = poll(path, state, encode)
+    assert restarted
+    assert state.total == _whole(toy_encoder, path)
+    path.write_text("other\nand longer\n", encoding="utf-8")  # same inode, not an append
+    state, restarted = poll(path, state, encode)
+    assert restarted
+    assert state.total == _whole(toy_encoder, path)
+
+
+def test_rotation_restarts(tmp_path, toy_encoder, encode):
+    path = tmp_path / "log.txt"
+    path.write_text("old text\n" * 10, encoding="utf-8")
+    state, _ = poll(path, None, encode)
+    path.rename(tmp_path / "log.txt.1")
+    path.write_text("old text\n" * 12, encoding="utf-8")  # a new file starting alike
+    state, restarted = poll(path, state, encode)
+    assert restarted
+    assert state.inode == path.stat().st_ino
+    assert state.total == _whole(toy_encoder, path)
+
+
+def test_store_round_trip(monkeypatch, tmp_path, encode):
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+    assert default_state_path() == tmp_path / "cntkn" / "follow.json"
+    path = tmp_path / "log.txt"
+    path.write_text("hello world\n", encoding="utf-8")
+    store = FollowStore(default_state_path())
+    key = store.key(path, "cl100k_base")
+    assert store.get(key) is None
+    state, _ = poll(path, None, encode)
+    store.put(key, state)
+    store.save()
+    assert FollowStore(default_state_path()).get(key) == state
@@ -0,0 +1,81 @@
+import bz2
+import gzip
+import lzma
+import mmap
+
+import pytest
+
+import cntkn.inputs
+from cntkn.inputs import (
+    detect_compression,
+    is_large_file,
+    iter_file_chunks,
+    iter_mapped_chunks,
+    open_text,
+    read_text,
+)
+
+
+def _awkward_text():
+    # A 3-byte character and a CRLF pair straddle the first two page boundaries.
+    page = mmap.PAGESIZE
+    return "a" * (page - 1) + "€" + "b" * (page - 4) + "\r\n" + "ünïcode line\r\nlast\r"
+
+
+def test_mapped_chunks_match_read_text(tmp_path):
+    path = tmp_path / "text.txt"
+    path.write_bytes(_awkward_text().encode("utf-8"))
+    chunks = list(iter_mapped_chunks(path, chunk_size=1))
+    assert len(chunks) > 1
+    assert "".join(chunks) == path.read_text(encoding="utf-8")
+
+
+def test_mapped_chunks_reject_invalid_utf8(tmp_path):
+    path = tmp_path / "bad.txt"
+    path.write_bytes(b"ok \xff")
+    with pytest.raises(UnicodeDecodeError):
+        list(iter_mapped_chunks(path))
+
+
+def test_empty_file_cannot_be_mapped(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.touch()
+    with pytest.raises(ValueError, match="empty"):
+        list(iter_mapped_chunks(path))
+    assert list(iter_file_chunks(path)) == []
+
+
+def test_large_files_are_read_through_the_map(monkeypatch, tmp_path):
+    path = tmp_path / "big.txt"
+    path.write_bytes(_awkward_text().encode("utf-8"))
+    assert not is_large_file(path)
+    monkeypatch.setattr(cntkn.inputs, "MMAP_MIN_SIZE", 1)
+    assert is_large_file(path)
+    assert not is_large_file(tmp_path)
+    mapped = []
+    monkeypatch.setattr(cntkn.inputs, "iter_mapped_chunks", lambda p, n: mapped.append(p) or iter(["x"]))
+    assert list(iter_file_chunks(path)) == ["x"]
+    assert mapped == [path]
+
+
+@pytest.mark.parametrize(
+    ("name", "compress"), [("gzip", gzip.compress), ("bz2", bz2.compress), ("xz", lzma.compress)]
+)
+def test_compressed_files_are_decompressed_on_the_fly(tmp_path, name, compress):
+    text = _awkward_text()
+    path = tmp_path / "data.bin"  # detection goes by content, not by suffix
+    path.write_bytes(compress(text.encode("utf-8")))
+    expected = text.replace("\r\n", "\n").replace("\r", "\n")
+    assert detect_compression(path) == name
+    assert read_text(path) == expected
+    assert "".join(iter_file_chunks(path, chunk_size=100)) == expected
+    with open_text(path, newline="") as fh:
+        assert fh.read() == text
+
+
+def test_plain_files_are_not_compressed(tmp_path):
+    path = tmp_path / "plain.txt"
+    path.write_bytes(b"BZ no magic\r\n")
+    assert detect_compression(path) is None
+    assert detect_compression(tmp_path / "missing") is None
+    assert read_text(path) == "BZ no magic\n"
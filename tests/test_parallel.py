@@ -0,0 +1,111 @@
+import itertools
+import random
+from concurrent.futures import Future
+
+import pytest
+
+import cntkn.inputs
+from cntkn.cache import TokenCache
+from cntkn.core import get_encoder
+from cntkn.inputs import iter_mapped_chunks, read_text, shard_ranges
+from cntkn.parallel import _map_files, encode_files_multi
+
+PIECES = [
+    "word",
+    "Word",
+    " ",
+    "  ",
+    "\n",
+    "\n\n",
+    "\r\n",
+    "\t",
+    "42",
+    "3.14",
+    "—",
+    "café",
+    "日本語",
+    "!?",
+    "'s",
+    "🙂",
+]
+
+
+def _corpus(seed, size=20_000):
+    rng = random.Random(seed)  # noqa: S311
+    return "".join(rng.choice(PIECES) for _ in range(size))
+
+
+@pytest.fixture
+def small_probe(monkeypatch):
+    monkeypatch.setattr(cntkn.inputs, "SHARD_PROBE", 512)
+
+
+@pytest.mark.parametrize("encoding", ["r50k_base", "cl100k_base", "o200k_base"])
+@pytest.mark.parametrize("seed", [1, 2])
+def test_sharded_encoding_matches_whole_file(tmp_path, small_probe, encoding, seed):
+    path = tmp_path / "corpus.txt"
+    path.write_bytes(_corpus(seed).encode("utf-8"))
+    ranges = shard_ranges(path, 40)
+    assert len(ranges) > 20
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == path.stat().st_size
+    assert all(a[1] == b[0] for a, b in itertools.pairwise(ranges))
+    encoder = get_encoder(encoding)
+    sharded = []
+    for start, end in ranges:
+        sharded += encoder.encode(
+            "".join(iter_mapped_chunks(path, 4096, start=start, end=end)), return_tokens=True
+        )
+    assert sharded == encoder.encode(read_text(path), return_tokens=True)
+
+
+def test_pool_shards_a_large_file(monkeypatch, tmp_path, small_probe):
+    path = tmp_path / "corpus.txt"
+    path.write_bytes(_corpus(3).encode("utf-8"))
+    small = tmp_path / "small.txt"
+    small.write_text("hello world", encoding="utf-8")
+    models = ["gpt-4o", "gpt-4"]
+    whole = list(encode_files_multi([small, path], models, jobs=3, return_tokens=True))
+    monkeypatch.setattr(cntkn.inputs, "MMAP_MIN_SIZE", 1024)
+    assert len(shard_ranges(path, 3)) == 3
+    sharded = list(encode_files_multi([small, path], models, jobs=3, return_tokens=True))
+    assert sharded == whole
+    counts = list(encode_files_multi([path], models, jobs=3))
+    assert counts == [{m: len(whole[1][m]) for m in models}]
+
+
+def test_shard_ranges_keep_unsplittable_files_whole(tmp_path):
+    path = tmp_path / "dense.txt"
+    path.write_text("x" * 10_000, encoding="utf-8")
+    assert shard_ranges(path, 4) == [(0, 10_000)]
+
+
+def test_map_files_keeps_a_bounded_window(tmp_path):
+    paths = [tmp_path / f"{i}.txt" for i in range(50)]
+    for path in paths:
+        path.write_text("x", encoding="utf-8")
+    submitted = []
+
+    class Pool:
+        def submit(self, fn, task):
+            submitted.append(task)
+            future = Future()
+            future.set_result(fn(task))
+            return future
+
+    results = _map_files(Pool(), lambda task: ([1], None, [False], 0.0), paths, 2)
+    for taken, (path, _) in enumerate(results, 1):
+        assert path == paths[taken - 1]
+        assert len(submitted) <= taken + 4
+    assert len(submitted) == len(paths)
+
+
+def test_cache_keeps_counts_when_stopped_early(tmp_path):
+    paths = [tmp_path / f"{i}.txt" for i in range(3)]
+    for i, path in enumerate(paths):
+        path.write_text("hello world " * (i + 1), encoding="utf-8")
+    with TokenCache(tmp_path / "cache") as cache:
+        results = encode_files_multi(paths, ["gpt-4o"], jobs=2, cache=cache)
+        first = next(results)
+        results.close()
+        assert cache.get(cache.digest(read_text(paths[0])), "o200k_base") == first["gpt-4o"]
@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from cntkn.pipeline import read_ahead, run_ahead
+
+
+def test_read_ahead_keeps_order_and_bounds_lookahead():
+    pulled = []
+
+    def items():
+        for i in range(20):
+            pulled.append(i)
+            yield i
+
+    results = read_ahead(items(), lambda i: i * i, depth=3)
+    assert next(results) == 0
+    assert len(pulled) == 4
+    assert list(results) == [i * i for i in range(1, 20)]
+
+
+def test_read_ahead_without_depth_is_map():
+    assert list(read_ahead(["a", "b"], str.upper, depth=0)) == ["A", "B"]
+
+
+def test_read_ahead_raises_at_the_failing_item():
+    def fn(i):
+        if i == 2:
+            raise ValueError(i)
+        return i
+
+    results = read_ahead(range(5), fn, depth=2)
+    assert [next(results), next(results)] == [0, 1]
+    with pytest.raises(ValueError, match="2"):
+        next(results)
+
+
+def test_run_ahead_yields_in_order_from_another_thread():
+    threads = set()
+
+    def items():
+        for i in range(50):
+            threads.add(threading.current_thread().name)
+            yield i
+
+    assert list(run_ahead(items(), depth=4)) == list(range(50))
+    assert threads == {"cntkn-encode"}
+
+
+def test_run_ahead_reraises_producer_errors():
+    def items():
+        yield 1
+        msg = "boom"
+        raise RuntimeError(msg)
+
+    results = run_ahead(items(), depth=2)
+    assert next(results) == 1
+    with pytest.raises(RuntimeError, match="boom"):
+        next(results)
+
+
+def test_closing_run_ahead_stops_and_closes_the_producer():
+    closed = threading.Event()
+
+    def items():
+        try:
+            i = 0
+            while True:
+                yield i
+                i += 1
+        finally:
+            closed.set()
+
+    results = run_ahead(items(), depth=2)
+    assert next(results) == 0
+    results.close()
+    assert closed.is_set()
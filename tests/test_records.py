@@ -0,0 +1,86 @@
+import io
+
+import pytest
+
+from cntkn.records import (
+    Record,
+    count_records,
+    extract_texts,
+    iter_csv_records,
+    iter_jsonl_records,
+    parse_field_path,
+    record_result,
+)
+
+
+def _word_counts(texts):
+    return [len(t.split()) for t in texts]
+
+
+@pytest.mark.parametrize(
+    ("obj", "spec", "expected"),
+    [
+        ({"text": "a b"}, "text", ["a b"]),
+        ({"messages": [{"content": "hi"}, {"content": "yo there"}]}, "messages.content", ["hi", "yo there"]),
+        ({"choices": [{"text": "x"}, {"text": "y"}]}, "choices.1.text", ["y"]),
+        ({"choices": [{"text": "x"}, {"text": "y"}]}, "choices.-1.text", ["y"]),
+        ({"meta": {"n": 3, "tags": ["a"]}}, "meta", ['{"n":3,"tags":["a"]}']),
+        ({"messages": [{"content": None}, {"content": "a"}]}, "messages.content", ["a"]),
+    ],
+)
+def test_extract_texts(obj, spec, expected):
+    assert extract_texts(obj, parse_field_path(spec)) == expected
+
+
+def test_extract_texts_missing_field():
+    with pytest.raises(KeyError):
+        extract_texts({"messages": [{"role": "user"}]}, parse_field_path("messages.content"))
+
+
+def test_parse_field_path_rejects_empty_segments():
+    with pytest.raises(ValueError, match="invalid field path"):
+        parse_field_path("a..b")
+
+
+def test_iter_jsonl_records_reports_bad_lines():
+    lines = io.StringIO('{"id": 1, "text": "a b"}\n\nnot json\n{"id": 4}\n')
+    records = list(iter_jsonl_records(lines, [("text",)], id_field=("id",)))
+    assert records[0] == Record(1, 1, ("a b",))
+    assert records[1].line == 3
+    assert records[1].error.startswith("invalid JSON")
+    assert records[2] == Record(4, 4, error="missing field 'text'")
+
+
+def test_iter_csv_records_by_name_and_index():
+    lines = io.StringIO('id,title,body\n7,"a, b","line one\nline two"\n8,short\n')
+    records = list(iter_csv_records(lines, ["title", "2"], id_column="id"))
+    assert records[0] == Record(1, "7", ("a, b", "line one\nline two"))
+    assert records[1].error == "row has only 2 columns"
+
+
+def test_iter_csv_records_unknown_column_fails_early():
+    with pytest.raises(ValueError, match="no CSV column"):
+        iter_csv_records(io.StringIO("a,b\n1,2\n"), ["c"])
+
+
+def test_count_records_batches_and_keeps_order():
+    calls = []
+
+    def encode(texts):
+        calls.append(len(texts))
+        return _word_counts(texts)
+
+    records = [Record(i, texts=("a b", "c")) for i in range(1, 6)]
+    records.insert(2, Record(99, error="boom"))
+    results = list(count_records(records, encode, batch_size=2))
+    assert [(r.line, tokens) for r, tokens in results] == [(1, 3), (2, 3), (99, None), (3, 3), (4, 3), (5, 3)]
+    assert calls == [4, 2, 4]
+
+
+def test_record_result_shapes():
+    assert record_result(Record(2, "x"), 5, with_id=True) == {"line": 2, "id": "x", "tokens": 5}
+    assert record_result(Record(3, error="bad"), None, with_id=False, source="f.jsonl") == {
+        "source": "f.jsonl",
+        "line": 3,
+        "error": "bad",
+    }
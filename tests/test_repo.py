@@ -0,0 +1,81 @@
+import shutil
+import subprocess
+
+import pytest
+
+from cntkn.cache import TokenCache
+from cntkn.repo import NOT_TEXT, RepoError, count_tree, list_tree, rollup
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="needs a git binary")
+
+
+class ToyCounter:
+    def __init__(self, encoder):
+        self.encoder = encoder
+        self.encoded = []
+
+    def encode_batch(self, texts, model, **_):
+        self.encoded += texts
+        return [self.encoder.encode(text) for text in texts]
+
+
+def _git(repo, *args):
+    subprocess.run(
+        ["git", "-C", str(repo), "-c", "user.name=t", "-c", "user.email=t@t", *args],  # noqa: S607
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture
+def repo(tmp_path):
+    root = tmp_path / "repo"
+    (root / "src" / "pkg").mkdir(parents=True)
+    (root / "src" / "pkg" / "mod.py").write_text("the thing\n", encoding="utf-8")
+    (root / "src" / "copy.py").write_text("the thing\n", encoding="utf-8")  # same blob
+    (root / "notes.md").write_bytes(b"line one\r\nline two\r\n")
+    (root / "image.bin").write_bytes(b"\x89PNG\xff\xfe")
+    _git(tmp_path, "init", "-q", str(root))
+    _git(root, "add", ".")
+    _git(root, "commit", "-qm", "first")
+    return root
+
+
+def test_counts_are_cached_by_blob(repo, tmp_path, toy_encoder):
+    counter = ToyCounter(toy_encoder)
+    with TokenCache(tmp_path / "cache") as cache:
+        first = count_tree(repo, list_tree(repo), "gpt-4o", counter=counter, cache=cache)
+        assert (first.encoded_blobs, first.cached_blobs) == (3, 0)
+        assert first.files["image.bin"] == NOT_TEXT
+        assert first.files["notes.md"] == toy_encoder.encode("line one\nline two\n")
+        assert first.total == sum(n for n in first.files.values() if n != NOT_TEXT)
+
+        (repo / "notes.md").write_text("line one\nline three\n", encoding="utf-8")
+        _git(repo, "commit", "-qam", "second")
+        counter.encoded.clear()
+        second = count_tree(repo, list_tree(repo), "gpt-4o", counter=counter, cache=cache)
+    assert (second.encoded_blobs, second.cached_blobs) == (1, 2)
+    assert counter.encoded == ["line one\nline three\n"]
+    assert second.files["src/pkg/mod.py"] == first.files["src/pkg/mod.py"]
+
+
+def test_subdirectories_and_revisions(repo, tmp_path):
+    (repo / "src" / "new.py").write_text("more words\n", encoding="utf-8")
+    _git(repo, "add", ".")
+    _git(repo, "commit", "-qm", "second")
+    assert [e.path for e in list_tree(repo / "src")] == ["copy.py", "new.py", "pkg/mod.py"]
+    assert "src/new.py" not in {e.path for e in list_tree(repo, "HEAD~1")}
+    with pytest.raises(RepoError, match=r"Not a valid object name|bad revision|not a tree"):
+        list_tree(repo, "no-such-branch")
+    plain = tmp_path / "plain"
+    plain.mkdir()
+    with pytest.raises(RepoError, match="not a git repository"):
+        list_tree(plain)
+
+
+def test_rollup_sums_each_directory():
+    files = {"a.txt": 1, "src/b.py": 2, "src/pkg/c.py": 4, "src/pkg/blob.bin": NOT_TEXT}
+    assert rollup(files) == {".": 7, "src": 6, "src/pkg": 4}
+    assert rollup(files, depth=1) == {".": 7, "src": 6}
+    assert rollup(files, depth=0) == {".": 7}
+    assert rollup({}) == {".": 0}
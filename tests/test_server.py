@@ -0,0 +1,99 @@
+import os
+import stat
+import threading
+from pathlib import Path
+
+import pytest
+
+from cntkn.server import ServerError, TokenServer, is_server_running, request_tokens, request_tokens_multi
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch, toy_encoder):
+    monkeypatch.setattr("cntkn.core.get_encoder", lambda model: toy_encoder)
+    srv = TokenServer(tmp_path / "s.sock")
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+    thread.join()
+
+
+def test_no_server_means_none(tmp_path):
+    assert request_tokens(["hi"], "gpt-4o", path=tmp_path / "missing.sock") is None
+    assert not is_server_running(tmp_path / "missing.sock")
+
+
+def test_count_and_encode_round_trip(server, toy_encoder):
+    assert is_server_running(server.path)
+    texts = ["the thing", "x"]
+    assert request_tokens(texts, "gpt-4o", path=server.path) == toy_encoder.encode_batch(texts)
+    tokens = request_tokens(texts, "gpt-4o", return_tokens=True, path=server.path)
+    assert tokens == toy_encoder.encode_batch(texts, return_tokens=True)
+
+
+def test_concurrent_clients(server, toy_encoder):
+    results = [None] * 16
+
+    def worker(i):
+        results[i] = request_tokens(["the " * i], "gpt-4o", path=server.path)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [toy_encoder.encode_batch(["the " * i]) for i in range(16)]
+
+
+def test_refuses_second_server_and_cleans_up(server):
+    with pytest.raises(OSError, match="already listening"):
+        TokenServer(server.path)
+
+
+def test_socket_is_private_from_the_moment_it_is_bound(tmp_path, monkeypatch):
+    modes = []
+    bind = TokenServer.server_bind
+
+    def recording_bind(self):
+        bind(self)
+        modes.append(stat.S_IMODE(Path(self.server_address).stat().st_mode))
+
+    monkeypatch.setattr(TokenServer, "server_bind", recording_bind)
+    umask = os.umask(0o022)
+    try:
+        with TokenServer(tmp_path / "run" / "s.sock"):
+            assert os.umask(0o022) == 0o022  # restored after binding
+    finally:
+        os.umask(umask)
+    assert [mode & 0o077 for mode in modes] == [0]  # no access for group or others
+    assert stat.S_IMODE((tmp_path / "run").stat().st_mode) == 0o700
+
+
+def test_stale_socket_is_replaced(tmp_path):
+    stale = tmp_path / "stale.sock"
+    first = TokenServer(stale)
+    first.socket.close()  # simulate a crashed daemon that left its socket file behind
+    with TokenServer(stale) as second:
+        assert second.path.exists()
+    assert not stale.exists()
+
+
+def test_server_reports_errors(server, monkeypatch):
+    def boom(model):
+        raise KeyError(model)
+
+    monkeypatch.setattr("cntkn.core.get_encoder", boom)
+    with pytest.raises(ServerError, match="KeyError"):
+        request_tokens(["x"], "nope", path=server.path)
+
+
+def test_multi_model_request_resolves_names(server, toy_encoder):
+    texts = ["hello world", "the end"]
+    counts = toy_encoder.encode_batch(texts)
+    result = request_tokens_multi(texts, ["gpt-4", "gpt-3.5-turbo", "gpt-4o"], path=server.path)
+    assert result == {"gpt-4": counts, "gpt-3.5-turbo": counts, "gpt-4o": counts}
+    assert request_tokens_multi([], ["gpt-4o"], path=server.path) == {"gpt-4o": []}
+    with pytest.raises(ServerError, match="Could not map"):
+        request_tokens_multi([], ["nope"], path=server.path)
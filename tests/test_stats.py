@@ -0,0 +1,89 @@
+from cntkn.cache import TokenCache
+from cntkn.core import count_tokens, count_tokens_batch, count_tokens_stream
+from cntkn.stats import RunStats, maybe_phase
+
+
+class WordCounter:
+    def encode(self, text, model, *, return_tokens=False):
+        words = text.split()
+        return list(range(len(words))) if return_tokens else len(words)
+
+    def encode_batch(self, texts, model, *, return_tokens=False, num_threads=8):
+        return [self.encode(t, model, return_tokens=return_tokens) for t in texts]
+
+
+def test_phases_accumulate():
+    stats = RunStats()
+    with stats.phase("read"):
+        pass
+    stats.add_time("read", 1.0)
+    with maybe_phase(None, "ignored"):
+        pass
+    assert list(stats.phases) == ["read"]
+    assert stats.phases["read"] >= 1.0
+
+
+def test_timed_yields_everything():
+    stats = RunStats()
+    assert list(stats.timed("read", iter(["a", "b"]))) == ["a", "b"]
+    assert "read" in stats.phases
+
+
+def test_as_dict_totals_and_rates():
+    stats = RunStats()
+    stats.record("a", bytes_read=1 << 20, tokens=100, seconds=0.5)
+    stats.record("b", bytes_read=0, tokens=0, seconds=0.0)
+    data = stats.as_dict()
+    assert (data["bytes"], data["tokens"]) == (1 << 20, 100)
+    assert data["inputs"][0]["tokens_per_s"] == 200
+    assert data["inputs"][0]["mb_per_s"] == 2
+    assert data["inputs"][1]["tokens_per_s"] is None
+    assert "a: 1048576 bytes, 100 tokens, 200 tokens/s, 2.00 MB/s" in stats.format_text()
+
+
+def test_prometheus_textfile(tmp_path):
+    stats = RunStats()
+    stats.add_time("encode", 0.25)
+    stats.record("a", bytes_read=10, tokens=3, seconds=0.1)
+    path = tmp_path / "cntkn.prom"
+    stats.write_prometheus(path)
+    lines = path.read_text().splitlines()
+    assert "# TYPE cntkn_tokens gauge" in lines
+    assert "cntkn_tokens 3" in lines
+    assert 'cntkn_phase_seconds{phase="encode"} 0.25' in lines
+    assert [p.name for p in tmp_path.iterdir()] == ["cntkn.prom"]
+
+
+def test_count_tokens_batch_records_each_input():
+    stats = RunStats()
+    assert count_tokens_batch(["a b", "c", "d e f"], counter=WordCounter(), stats=stats) == [2, 1, 3]
+    assert [(i.label, i.bytes_read, i.tokens) for i in stats.inputs] == [
+        ("#0", 3, 2),
+        ("#1", 1, 1),
+        ("#2", 5, 3),
+    ]
+    assert "encode" in stats.phases
+
+
+def test_count_tokens_with_stats_matches_plain():
+    stats = RunStats()
+    assert count_tokens("a b c", counter=WordCounter(), stats=stats) == 3
+    assert count_tokens("a b c", counter=WordCounter(), return_tokens=True, stats=stats) == [0, 1, 2]
+    assert [i.tokens for i in stats.inputs] == [3, 3]
+
+
+def test_count_tokens_batch_stats_with_cache(tmp_path):
+    with TokenCache(tmp_path) as cache:
+        count_tokens_batch(["a b"], counter=WordCounter(), cache=cache)
+        stats = RunStats()
+        assert count_tokens_batch(["a b", "c"], counter=WordCounter(), cache=cache, stats=stats) == [2, 1]
+    assert (stats.inputs[0].tokens, stats.inputs[0].seconds) == (2, 0.0)
+    assert "cache" in stats.phases
+
+
+def test_count_tokens_stream_records_one_input():
+    stats = RunStats()
+    total = count_tokens_stream(["a b ", "c d"], counter=WordCounter(), chunk_size=2, stats=stats)
+    assert total == count_tokens_stream(["a b ", "c d"], counter=WordCounter(), chunk_size=2)
+    assert [(i.label, i.bytes_read, i.tokens) for i in stats.inputs] == [("stream", 7, total)]
+    assert {"read", "encode"} <= stats.phases.keys()
@@ -0,0 +1,66 @@
+import ast
+import io
+import struct
+from array import array
+
+import pytest
+
+from cntkn.core import count_tokens, count_tokens_batch, count_tokens_stream
+from cntkn.tokenio import to_array, write_tokens
+
+
+class WordCounter:
+    def encode(self, text, model, *, return_tokens=False):
+        tokens = [len(word) for word in text.split()]
+        return tokens if return_tokens else len(tokens)
+
+    def encode_batch(self, texts, model, *, return_tokens=False, num_threads=8):
+        return [self.encode(t, model, return_tokens=return_tokens) for t in texts]
+
+
+def _write(token_lists, fmt):
+    out = io.BytesIO()
+    written = write_tokens(out, token_lists, fmt)
+    assert written == len(out.getvalue())
+    return out.getvalue()
+
+
+def test_raw_is_concatenated_little_endian_uint32():
+    assert _write([[1, 2], [70000]], "raw") == struct.pack("<3I", 1, 2, 70000)
+
+
+def test_length_prefixed_keeps_boundaries():
+    assert _write([[1, 2], [], [3]], "lp") == struct.pack("<6I", 2, 1, 2, 0, 1, 3)
+
+
+def test_npy_header_and_payload():
+    data = _write([[1, 2], [3]], "npy")
+    assert data.startswith(b"\x93NUMPY\x01\x00")
+    (header_len,) = struct.unpack("<H", data[8:10])
+    assert (10 + header_len) % 64 == 0
+    header = ast.literal_eval(data[10 : 10 + header_len].decode("latin-1"))
+    assert header == {"descr": "<u4", "fortran_order": False, "shape": (3,)}
+    assert data[10 + header_len :] == struct.pack("<3I", 1, 2, 3)
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError, match="unknown token format"):
+        write_tokens(io.BytesIO(), [[1]], "csv")
+
+
+def test_to_array_is_compact():
+    tokens = to_array([1, 2, 3])
+    assert tokens.itemsize == 4
+    assert to_array(tokens) is tokens
+
+
+def test_core_compact_results():
+    counter = WordCounter()
+    assert count_tokens("a bb", return_tokens=True, compact=True, counter=counter) == array("I", [1, 2])
+    batch = count_tokens_batch(["a", "bb c"], return_tokens=True, compact=True, counter=counter)
+    assert all(isinstance(tokens, array) for tokens in batch)
+    assert [list(tokens) for tokens in batch] == [[1], [2, 1]]
+    stream = count_tokens_stream(["a bb ", "ccc"], return_tokens=True, compact=True, counter=counter)
+    assert isinstance(stream, array)
+    assert list(stream) == [1, 2, 3]
+    assert count_tokens("a bb", compact=True, counter=counter) == 2  # counts are unaffected